@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Broadcast benchmark suite
+
+Drives send_to_all_groups, send_message and the health check server of
+telegram_bot.py against the local fake Telegram API (fake_telegram_api.py),
+so nothing is sent to real groups. Every scenario runs in a fresh child
+process inside a temporary directory, which keeps the peak RSS figures
+separate and leaves the real groups.db, journal and log files untouched.
+
+Usage:
+    python benchmark.py
+    python benchmark.py --sizes 10,1000 --latency 0.05 --rate-429 0.01 --rate-403 0.02
+    python benchmark.py --scenarios broadcast --sizes 600 --telegram-limits --tokens 3
+"""
+
+import argparse
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from fake_telegram_api import FakeTelegramApi
+
+SCENARIOS = ["broadcast", "send_message", "health"]
+DEFAULT_SIZES = [10, 1000, 100000]
+
+# Limits used unless --telegram-limits is given; the real ones (30 msg/s)
+# would turn the 100k run into an hour of waiting on the rate limiter
+UNTHROTTLED_LIMITS = {
+    "global_per_second": 1000000,
+    "global_burst": 1000000,
+    "per_chat_per_minute": 1000000,
+    "per_chat_burst": 1000000
+}
+
+
+def percentile(sorted_values, fraction):
+    """
+    Returns:
+        float: Value at the given fraction of an already sorted list
+    """
+    if not sorted_values:
+        return 0.0
+    return sorted_values[int(fraction * (len(sorted_values) - 1))]
+
+
+def peak_rss_mb():
+    """
+    Returns:
+        float: Peak resident set size of this process in MB
+    """
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+def run_parallel(count, workers, func):
+    """
+    Call func(index) for every index in range(count) on a fixed set of threads.
+
+    Returns:
+        list: Seconds taken by each call
+    """
+    latencies = []
+    counter = iter(range(count))
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                index = next(counter, None)
+            if index is None:
+                return
+            start = time.perf_counter()
+            func(index)
+            latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=worker) for _ in range(min(workers, count))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies
+
+
+def chat_id_for(index):
+    return -1001000000000 - index
+
+
+def run_child(args):
+    """
+    Run one scenario in this (child) process and write its result as JSON.
+
+    The scenario runs in a temporary directory that is removed afterwards.
+    """
+    previous_dir = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix='telegram-bench-') as workdir:
+        os.chdir(workdir)
+        try:
+            run_child_in(workdir, args)
+        finally:
+            # Leave the directory before it is removed
+            os.chdir(previous_dir)
+
+
+def run_child_in(workdir, args):
+    """
+    Run one scenario with workdir as the current directory.
+    """
+    os.environ['TELEGRAM_API_BASE'] = args.api_base
+    os.environ.setdefault('BOT_TOKEN', '123456:benchmark')
+    if args.tokens > 1:
+        os.environ['BOT_TOKENS'] = ",".join(f"{123456 + index}:benchmark"
+                                            for index in range(args.tokens))
+
+    import telegram_bot
+    from group_registry import GroupRegistry
+
+    logging.getLogger().setLevel(logging.WARNING)
+    if not args.telegram_limits:
+        telegram_bot.apply_rate_limits(UNTHROTTLED_LIMITS)
+    telegram_bot.BROADCAST_WORKERS = args.workers
+    # Measure the whole broadcast, not the first deadline-bounded pass
+    telegram_bot.BROADCAST_DEADLINE = None
+    for shard in telegram_bot.token_pool:
+        for method in shard.api_client.timeouts:
+            shard.api_client.timeouts[method] = args.client_timeout
+
+    chats = args.chats
+    results = {"ok": 0, "failed": 0}
+    results_lock = threading.Lock()
+    latencies = []
+
+    def count(ok):
+        with results_lock:
+            results["ok" if ok else "failed"] += 1
+
+    if args.scenario == "health":
+        import requests
+
+        server = telegram_bot.create_health_check_server(('127.0.0.1', 0))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        telegram_bot.health_monitor.record(True)
+        url = f"http://127.0.0.1:{server.server_address[1]}/health"
+        sessions = threading.local()
+
+        def request(index):
+            session = getattr(sessions, 'session', None)
+            if session is None:
+                session = sessions.session = requests.Session()
+            try:
+                count(session.get(url, timeout=args.client_timeout).status_code == 200)
+            except requests.exceptions.RequestException:
+                count(False)
+
+        start = time.perf_counter()
+        latencies = run_parallel(chats, args.workers, request)
+        elapsed = time.perf_counter() - start
+        server.shutdown()
+    else:
+        send_message = telegram_bot.send_message
+
+        def timed_send(chat_id, text, deadline=None, sent_parts=None):
+            start = time.perf_counter()
+            result = send_message(chat_id, text, deadline, sent_parts)
+            latencies.append(time.perf_counter() - start)
+            return result
+
+        if args.scenario == "broadcast":
+            groups_file = os.path.join(workdir, 'groups.jsonl')
+            with open(groups_file, 'w') as f:
+                for index in range(chats):
+                    f.write(json.dumps({"chat_id": chat_id_for(index)}) + '\n')
+            registry = GroupRegistry(telegram_bot.GROUP_REGISTRY_FILE)
+            registry.import_groups(groups_file)
+            telegram_bot.group_registry = registry
+            telegram_bot.send_message = timed_send
+
+            start = time.perf_counter()
+            successful, total = telegram_bot.send_to_all_groups()
+            elapsed = time.perf_counter() - start
+            results = {"ok": successful, "failed": total - successful}
+        else:
+            def send(index):
+                count(bool(send_message(chat_id_for(index), telegram_bot.MESSAGE)))
+
+            start = time.perf_counter()
+            latencies = run_parallel(chats, args.workers, send)
+            elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    report = {
+        "scenario": args.scenario,
+        "chats": chats,
+        "seconds": round(elapsed, 3),
+        "throughput": round(chats / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        **results
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f)
+
+
+def run_scenario(args, api, scenario, chats):
+    """
+    Run one scenario in a child process.
+
+    Returns:
+        dict: The child's report, or None if it failed
+    """
+    fd, output = tempfile.mkstemp(suffix='.json')
+    os.close(fd)
+    command = [sys.executable, os.path.abspath(__file__), '--child', scenario,
+               '--chats', str(chats), '--api-base', api.base_url,
+               '--workers', str(args.workers), '--client-timeout', str(args.client_timeout),
+               '--tokens', str(args.tokens),
+               '--output', output]
+    if args.telegram_limits:
+        command.append('--telegram-limits')
+    env = {**os.environ, 'PYTHONPATH': os.path.dirname(os.path.abspath(__file__))}
+    try:
+        completed = subprocess.run(command, env=env, stdout=subprocess.DEVNULL)
+        if completed.returncode != 0:
+            print(f"{scenario} with {chats} chats failed (exit code {completed.returncode})")
+            return None
+        with open(output, 'r') as f:
+            return json.load(f)
+    finally:
+        os.remove(output)
+
+
+def print_table(reports):
+    columns = ["scenario", "chats", "seconds", "throughput", "p50_ms", "p99_ms",
+               "peak_rss_mb", "ok", "failed"]
+    widths = [max(len(column), *(len(str(r[column])) for r in reports)) for column in columns]
+    print("  ".join(column.rjust(width) for column, width in zip(columns, widths)))
+    for report in reports:
+        print("  ".join(str(report[column]).rjust(width)
+                        for column, width in zip(columns, widths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark broadcasts against a fake Bot API")
+    parser.add_argument('--sizes', default=",".join(str(size) for size in DEFAULT_SIZES),
+                        help="comma-separated chat counts")
+    parser.add_argument('--scenarios', default=",".join(SCENARIOS),
+                        help=f"comma-separated subset of {', '.join(SCENARIOS)}")
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--client-timeout', type=float, default=5.0,
+                        help="Bot API timeout used by the bot during the run")
+    parser.add_argument('--telegram-limits', action='store_true',
+                        help="keep the bot's real rate limits instead of disabling them")
+    parser.add_argument('--tokens', type=int, default=1,
+                        help="bots sharing the broadcast (BOT_TOKENS); the workers are per bot")
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--jitter', type=float, default=0.01)
+    parser.add_argument('--rate-429', type=float, default=0.0)
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--rate-403', type=float, default=0.0)
+    parser.add_argument('--rate-timeout', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', action='store_true', help="print results as JSON lines")
+    # Internal: run a single scenario in this process
+    parser.add_argument('--child', choices=SCENARIOS, dest='scenario', help=argparse.SUPPRESS)
+    parser.add_argument('--chats', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--api-base', help=argparse.SUPPRESS)
+    parser.add_argument('--output', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.scenario:
+        run_child(args)
+        return
+
+    api = FakeTelegramApi(latency=args.latency, jitter=args.jitter, rate_429=args.rate_429,
+                          retry_after=args.retry_after, rate_403=args.rate_403,
+                          rate_timeout=args.rate_timeout,
+                          timeout_delay=args.client_timeout + 1, seed=args.seed).start()
+    reports = []
+    try:
+        for scenario in [s.strip() for s in args.scenarios.split(',') if s.strip()]:
+            if scenario not in SCENARIOS:
+                parser.error(f"unknown scenario: {scenario}")
+            for chats in [int(size) for size in args.sizes.split(',')]:
+                report = run_scenario(args, api, scenario, chats)
+                if report is None:
+                    continue
+                reports.append(report)
+                if args.json:
+                    print(json.dumps(report), flush=True)
+    finally:
+        api.stop()
+
+    if reports and not args.json:
+        print_table(reports)
+    if not args.json:
+        print(f"Fake API requests: {json.dumps(api.counters, sort_keys=True)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Shared Telegram Bot API client
+
+One client object owns a pooled keep-alive HTTP session, so every message
+in a broadcast reuses an already open TLS connection to api.telegram.org
+instead of paying a new handshake per request.
+
+requests is imported when the session is first needed, so entry points
+that never call the API (CLI subcommands) do not pay for importing it.
+"""
+
+import os
+import threading
+import time
+
+from metrics import API_REQUEST_SECONDS, API_RESPONSES
+
+DEFAULT_API_BASE = "https://api.telegram.org"
+
+# Connections kept open per host; should be at least the broadcast worker count
+DEFAULT_POOL_SIZE = 16
+
+# Timeout in seconds for each Bot API method
+DEFAULT_TIMEOUTS = {
+    "getMe": 10,
+    "sendMessage": 30,
+    "sendPhoto": 60,
+    "sendDocument": 120
+}
+FALLBACK_TIMEOUT = 30
+
+FORM_HEADERS = {'Content-Type': 'application/x-www-form-urlencoded'}
+
+
+class SendResult:
+    """
+    Outcome of a single send. Truthy when Telegram accepted the message,
+    so callers that only need success/failure can keep using it as a bool.
+    """
+
+    __slots__ = ('ok', 'message_id', 'error_code', 'description', 'retry_after',
+                 'migrate_to_chat_id', 'chat_id')
+
+    def __init__(self, ok, message_id=None, error_code=None, description=None,
+                 retry_after=None, migrate_to_chat_id=None):
+        self.ok = ok
+        self.message_id = message_id
+        self.error_code = error_code
+        self.description = description
+        self.retry_after = retry_after
+        self.migrate_to_chat_id = migrate_to_chat_id
+        # Set by the sender when the message went to another chat than requested
+        # (a group upgraded to a supergroup), so it is recorded under that chat
+        self.chat_id = None
+
+    def __bool__(self):
+        return self.ok
+
+    def __repr__(self):
+        if self.ok:
+            return f"SendResult(ok, message_id={self.message_id})"
+        return f"SendResult(error_code={self.error_code}, description={self.description!r})"
+
+    @classmethod
+    def from_response(cls, result):
+        """
+        Build a SendResult from a decoded Bot API response.
+
+        Args:
+            result (dict): Decoded JSON reply
+
+        Returns:
+            SendResult: Parsed outcome
+        """
+        if result.get('ok'):
+            message = result.get('result') or {}
+            message_id = message.get('message_id') if isinstance(message, dict) else None
+            return cls(True, message_id=message_id)
+
+        parameters = result.get('parameters') or {}
+        return cls(
+            False,
+            error_code=result.get('error_code'),
+            description=result.get('description', 'Unknown error'),
+            retry_after=parameters.get('retry_after'),
+            migrate_to_chat_id=parameters.get('migrate_to_chat_id')
+        )
+
+    @classmethod
+    def failure(cls, description):
+        """
+        Build a SendResult for an error that produced no API response.
+
+        Returns:
+            SendResult: Failed outcome without an error code
+        """
+        return cls(False, description=description)
+
+
+class BotApiClient:
+    """
+    Thin Bot API wrapper around a pooled requests.Session.
+    """
+
+    def __init__(self, token, api_base=None, pool_size=DEFAULT_POOL_SIZE, timeouts=None):
+        """
+        Args:
+            token (str): Bot token
+            api_base (str): Bot API base URL; defaults to the TELEGRAM_API_BASE
+                environment variable, then DEFAULT_API_BASE
+            pool_size (int): Keep-alive connections kept open to the API host
+            timeouts (dict): Per-method timeouts overriding DEFAULT_TIMEOUTS
+        """
+        if api_base is None:
+            api_base = os.getenv('TELEGRAM_API_BASE') or DEFAULT_API_BASE
+        self.token = token
+        self.api_base = api_base.rstrip('/')
+        self.pool_size = pool_size
+        self.timeouts = {**DEFAULT_TIMEOUTS, **(timeouts or {})}
+        self._urls = {}
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self):
+        """
+        Returns:
+            requests.Session: The pooled session, created on first use
+        """
+        session = self._session
+        if session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._session = self._create_session(self.pool_size)
+                session = self._session
+        return session
+
+    @staticmethod
+    def _create_session(pool_size):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=False)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def method_url(self, method):
+        """
+        Returns:
+            str: Full URL for a Bot API method
+        """
+        url = self._urls.get(method)
+        if url is None:
+            url = self._urls[method] = f"{self.api_base}/bot{self.token}/{method}"
+        return url
+
+    def timeout_for(self, method):
+        """
+        Returns:
+            float: Configured timeout for a Bot API method
+        """
+        return self.timeouts.get(method, FALLBACK_TIMEOUT)
+
+    def call(self, method, data=None, timeout=None, http_method='POST', files=None):
+        """
+        Call a Bot API method and decode the JSON reply.
+
+        Network errors (requests.exceptions.RequestException) and invalid
+        JSON (ValueError) are raised to the caller.
+
+        Args:
+            method (str): Bot API method name, e.g. "sendMessage"
+            data (dict): Form parameters
+            timeout (float): Override for the per-method timeout
+            http_method (str): "POST" or "GET"
+            files (dict): Files to upload as multipart/form-data
+
+        Returns:
+            dict: Decoded Bot API response
+        """
+        if timeout is None:
+            timeout = self.timeout_for(method)
+        response = self._request(method, http_method, data=data, files=files, timeout=timeout)
+        return response.json()
+
+    def call_encoded(self, method, body, timeout=None):
+        """
+        POST an already form-encoded body, skipping per-call encoding.
+
+        Args:
+            method (str): Bot API method name
+            body (bytes): application/x-www-form-urlencoded request body
+            timeout (float): Override for the per-method timeout
+
+        Returns:
+            dict: Decoded Bot API response
+        """
+        if timeout is None:
+            timeout = self.timeout_for(method)
+        response = self._request(method, 'POST', data=body, timeout=timeout, headers=FORM_HEADERS)
+        return response.json()
+
+    def _request(self, method, http_method, **kwargs):
+        """Send one HTTP request, recording its latency and result code."""
+        import requests
+
+        start = time.perf_counter()
+        try:
+            response = self.session.request(http_method, self.method_url(method), **kwargs)
+        except requests.exceptions.RequestException:
+            API_RESPONSES.labels(method, "network_error").inc()
+            raise
+        finally:
+            API_REQUEST_SECONDS.labels(method).observe(time.perf_counter() - start)
+        API_RESPONSES.labels(method, response.status_code).inc()
+        return response
+
+    def get_me(self):
+        """
+        Returns:
+            dict: Decoded getMe response
+        """
+        return self.call("getMe", http_method='GET')
+
+    def send_message(self, chat_id, text, parse_mode=None):
+        """
+        Returns:
+            dict: Decoded sendMessage response
+        """
+        data = {"chat_id": chat_id, "text": text}
+        if parse_mode:
+            data["parse_mode"] = parse_mode
+        return self.call("sendMessage", data)
+
+    def close(self):
+        """Close all pooled connections."""
+        if self._session is not None:
+            self._session.close()
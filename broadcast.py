@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Concurrent broadcast engine
+
+Fans promotional messages out to many Telegram chats in parallel using a
+bounded worker pool. Messages addressed to the same chat are always sent
+one after another in submission order, so per-chat ordering is kept.
+
+With a retry policy, a failed send that is worth retrying parks its chat's
+lane on a delay queue instead of blocking a worker; the lane is picked up
+again when the retry is due.
+
+With a deadline, the whole broadcast finishes within its time budget: every
+request is given at most the remaining budget as its timeout, and chats not
+finished when the budget runs out are deferred to a follow-up pass instead
+of being sent late.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from metrics import BROADCAST_SENDS
+from retry_queue import PERMANENT, DelayQueue, classify_failure
+
+logger = logging.getLogger(__name__)
+
+# Number of chats that are sent to at the same time
+DEFAULT_MAX_WORKERS = 16
+
+# Smallest timeout handed to a request near the end of a budget; requests
+# rejects a timeout of 0, so callers check expired() before sending instead
+MIN_REQUEST_TIMEOUT = 0.5
+
+
+class Deadline:
+    """
+    Time budget of one broadcast, shared by every request it makes.
+    """
+
+    def __init__(self, seconds, clock=time.monotonic):
+        """
+        Args:
+            seconds (float): Budget from now
+            clock (callable): Monotonic time source
+        """
+        self.clock = clock
+        self.expires_at = clock() + seconds
+
+    def remaining(self):
+        """
+        Returns:
+            float: Seconds left, 0 once expired
+        """
+        return max(0.0, self.expires_at - self.clock())
+
+    def expired(self):
+        return self.clock() >= self.expires_at
+
+    def shorten(self, seconds):
+        """Make the budget end within seconds from now, e.g. when shutting down."""
+        self.expires_at = min(self.expires_at, self.clock() + seconds)
+
+    def timeout(self, limit):
+        """
+        Cap a per-request timeout to the remaining budget.
+
+        Callers check expired() first; this never returns less than
+        MIN_REQUEST_TIMEOUT, so a request sent just before the budget ends
+        still gets a usable timeout.
+
+        Args:
+            limit (float): The request's own timeout
+
+        Returns:
+            float: Timeout to use
+        """
+        return max(MIN_REQUEST_TIMEOUT, min(limit, self.remaining()))
+
+
+class BroadcastEngine:
+    """
+    Bounded worker pool that delivers (chat_id, text) pairs concurrently.
+
+    Each chat gets its own lane: while a worker is sending to a chat, any
+    further messages for that chat are queued on the lane and sent by the
+    same worker once the previous one has finished.
+    """
+
+    def __init__(self, send_func, max_workers=DEFAULT_MAX_WORKERS, on_result=None,
+                 retry_policy=None, deadline=None):
+        """
+        Args:
+            send_func (callable): send_func(chat_id, text) -> truthy on success;
+                called as send_func(chat_id, text, deadline=deadline) when a
+                deadline is set
+            max_workers (int): Maximum number of chats served in parallel
+            on_result (callable): Optional on_result(chat_id, result) called with
+                the final outcome of each message
+            retry_policy (RetryPolicy): Optional policy deciding retries
+            deadline (Deadline): Optional time budget of the whole broadcast
+        """
+        self.send_func = send_func
+        self.on_result = on_result
+        self.retry_policy = retry_policy
+        self.deadline = deadline
+        # (chat_id, text) pairs left unsent when the deadline expired
+        self.deferred = []
+        self.max_workers = max(1, int(max_workers))
+        self._lock = threading.Lock()
+        self._done = threading.Condition(self._lock)
+        self._lanes = {}
+        self._successful = 0
+        self._total = 0
+        self._outstanding = 0
+        self._executor = None
+        self._retry_queue = DelayQueue() if retry_policy is not None else None
+        # Bounds the number of queued messages so huge chat lists are streamed
+        self._slots = threading.BoundedSemaphore(self.max_workers * 4)
+
+    def run(self, deliveries):
+        """
+        Send every delivery and wait for all of them, including retries, to finish.
+
+        Args:
+            deliveries (iterable): (chat_id, text) pairs, may be a generator
+
+        Deliveries still unsent when the deadline expires are not counted in
+        the totals; they are collected in self.deferred.
+
+        Returns:
+            tuple: (successful_sends, total_messages)
+        """
+        self._successful = 0
+        self._total = 0
+        self.deferred = []
+
+        with ThreadPoolExecutor(max_workers=self.max_workers,
+                                thread_name_prefix='broadcast') as executor:
+            self._executor = executor
+            for chat_id, text in deliveries:
+                if self._expired():
+                    with self._lock:
+                        self.deferred.append((chat_id, text))
+                    continue
+                self._slots.acquire()
+                with self._lock:
+                    self._total += 1
+                    self._outstanding += 1
+                    lane = self._lanes.get(chat_id)
+                    if lane is not None:
+                        # A worker is already serving this chat, keep order
+                        lane.append([text, 0])
+                        continue
+                    self._lanes[chat_id] = deque([[text, 0]])
+                executor.submit(self._drain_lane, chat_id)
+
+            with self._done:
+                while self._outstanding:
+                    self._done.wait()
+
+        return self._successful, self._total
+
+    def _drain_lane(self, chat_id):
+        """Send all queued messages for one chat in order."""
+        while True:
+            with self._lock:
+                lane = self._lanes[chat_id]
+                if not lane:
+                    del self._lanes[chat_id]
+                    return
+                item = lane[0]
+                text = item[0]
+
+            if self._expired():
+                self._defer_lane(chat_id)
+                return
+
+            try:
+                if self.deadline is not None:
+                    result = self.send_func(chat_id, text, deadline=self.deadline)
+                else:
+                    result = self.send_func(chat_id, text)
+            except Exception as e:
+                logger.error(f"Unexpected error in broadcast worker for chat {chat_id}: {str(e)}")
+                result = False
+
+            if not result and self._expired() and classify_failure(result) != PERMANENT:
+                # Most likely cut short by the deadline; leave it to the follow-up pass
+                self._defer_lane(chat_id)
+                return
+
+            item[1] += 1
+            if self.retry_policy is not None:
+                delay = self.retry_policy.next_delay(result, item[1])
+                if delay is not None and self.deadline is not None \
+                        and delay >= self.deadline.remaining():
+                    self._defer_lane(chat_id)
+                    return
+                if delay is not None:
+                    # Park the lane; later messages for this chat wait behind the retry
+                    logger.info(f"Retrying chat {chat_id} in {delay:.1f}s (attempt {item[1] + 1})")
+                    self._retry_queue.call_later(delay, self._resume_lane, chat_id)
+                    return
+
+            with self._lock:
+                lane.popleft()
+            self._finish(chat_id, result)
+
+    def _expired(self):
+        return self.deadline is not None and self.deadline.expired()
+
+    def _defer_lane(self, chat_id):
+        """Hand every message still queued for a chat over to self.deferred."""
+        with self._lock:
+            lane = self._lanes.pop(chat_id)
+            self.deferred.extend((chat_id, item[0]) for item in lane)
+            self._total -= len(lane)
+        for _ in lane:
+            self._slots.release()
+        with self._done:
+            self._outstanding -= len(lane)
+            if not self._outstanding:
+                self._done.notify_all()
+
+    def _resume_lane(self, chat_id):
+        """Hand a parked lane back to the worker pool once its retry is due."""
+        self._executor.submit(self._drain_lane, chat_id)
+
+    def _finish(self, chat_id, result):
+        """Record the final outcome of one message."""
+        try:
+            if self.on_result is not None:
+                self.on_result(chat_id, result)
+        except Exception as e:
+            logger.error(f"Error recording result for chat {chat_id}: {str(e)}")
+        finally:
+            BROADCAST_SENDS.labels("sent" if result else "failed").inc()
+            self._slots.release()
+            with self._done:
+                if result:
+                    self._successful += 1
+                self._outstanding -= 1
+                if not self._outstanding:
+                    self._done.notify_all()
+
+
+def broadcast(chat_ids, text, send_func, max_workers=DEFAULT_MAX_WORKERS, on_result=None,
+              retry_policy=None):
+    """
+    Send the same text to every chat concurrently.
+
+    Args:
+        chat_ids (iterable): Chat IDs to send to
+        text (str): The message text to send
+        send_func (callable): send_func(chat_id, text) -> truthy on success
+        max_workers (int): Maximum number of chats served in parallel
+        on_result (callable): Optional on_result(chat_id, result) called with
+            the final outcome of each message
+        retry_policy (RetryPolicy): Optional policy deciding retries
+
+    Returns:
+        tuple: (successful_sends, total_chats)
+    """
+    engine = BroadcastEngine(send_func, max_workers=max_workers, on_result=on_result,
+                             retry_policy=retry_policy)
+    return engine.run((chat_id, text) for chat_id in chat_ids)
+
+
+class BroadcastProgress:
+    """
+    Live counters of one broadcast, readable while it is running.
+    """
+
+    def __init__(self, broadcast_id):
+        """
+        Args:
+            broadcast_id (str): Identifier of the broadcast (its slot)
+        """
+        self.broadcast_id = broadcast_id
+        self.started_at = datetime.now()
+        self.finished_at = None
+        self.state = "running"
+        self.sent = 0
+        self.failed = 0
+        self.deferred = 0
+        self.total = None
+        # Bot ID -> [sent, failed] when the broadcast is split over several bots
+        self.by_bot = {}
+        self._lock = threading.Lock()
+
+    def record(self, result, bot_id=None):
+        """Count the final outcome of one message, sent by bot_id if given."""
+        with self._lock:
+            if result:
+                self.sent += 1
+            else:
+                self.failed += 1
+            if bot_id is not None:
+                counts = self.by_bot.setdefault(bot_id, [0, 0])
+                counts[0 if result else 1] += 1
+            if self.deferred:
+                # Outcomes recorded while deferred belong to a follow-up pass
+                self.deferred -= 1
+
+    def finish(self, successful, total, state="finished", deferred=0):
+        """
+        Mark the broadcast as done with its final totals.
+
+        With state "deferred" the broadcast hit its deadline and waits for a
+        follow-up pass; deferred messages are part of total but neither sent
+        nor failed yet.
+        """
+        with self._lock:
+            self.sent = successful
+            self.deferred = deferred
+            self.failed = total - successful - deferred
+            self.total = total
+            self.state = state
+            self.finished_at = datetime.now() if state != "deferred" else None
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: JSON-serialisable progress
+        """
+        with self._lock:
+            end = self.finished_at or datetime.now()
+            snapshot = {
+                "id": self.broadcast_id,
+                "state": self.state,
+                "sent": self.sent,
+                "failed": self.failed,
+                "deferred": self.deferred,
+                "processed": self.sent + self.failed,
+                "total": self.total,
+                "started_at": self.started_at.isoformat(),
+                "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+                "elapsed_seconds": round((end - self.started_at).total_seconds(), 3)
+            }
+            if self.by_bot:
+                snapshot["bots"] = {bot_id: {"sent": sent, "failed": failed}
+                                    for bot_id, (sent, failed) in self.by_bot.items()}
+            return snapshot
@@ -1,33 +1,33 @@
 #!/usr/bin/env python3
 """
 Cron-like message sender for Telegram bot
-Runs independently and checks scheduled times every minute
+Runs independently and sleeps until the next scheduled time
 """
 
-import time
-import requests
 import os
 import logging
 import json
 from datetime import datetime, timedelta
-import sys
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('cron_sender.log'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+import time
+
+from bot_api import BotApiClient
+from broadcast import BroadcastEngine
+from group_registry import GroupRegistry
+from instance_lock import InstanceLock
+from leader_lease import LeaderLease
+from logging_setup import setup_logging
+from metrics import BROADCAST_SECONDS, start_metrics_server
+from rate_limiter import RateLimiter
+from timer_scheduler import TimerScheduler, resolve_timezone
+
+LOG_FILE = 'cron_sender.log'
 
 logger = logging.getLogger(__name__)
 
 # Bot configuration
 BOT_TOKEN = os.getenv('BOT_TOKEN', '8093207171:AAGoIRsBcpBXPfLRz4RvXv3wMwdmEib6jn4')
 
-# Target group IDs
+# Target group IDs, used to seed the shared group registry (groups.db) if it is empty
 GROUP_IDS = [
     -1002111810768,
     -1002098871252,
@@ -55,20 +55,47 @@ MESSAGE = """🔔 Наші інші корисні Telegram-групи:
 
 # Schedule in GMT+3
 SCHEDULE_TIMES = ["09:00", "14:45", "17:00", "21:00"]
+TIMEZONE = "GMT+3"
+GMT_PLUS3 = resolve_timezone(TIMEZONE)
 LAST_SEND_FILE = "last_send_cron.txt"
+BROADCAST_WORKERS = 16
+
+# cron_sender has no health server, so /metrics gets its own port
+METRICS_PORT = int(os.getenv('CRON_METRICS_PORT', '5002'))
+
+# Pooled keep-alive connection to the Bot API
+api_client = BotApiClient(BOT_TOKEN, pool_size=BROADCAST_WORKERS)
+
+# Global and per-chat token buckets (Telegram limits: ~30 msg/s, ~20 msg/min per group)
+rate_limiter = RateLimiter()
+
+# Only the holder of the shared lease broadcasts (see leader_lease.py). While
+# telegram_bot runs it always sends, with its own config, registry schedule
+# and message; cron_sender is only the backup for when it is down
+TELEGRAM_BOT_PID_FILE = "telegram_bot.pid"
+leader_lease = LeaderLease("cron_sender", "broadcast_leader.lease",
+                           defer_to=InstanceLock(TELEGRAM_BOT_PID_FILE).holder_alive)
+
+# Group registry shared with telegram_bot
+group_registry = None
+
+# Sleeps until each slot; its clock also drives should_send_now(), so
+# simulation.py can replay the schedule on a virtual clock
+scheduler = TimerScheduler()
+
+def get_group_registry():
+    """Open the shared group registry on first use"""
+    global group_registry
+    if group_registry is None:
+        group_registry = GroupRegistry("groups.db")
+        group_registry.seed(GROUP_IDS)
+    return group_registry
 
 def send_message(chat_id, text):
     """Send message to Telegram chat"""
-    url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
-    data = {
-        "chat_id": chat_id,
-        "text": text,
-        "parse_mode": "HTML"
-    }
-    
     try:
-        response = requests.post(url, data=data, timeout=30)
-        result = response.json()
+        rate_limiter.acquire(chat_id)
+        result = api_client.send_message(chat_id, text, parse_mode="HTML")
         
         if result.get('ok'):
             logger.info(f"Message sent successfully to chat {chat_id}")
@@ -81,29 +108,30 @@ def send_message(chat_id, text):
         logger.error(f"Error sending to chat {chat_id}: {str(e)}")
         return False
 
-def send_to_all_groups():
-    """Send message to all groups"""
+def send_to_all_groups(schedule_time=None):
+    """Send message to all groups due at schedule_time (all enabled groups if None)"""
     logger.info("Starting cron message broadcast")
-    successful_sends = 0
+    deliveries = ((chat_id, message or MESSAGE)
+                  for chat_id, message in get_group_registry().iter_due(
+                      schedule_time, timezone=TIMEZONE, default_timezone=TIMEZONE))
+    engine = BroadcastEngine(send_message, max_workers=BROADCAST_WORKERS)
+    started = time.monotonic()
+    successful_sends, total = engine.run(deliveries)
+    BROADCAST_SECONDS.labels(schedule_time or "manual").observe(time.monotonic() - started)
     
-    for chat_id in GROUP_IDS:
-        if send_message(chat_id, MESSAGE):
-            successful_sends += 1
-        time.sleep(1)  # Rate limiting
-    
-    logger.info(f"Cron broadcast completed: {successful_sends}/{len(GROUP_IDS)} messages sent")
+    logger.info(f"Cron broadcast completed: {successful_sends}/{total} messages sent")
     return successful_sends
 
 def get_gmt_plus3_time():
     """Get current time in GMT+3"""
-    utc_now = datetime.utcnow()
+    utc_now = scheduler.clock().replace(tzinfo=None)
     gmt_plus3 = utc_now + timedelta(hours=3)
     return gmt_plus3
 
-def should_send_now():
-    """Check if we should send message now"""
+def should_send_now(schedule_time=None):
+    """Check if we should send message now (or for the given scheduled slot)"""
     current_time = get_gmt_plus3_time()
-    current_time_str = current_time.strftime("%H:%M")
+    current_time_str = schedule_time or current_time.strftime("%H:%M")
     
     # Check if current time matches schedule
     if current_time_str not in SCHEDULE_TIMES:
@@ -127,12 +155,12 @@ def should_send_now():
     
     return True
 
-def record_send_time():
+def record_send_time(schedule_time=None):
     """Record when we sent the message"""
     current_time = get_gmt_plus3_time()
     data = {
         'timestamp': current_time.isoformat(),
-        'schedule_time': current_time.strftime("%H:%M")
+        'schedule_time': schedule_time or current_time.strftime("%H:%M")
     }
     
     try:
@@ -141,34 +169,48 @@ def record_send_time():
     except Exception as e:
         logger.error(f"Failed to record send time: {e}")
 
+def run_slot(schedule_time):
+    """Send the broadcast for one scheduled slot"""
+    logger.info(f"Scheduled time {schedule_time} GMT+3 reached")
+    
+    if not leader_lease.try_acquire():
+        logger.info("telegram_bot or another sender holds the broadcast lease, standing by")
+        return
+    
+    if should_send_now(schedule_time):
+        logger.info("Time matches schedule, sending messages...")
+        success_count = send_to_all_groups(schedule_time)
+        
+        if success_count > 0:
+            record_send_time(schedule_time)
+            logger.info(f"Successfully sent {success_count} messages")
+        else:
+            logger.error("Failed to send any messages")
+
+def setup_schedule():
+    """Add a daily timer for every SCHEDULE_TIMES slot"""
+    for schedule_time in SCHEDULE_TIMES:
+        scheduler.add_daily(schedule_time, lambda t=schedule_time: run_slot(t), tz=GMT_PLUS3,
+                            name=f"slot {schedule_time} {TIMEZONE}")
+
 def main():
     """Main cron function"""
+    # Configure logging (queued JSON lines in a rotating file, plus stdout)
+    setup_logging(LOG_FILE)
     logger.info("Cron sender started")
+    leader_lease.start()
+    start_metrics_server(METRICS_PORT)
     
-    while True:
-        try:
-            current_time = get_gmt_plus3_time()
-            logger.info(f"Checking time: {current_time.strftime('%H:%M')} GMT+3")
-            
-            if should_send_now():
-                logger.info("Time matches schedule, sending messages...")
-                success_count = send_to_all_groups()
-                
-                if success_count > 0:
-                    record_send_time()
-                    logger.info(f"Successfully sent {success_count} messages")
-                else:
-                    logger.error("Failed to send any messages")
-            
-            # Sleep for 60 seconds before next check
-            time.sleep(60)
-            
-        except KeyboardInterrupt:
-            logger.info("Cron sender stopped by user")
-            break
-        except Exception as e:
-            logger.error(f"Error in cron loop: {e}")
-            time.sleep(60)
+    setup_schedule()
+    
+    next_run = scheduler.next_run().astimezone(GMT_PLUS3)
+    logger.info(f"Next scheduled send: {next_run.strftime('%Y-%m-%d %H:%M')} GMT+3")
+    
+    try:
+        # Sleeps until each scheduled time instead of checking every minute
+        scheduler.run_forever()
+    except KeyboardInterrupt:
+        logger.info("Cron sender stopped by user")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
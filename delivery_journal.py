@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Crash-safe per-chat delivery journal
+
+Every send outcome is appended as one JSON line of
+(slot, chat_id, status, message_id). A background writer thread batches
+records and issues a single fsync per batch (group commit); record() waits
+for the batch holding its record, so concurrent senders share one fsync
+and an outcome is on disk before the sender moves on.
+
+After a crash the journal tells which chats of an unfinished slot were
+already delivered, and the broadcast resumes with only the remaining ones.
+A send and its record can not be made atomic: a crash after Telegram
+accepted a message but before its batch was fsynced resends it, so at most
+the sends in flight at the moment of the crash (one per broadcast worker)
+can be delivered twice.
+
+Only unfinished slots keep their delivered chats in memory. A completed
+slot is reduced to its ID, so a slot is never broadcast twice. Once enough
+records have been appended, the writer thread rewrites the file from that
+state, so neither memory nor the file grows with the uptime.
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOURNAL_FILE = "delivery_journal.jsonl"
+
+# Unfinished slots kept when the journal is loaded at startup
+DEFAULT_KEEP_SLOTS = 16
+
+# IDs of completed slots remembered for is_complete()
+DEFAULT_KEEP_COMPLETED = 1000
+
+# Records appended before the file is compacted again
+DEFAULT_COMPACT_AFTER = 200000
+
+# Largest number of records written per fsync
+MAX_BATCH = 1024
+
+STATUS_STARTED = "started"
+STATUS_SENT = "sent"
+STATUS_FAILED = "failed"
+STATUS_COMPLETE = "complete"
+
+# Queued to the writer thread to make it compact the file
+_COMPACT = object()
+
+
+class SlotState:
+    """
+    In-memory summary of one unfinished broadcast slot.
+    """
+
+    __slots__ = ('slot', 'started_at', 'delivered')
+
+    def __init__(self, slot, started_at=None):
+        self.slot = slot
+        self.started_at = started_at
+        self.delivered = set()
+
+
+class DeliveryJournal:
+    """
+    Append-only JSON-lines journal with a group-commit writer thread.
+    """
+
+    def __init__(self, path=DEFAULT_JOURNAL_FILE, keep_slots=DEFAULT_KEEP_SLOTS,
+                 keep_completed=DEFAULT_KEEP_COMPLETED, compact_after=DEFAULT_COMPACT_AFTER):
+        """
+        Args:
+            path (str): Journal file path
+            keep_slots (int): Most recent unfinished slots kept at startup
+            keep_completed (int): Completed slot IDs remembered
+            compact_after (int): Records appended between two compactions
+        """
+        self.path = path
+        self.keep_slots = keep_slots
+        self.keep_completed = keep_completed
+        self.compact_after = compact_after
+        self._lock = threading.Lock()
+        # Unfinished slots with their delivered chats, and completed slot IDs
+        self._slots = {}
+        self._completed = OrderedDict()
+        self._appended = 0
+        self._queue = queue.Queue()
+        self._load_and_compact()
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._writer = threading.Thread(target=self._write_loop, name='journal-writer',
+                                        daemon=True)
+        self._writer.start()
+
+    def _load_and_compact(self):
+        """Replay the journal into memory and drop records that are no longer needed."""
+        records = []
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        # A torn last line from a crash mid-write
+                        continue
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logger.error(f"Could not read delivery journal {self.path}: {str(e)}")
+            return
+
+        order = []
+        for record in records:
+            if record.get('slot') not in self._slots:
+                order.append(record.get('slot'))
+            self._apply(record)
+        for slot in order[:-self.keep_slots]:
+            self._slots.pop(slot, None)
+
+        compacted = self._state_records()
+        if len(compacted) < len(records):
+            self._write_file(compacted)
+            logger.info(f"Compacted delivery journal to {len(self._slots)} unfinished slots")
+
+    def _state_records(self):
+        """
+        Returns:
+            list: Smallest set of records that rebuilds the in-memory state
+        """
+        records = [{"slot": slot, "status": STATUS_COMPLETE, "ts": ts}
+                   for slot, ts in self._completed.items()]
+        for state in self._slots.values():
+            if state.started_at:
+                records.append({"slot": state.slot, "status": STATUS_STARTED,
+                                "ts": state.started_at})
+            records.extend({"slot": state.slot, "chat_id": chat_id, "status": STATUS_SENT}
+                           for chat_id in state.delivered)
+        return records
+
+    def _write_file(self, records):
+        """Atomically replace the journal file with records."""
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def _apply(self, record):
+        slot = record.get('slot')
+        status = record.get('status')
+        if status == STATUS_COMPLETE:
+            # A completed slot only needs its ID
+            self._slots.pop(slot, None)
+            self._completed[slot] = record.get('ts')
+            self._completed.move_to_end(slot)
+            while len(self._completed) > self.keep_completed:
+                self._completed.popitem(last=False)
+            return
+        if slot in self._completed:
+            return
+        state = self._slots.get(slot)
+        if state is None:
+            state = self._slots[slot] = SlotState(slot)
+        if status == STATUS_STARTED:
+            state.started_at = record.get('ts')
+        elif status == STATUS_SENT:
+            state.delivered.add(record.get('chat_id'))
+
+    def _append(self, record):
+        record['ts'] = datetime.now().isoformat()
+        with self._lock:
+            self._apply(record)
+            self._appended += 1
+            compact = self._appended >= self.compact_after
+            if compact:
+                self._appended = 0
+        self._queue.put(record)
+        if compact:
+            self._queue.put(_COMPACT)
+
+    def start_slot(self, slot):
+        """Record that a broadcast for slot has started."""
+        self._append({"slot": slot, "status": STATUS_STARTED})
+
+    def record(self, slot, chat_id, status, message_id=None, wait=True):
+        """
+        Record the outcome of one send.
+
+        Args:
+            slot (str): Broadcast slot identifier
+            chat_id (int): Target chat
+            status (str): STATUS_SENT or STATUS_FAILED
+            message_id (int): Telegram message ID when sent
+            wait (bool): Return only once the record's batch is on disk
+        """
+        self._append({"slot": slot, "chat_id": chat_id, "status": status,
+                      "message_id": message_id})
+        if wait:
+            self.flush()
+
+    def complete_slot(self, slot):
+        """Record that every chat of slot has been attempted."""
+        self._append({"slot": slot, "status": STATUS_COMPLETE})
+        self.flush()
+
+    def is_complete(self, slot):
+        """
+        Returns:
+            bool: True if every chat of slot has already been attempted
+        """
+        with self._lock:
+            return slot in self._completed
+
+    def delivered(self, slot):
+        """
+        Returns:
+            set: Chat IDs already delivered for slot
+        """
+        with self._lock:
+            state = self._slots.get(slot)
+            return set(state.delivered) if state else set()
+
+    def incomplete_slots(self):
+        """
+        Returns:
+            list: SlotState objects for slots that started but never completed
+        """
+        with self._lock:
+            return [state for state in self._slots.values() if state.started_at]
+
+    def flush(self, timeout=10):
+        """
+        Block until every record queued so far is on disk.
+
+        Returns:
+            bool: True if the flush finished within timeout
+        """
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def _write_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            # Group commit: take everything that queued up during the last fsync
+            while len(batch) < MAX_BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            waiters = [item for item in batch if isinstance(item, threading.Event)]
+            lines = [json.dumps(item) + '\n' for item in batch
+                     if isinstance(item, dict)]
+            try:
+                if lines:
+                    self._file.write(''.join(lines))
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+                if _COMPACT in batch:
+                    self._compact()
+            except Exception as e:
+                logger.error(f"Failed to write delivery journal: {str(e)}")
+                time.sleep(1)
+            for waiter in waiters:
+                waiter.set()
+
+    def _compact(self):
+        """
+        Rewrite the file from the in-memory state; runs on the writer thread.
+
+        Records still queued were already applied to the state, so they end
+        up both in the snapshot and after it, which replays to the same state.
+        """
+        with self._lock:
+            records = self._state_records()
+        self._file.close()
+        try:
+            self._write_file(records)
+        finally:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        logger.info(f"Compacted delivery journal to {len(records)} records")
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Telegram Bot API
+
+Answers getMe, sendMessage, sendPhoto and sendDocument like api.telegram.org
+does, with configurable latency, 429 responses carrying retry_after, 403
+"bot was kicked" errors, groups upgraded to supergroups (400 with
+migrate_to_chat_id) and requests that hang past the client timeout. Point
+the bots at it with TELEGRAM_API_BASE=http://127.0.0.1:8081 to exercise
+broadcasts offline without messaging real groups.
+
+Usage:
+    python fake_telegram_api.py --port 8081 --latency 0.05 --rate-429 0.01
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import random
+import re
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlparse
+
+logger = logging.getLogger(__name__)
+
+_PATH_RE = re.compile(r'^/bot(?P<token>[^/]+)/(?P<method>\w+)$')
+_MULTIPART_CHAT_RE = re.compile(rb'name="chat_id"\r\n\r\n(-?\d+)')
+
+SEND_METHODS = {"sendMessage", "sendPhoto", "sendDocument"}
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # Deep listen backlog so a burst of new connections is not dropped
+    request_queue_size = 1024
+
+
+class FakeTelegramApi:
+    """
+    Configurable fake Bot API server running in a background thread.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, jitter=0.0, rate_429=0.0,
+                 retry_after=1, rate_403=0.0, forbidden_chats=(), migrated_chats=None,
+                 rate_timeout=0.0, timeout_delay=35.0, seed=None):
+        """
+        Args:
+            host (str): Interface to listen on
+            port (int): Port to listen on, 0 for any free port
+            latency (float): Base seconds added to every response
+            jitter (float): Extra random latency, uniform in [0, jitter]
+            rate_429 (float): Fraction of sends answered with 429 Too Many Requests
+            retry_after (int): retry_after sent with every 429
+            rate_403 (float): Fraction of chats that have kicked the bot
+            forbidden_chats (iterable): Chat IDs that always get 403
+            migrated_chats (dict): Old chat ID -> supergroup chat ID
+            rate_timeout (float): Fraction of sends that hang for timeout_delay
+            timeout_delay (float): Seconds a hanging request waits before answering
+            seed (int): Random seed for reproducible runs
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.rate_403 = rate_403
+        self.forbidden_chats = {int(chat_id) for chat_id in forbidden_chats}
+        self.migrated_chats = {int(old): int(new) for old, new in (migrated_chats or {}).items()}
+        self.rate_timeout = rate_timeout
+        self.timeout_delay = timeout_delay
+        self._random = random.Random(seed)
+        self._seed = seed if seed is not None else 0
+        self._lock = threading.Lock()
+        self._message_ids = itertools.count(1)
+        self.counters = {}
+        self.server = _Server((host, port), self._make_handler())
+        self._thread = None
+
+    @property
+    def base_url(self):
+        """
+        Returns:
+            str: URL to use as TELEGRAM_API_BASE
+        """
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """Serve requests in a background daemon thread."""
+        self._thread = threading.Thread(target=self.server.serve_forever,
+                                        name='fake-telegram-api', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and close the socket."""
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _count(self, method, code):
+        key = f"{method} {code}"
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + 1
+
+    def _chance(self, rate):
+        if rate <= 0:
+            return False
+        with self._lock:
+            return self._random.random() < rate
+
+    def _is_forbidden(self, chat_id):
+        if chat_id in self.forbidden_chats:
+            return True
+        # Decided per chat rather than per request, like a real kicked bot
+        return self.rate_403 > 0 and random.Random(chat_id ^ self._seed).random() < self.rate_403
+
+    def respond(self, method, chat_id):
+        """
+        Decide the reply to one Bot API call.
+
+        Returns:
+            tuple: (HTTP status, response dict, seconds to wait before answering)
+        """
+        delay = self.latency
+        if self.jitter:
+            with self._lock:
+                delay += self._random.uniform(0, self.jitter)
+
+        if method == "getMe":
+            return 200, {"ok": True, "result": {"id": 1, "is_bot": True, "first_name": "Fake",
+                                                "username": "fake_bot"}}, delay
+        if method not in SEND_METHODS:
+            return 404, {"ok": False, "error_code": 404, "description": "Not Found"}, delay
+
+        if self._chance(self.rate_timeout):
+            delay += self.timeout_delay
+        if chat_id is None:
+            return 400, {"ok": False, "error_code": 400,
+                         "description": "Bad Request: chat_id is empty"}, delay
+        if chat_id in self.migrated_chats:
+            return 400, {"ok": False, "error_code": 400,
+                         "description": "Bad Request: group chat was upgraded to a supergroup chat",
+                         "parameters": {"migrate_to_chat_id": self.migrated_chats[chat_id]}}, delay
+        if self._is_forbidden(chat_id):
+            return 403, {"ok": False, "error_code": 403,
+                         "description": "Forbidden: bot was kicked from the group chat"}, delay
+        if self._chance(self.rate_429):
+            return 429, {"ok": False, "error_code": 429,
+                         "description": f"Too Many Requests: retry after {self.retry_after}",
+                         "parameters": {"retry_after": self.retry_after}}, delay
+
+        message = {"message_id": next(self._message_ids), "chat": {"id": chat_id},
+                   "date": int(time.time())}
+        if method == "sendPhoto":
+            message["photo"] = [{"file_id": "fake-photo-small"}, {"file_id": "fake-photo"}]
+        elif method == "sendDocument":
+            message["document"] = {"file_id": "fake-document"}
+        return 200, {"ok": True, "result": message}, delay
+
+    def _make_handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _handle(self, body):
+                match = _PATH_RE.match(urlparse(self.path).path)
+                if not match:
+                    status, reply, delay = 404, {"ok": False, "error_code": 404,
+                                                 "description": "Not Found"}, 0
+                    method = "unknown"
+                else:
+                    method = match.group('method')
+                    status, reply, delay = api.respond(method, self._chat_id(body))
+                if delay:
+                    time.sleep(delay)
+                api._count(method, status)
+
+                payload = json.dumps(reply).encode('utf-8')
+                try:
+                    self.send_response(status)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client gave up (timeout) before the reply was ready
+                    self.close_connection = True
+
+            def _chat_id(self, body):
+                content_type = self.headers.get('Content-Type', '')
+                if content_type.startswith('multipart/'):
+                    match = _MULTIPART_CHAT_RE.search(body)
+                    return int(match.group(1)) if match else None
+                values = parse_qs(body.decode('utf-8', 'replace')).get('chat_id')
+                try:
+                    return int(values[0]) if values else None
+                except ValueError:
+                    return None
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                self._handle(self.rfile.read(length))
+
+            def do_GET(self):
+                self._handle(urlparse(self.path).query.encode('utf-8'))
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local fake Telegram Bot API server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds per response")
+    parser.add_argument('--jitter', type=float, default=0.0, help="extra random seconds")
+    parser.add_argument('--rate-429', type=float, default=0.0, help="fraction of 429 replies")
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--rate-403', type=float, default=0.0, help="fraction of kicked chats")
+    parser.add_argument('--rate-timeout', type=float, default=0.0, help="fraction of hung requests")
+    parser.add_argument('--timeout-delay', type=float, default=35.0)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    api = FakeTelegramApi(args.host, args.port, latency=args.latency, jitter=args.jitter,
+                          rate_429=args.rate_429, retry_after=args.retry_after,
+                          rate_403=args.rate_403, rate_timeout=args.rate_timeout,
+                          timeout_delay=args.timeout_delay, seed=args.seed)
+    logger.info(f"Fake Telegram API listening on {api.base_url}")
+    try:
+        api.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        api.server.server_close()
+        logger.info(f"Requests served: {json.dumps(api.counters, sort_keys=True)}")
+
+
+if __name__ == "__main__":
+    main()
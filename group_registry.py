@@ -0,0 +1,515 @@
+#!/usr/bin/env python3
+"""
+SQLite-backed registry of target groups
+
+Replaces the hardcoded GROUP_IDS list. Every group has its own attributes
+(enabled, message, schedule, timezone, last status) and groups due at a
+slot are streamed from an index in batches, so a broadcast to 100k+ groups
+never holds the whole list in memory.
+
+A group with no schedule receives every default slot; a group with a
+schedule (comma-separated HH:MM list) only receives those slots. Slot times
+are wall-clock times in the group's own timezone, or in the default
+timezone when the group has none.
+
+Chats the bot can no longer write to (kicked, deleted, no rights) are kept
+in a negative cache and skipped by broadcasts until their next re-probe,
+which backs off exponentially while the chat stays dead. Each entry names
+the bot that found the chat dead; with several bots an entry only holds
+while that bot still owns the chat.
+"""
+
+import csv
+import json
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REGISTRY_FILE = "groups.db"
+
+# Rows fetched per round-trip while streaming groups
+FETCH_BATCH = 1000
+
+# Buffered status updates written per transaction
+STATUS_BATCH = 500
+
+# Re-probe a dead chat after 6 hours, doubling up to once a week
+DEAD_PROBE_BASE = 6 * 3600
+DEAD_PROBE_MAX = 7 * 86400
+
+# Bad Request descriptions that mean the chat itself is unusable
+DEAD_CHAT_DESCRIPTIONS = [
+    ("chat not found", "not_found"),
+    ("group chat was deactivated", "deactivated"),
+    ("chat_write_forbidden", "no_rights"),
+    ("not enough rights", "no_rights"),
+    ("have no rights to send", "no_rights")
+]
+
+GROUP_FIELDS = ["chat_id", "enabled", "message", "schedule", "timezone", "title",
+                "last_status", "last_sent_at"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS groups (
+    chat_id INTEGER PRIMARY KEY,
+    enabled INTEGER NOT NULL DEFAULT 1,
+    message TEXT,
+    schedule TEXT,
+    timezone TEXT,
+    title TEXT,
+    last_status TEXT,
+    last_sent_at TEXT
+);
+CREATE TABLE IF NOT EXISTS group_slots (
+    slot TEXT NOT NULL,
+    chat_id INTEGER NOT NULL,
+    PRIMARY KEY (slot, chat_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_group_slots_chat ON group_slots(chat_id);
+CREATE TABLE IF NOT EXISTS dead_chats (
+    chat_id INTEGER PRIMARY KEY,
+    error_class TEXT NOT NULL,
+    error_code INTEGER,
+    description TEXT,
+    failures INTEGER NOT NULL DEFAULT 1,
+    first_failed_at TEXT,
+    last_failed_at TEXT,
+    next_probe_at REAL NOT NULL,
+    bot_id TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_groups_default_schedule ON groups(timezone, chat_id)
+    WHERE enabled = 1 AND schedule IS NULL;
+"""
+
+
+def parse_schedule(schedule):
+    """
+    Normalise a group schedule value.
+
+    Args:
+        schedule (str or list): Comma-separated HH:MM times, a list, or empty
+
+    Returns:
+        list: Validated HH:MM strings, empty for "every slot"
+    """
+    if not schedule:
+        return []
+    if isinstance(schedule, str):
+        schedule = schedule.split(',')
+    times = []
+    for item in schedule:
+        item = item.strip()
+        if item:
+            datetime.strptime(item, '%H:%M')
+            times.append(item)
+    return sorted(set(times))
+
+
+def dead_chat_class(result):
+    """
+    Decide whether a failed send means the bot can not write to the chat at all.
+
+    Args:
+        result: SendResult (or any object with error_code/description)
+
+    Returns:
+        str: Error class such as "forbidden" or "not_found", or None if the
+            failure says nothing about the chat (bad message, rate limit, ...);
+            "not_member" when the bot never joined or has left the chat, which
+            says nothing about other bots of a pool
+    """
+    error_code = getattr(result, 'error_code', None)
+    if error_code == 403:
+        description = (getattr(result, 'description', None) or '').lower()
+        return "not_member" if "not a member" in description else "forbidden"
+    if error_code == 400:
+        description = (getattr(result, 'description', None) or '').lower()
+        for fragment, error_class in DEAD_CHAT_DESCRIPTIONS:
+            if fragment in description:
+                return error_class
+    return None
+
+
+class GroupRegistry:
+    """
+    Group store with streaming queries and bulk import/export.
+    """
+
+    def __init__(self, path=DEFAULT_REGISTRY_FILE):
+        """
+        Args:
+            path (str): SQLite database file
+        """
+        self.path = path
+        self._write_lock = threading.Lock()
+        self._status_buffer = []
+        self._writer = self._connect(check_same_thread=False)
+        with self._writer:
+            self._writer.executescript(SCHEMA)
+
+    def _connect(self, check_same_thread=True):
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=check_same_thread)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def seed(self, chat_ids):
+        """
+        Fill an empty registry with the given chat IDs.
+
+        Returns:
+            int: Number of groups inserted
+        """
+        with self._write_lock, self._writer:
+            if self._writer.execute("SELECT 1 FROM groups LIMIT 1").fetchone():
+                return 0
+            self._writer.executemany("INSERT OR IGNORE INTO groups (chat_id) VALUES (?)",
+                                     [(int(chat_id),) for chat_id in chat_ids])
+        logger.info(f"Group registry seeded with {len(chat_ids)} groups")
+        return len(chat_ids)
+
+    def _upsert_many(self, conn, groups):
+        rows = []
+        slot_rows = []
+        chat_ids = []
+        for group in groups:
+            chat_id = int(group["chat_id"])
+            times = parse_schedule(group.get("schedule"))
+            enabled = group.get("enabled", True)
+            if isinstance(enabled, str):
+                enabled = enabled.strip().lower() not in ("0", "false", "no", "")
+            rows.append((chat_id, 1 if enabled else 0, group.get("message") or None,
+                         ",".join(times) or None, group.get("timezone") or None,
+                         group.get("title") or None))
+            chat_ids.append((chat_id,))
+            slot_rows.extend((slot, chat_id) for slot in times)
+
+        conn.executemany(
+            "INSERT INTO groups (chat_id, enabled, message, schedule, timezone, title) "
+            "VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(chat_id) DO UPDATE SET enabled=excluded.enabled, "
+            "message=excluded.message, schedule=excluded.schedule, "
+            "timezone=excluded.timezone, title=excluded.title", rows)
+        conn.executemany("DELETE FROM group_slots WHERE chat_id = ?", chat_ids)
+        conn.executemany("INSERT OR IGNORE INTO group_slots (slot, chat_id) VALUES (?, ?)",
+                         slot_rows)
+
+    def add_group(self, chat_id, enabled=True, message=None, schedule=None, timezone=None,
+                  title=None):
+        """Add a group or update its attributes."""
+        with self._write_lock, self._writer:
+            self._upsert_many(self._writer, [{
+                "chat_id": chat_id, "enabled": enabled, "message": message,
+                "schedule": schedule, "timezone": timezone, "title": title
+            }])
+
+    def remove_group(self, chat_id):
+        """
+        Returns:
+            bool: True if the group existed
+        """
+        with self._write_lock, self._writer:
+            self._writer.execute("DELETE FROM group_slots WHERE chat_id = ?", (chat_id,))
+            cursor = self._writer.execute("DELETE FROM groups WHERE chat_id = ?", (chat_id,))
+        return cursor.rowcount > 0
+
+    def count(self, enabled_only=True):
+        """
+        Returns:
+            int: Number of (enabled) groups
+        """
+        conn = self._connect()
+        try:
+            query = "SELECT COUNT(*) FROM groups"
+            if enabled_only:
+                query += " WHERE enabled = 1"
+            return conn.execute(query).fetchone()[0]
+        finally:
+            conn.close()
+
+    def _stream(self, query, params=()):
+        conn = self._connect()
+        try:
+            cursor = conn.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(FETCH_BATCH)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            conn.close()
+
+    def iter_due(self, slot=None, timezone=None, default_timezone=None,
+                 include_default_schedule=True, skip_dead=True):
+        """
+        Stream enabled groups due at a slot.
+
+        Args:
+            slot (str): HH:MM slot, or None for every enabled group
+            timezone (str): Timezone the slot belongs to; None matches any
+            default_timezone (str): Timezone of groups without their own
+            include_default_schedule (bool): Include groups without their own
+                schedule (i.e. slot is one of the default schedule times)
+            skip_dead (bool): Leave out dead chats that are not due for a re-probe
+
+        Yields:
+            tuple: (chat_id, message) where message is None for the default text
+        """
+        if skip_dead:
+            dead_filter = (" AND NOT EXISTS (SELECT 1 FROM dead_chats d "
+                           "WHERE d.chat_id = g.chat_id AND d.next_probe_at > ?)")
+            dead_params = (time.time(),)
+        else:
+            dead_filter, dead_params = "", ()
+
+        if slot is None:
+            return self._stream("SELECT g.chat_id, g.message FROM groups g WHERE g.enabled = 1" +
+                                dead_filter + " ORDER BY g.chat_id", dead_params)
+
+        if timezone is None:
+            tz_filter, tz_params = "", ()
+        elif timezone == default_timezone:
+            tz_filter, tz_params = " AND (g.timezone IS NULL OR g.timezone = ?)", (timezone,)
+        else:
+            tz_filter, tz_params = " AND g.timezone = ?", (timezone,)
+
+        query = ("SELECT g.chat_id, g.message FROM group_slots s "
+                 "JOIN groups g ON g.chat_id = s.chat_id "
+                 "WHERE s.slot = ? AND g.enabled = 1" + tz_filter + dead_filter)
+        params = (slot,) + tz_params + dead_params
+        if include_default_schedule:
+            query = ("SELECT g.chat_id, g.message FROM groups g "
+                     "WHERE g.enabled = 1 AND g.schedule IS NULL" + tz_filter + dead_filter +
+                     " UNION ALL " + query)
+            params = tz_params + dead_params + params
+        return self._stream(query, params)
+
+    def slot_keys(self):
+        """
+        List the (slot, timezone) pairs groups with their own schedule need.
+
+        Returns:
+            tuple: (set of (HH:MM, timezone or None) for explicit schedules,
+                    set of timezones (or None) used by default-schedule groups)
+        """
+        explicit = set(self._stream(
+            "SELECT DISTINCT s.slot, g.timezone FROM group_slots s "
+            "JOIN groups g ON g.chat_id = s.chat_id WHERE g.enabled = 1"))
+        default_zones = {row[0] for row in self._stream(
+            "SELECT DISTINCT timezone FROM groups WHERE enabled = 1 AND schedule IS NULL")}
+        return explicit, default_zones
+
+    def iter_groups(self):
+        """
+        Yields:
+            dict: Every group with all its attributes
+        """
+        query = f"SELECT {', '.join(GROUP_FIELDS)} FROM groups ORDER BY chat_id"
+        for row in self._stream(query):
+            yield dict(zip(GROUP_FIELDS, row))
+
+    def mark_dead(self, chat_id, error_class, error_code=None, description=None, now=None,
+                  bot_id=None):
+        """
+        Put a chat in the negative cache, or push back its next re-probe.
+
+        Args:
+            chat_id (int): Chat the bot can not write to
+            error_class (str): Result of dead_chat_class()
+            error_code (int): Bot API error code
+            description (str): Bot API error description
+            now (float): Current Unix time
+            bot_id (str): Bot whose send failed, None with a single bot
+
+        Returns:
+            float: Unix time of the next re-probe
+        """
+        now = time.time() if now is None else now
+        stamp = datetime.fromtimestamp(now).isoformat()
+        with self._write_lock, self._writer:
+            row = self._writer.execute("SELECT failures FROM dead_chats WHERE chat_id = ?",
+                                       (chat_id,)).fetchone()
+            failures = (row[0] if row else 0) + 1
+            next_probe_at = now + min(DEAD_PROBE_MAX, DEAD_PROBE_BASE * 2 ** (failures - 1))
+            self._writer.execute(
+                "INSERT INTO dead_chats (chat_id, error_class, error_code, description, failures, "
+                "first_failed_at, last_failed_at, next_probe_at, bot_id) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(chat_id) DO UPDATE SET error_class=excluded.error_class, "
+                "error_code=excluded.error_code, description=excluded.description, "
+                "failures=excluded.failures, last_failed_at=excluded.last_failed_at, "
+                "next_probe_at=excluded.next_probe_at, bot_id=excluded.bot_id",
+                (chat_id, error_class, error_code, description, failures, stamp, stamp,
+                 next_probe_at, bot_id))
+        return next_probe_at
+
+    def prune_dead_chats(self, owner_of):
+        """
+        Forget dead-chat entries found by a bot that no longer sends to the chat.
+
+        After bots are added to or dropped from a pool, the chat's new bot may
+        well be a member, so it gets a fresh try.
+
+        Args:
+            owner_of (callable): owner_of(chat_id) -> bot ID now sending to it
+
+        Returns:
+            int: Number of entries removed
+        """
+        stale = [(chat_id,) for chat_id, bot_id in
+                 self._stream("SELECT chat_id, bot_id FROM dead_chats WHERE bot_id IS NOT NULL")
+                 if owner_of(chat_id) != bot_id]
+        if stale:
+            with self._write_lock, self._writer:
+                self._writer.executemany("DELETE FROM dead_chats WHERE chat_id = ?", stale)
+        return len(stale)
+
+    def mark_alive(self, chat_id):
+        """
+        Remove a chat from the negative cache after a successful send.
+
+        Returns:
+            bool: True if the chat was marked dead
+        """
+        with self._write_lock, self._writer:
+            cursor = self._writer.execute("DELETE FROM dead_chats WHERE chat_id = ?", (chat_id,))
+        return cursor.rowcount > 0
+
+    def dead_chat_ids(self):
+        """
+        Returns:
+            set: Every chat in the negative cache, due for a re-probe or not
+        """
+        return {row[0] for row in self._stream("SELECT chat_id FROM dead_chats")}
+
+    def count_dead(self, now=None):
+        """
+        Returns:
+            int: Dead chats currently skipped by broadcasts
+        """
+        now = time.time() if now is None else now
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT COUNT(*) FROM dead_chats WHERE next_probe_at > ?",
+                                (now,)).fetchone()[0]
+        finally:
+            conn.close()
+
+    def migrate_chat(self, old_chat_id, new_chat_id):
+        """
+        Move a group to its new chat ID after an upgrade to a supergroup.
+
+        The group keeps its attributes and schedule. If the new ID is already
+        registered, the old entry is simply dropped.
+        """
+        with self._write_lock, self._writer:
+            exists = self._writer.execute("SELECT 1 FROM groups WHERE chat_id = ?",
+                                          (new_chat_id,)).fetchone()
+            if exists:
+                self._writer.execute("DELETE FROM group_slots WHERE chat_id = ?", (old_chat_id,))
+                self._writer.execute("DELETE FROM groups WHERE chat_id = ?", (old_chat_id,))
+            else:
+                self._writer.execute("UPDATE groups SET chat_id = ? WHERE chat_id = ?",
+                                     (new_chat_id, old_chat_id))
+                self._writer.execute("UPDATE group_slots SET chat_id = ? WHERE chat_id = ?",
+                                     (new_chat_id, old_chat_id))
+            self._writer.execute("DELETE FROM dead_chats WHERE chat_id IN (?, ?)",
+                                 (old_chat_id, new_chat_id))
+        logger.info(f"Group {old_chat_id} migrated to {new_chat_id}")
+
+    def record_status(self, chat_id, status):
+        """
+        Buffer a group's last send status; written in batches.
+
+        Args:
+            chat_id (int): Target chat
+            status (str): Status label, e.g. "sent" or "failed"
+        """
+        with self._write_lock:
+            self._status_buffer.append((status, datetime.now().isoformat(), chat_id))
+            if len(self._status_buffer) >= STATUS_BATCH:
+                self._flush_statuses()
+
+    def flush(self):
+        """Write any buffered status updates."""
+        with self._write_lock:
+            self._flush_statuses()
+
+    def _flush_statuses(self):
+        if not self._status_buffer:
+            return
+        try:
+            with self._writer:
+                self._writer.executemany(
+                    "UPDATE groups SET last_status = ?, last_sent_at = ? WHERE chat_id = ?",
+                    self._status_buffer)
+        except sqlite3.Error as e:
+            logger.error(f"Failed to save group statuses: {str(e)}")
+        self._status_buffer = []
+
+    def import_groups(self, path, batch_size=FETCH_BATCH):
+        """
+        Bulk import groups from a CSV (with header) or JSON-lines file.
+
+        Existing groups are updated, new ones added. The file is streamed
+        and committed in batches.
+
+        Returns:
+            int: Number of groups imported
+        """
+        def read_rows():
+            with open(path, 'r', encoding='utf-8', newline='') as f:
+                if path.endswith('.csv'):
+                    yield from csv.DictReader(f)
+                else:
+                    for line in f:
+                        if line.strip():
+                            yield json.loads(line)
+
+        imported = 0
+        batch = []
+        with self._write_lock:
+            for row in read_rows():
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    with self._writer:
+                        self._upsert_many(self._writer, batch)
+                    imported += len(batch)
+                    batch = []
+            if batch:
+                with self._writer:
+                    self._upsert_many(self._writer, batch)
+                imported += len(batch)
+        logger.info(f"Imported {imported} groups from {path}")
+        return imported
+
+    def export_groups(self, path):
+        """
+        Stream every group to a CSV or JSON-lines file (by extension).
+
+        Returns:
+            int: Number of groups exported
+        """
+        exported = 0
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            if path.endswith('.csv'):
+                writer = csv.DictWriter(f, fieldnames=GROUP_FIELDS)
+                writer.writeheader()
+                for group in self.iter_groups():
+                    writer.writerow(group)
+                    exported += 1
+            else:
+                for group in self.iter_groups():
+                    f.write(json.dumps(group, ensure_ascii=False) + '\n')
+                    exported += 1
+        logger.info(f"Exported {exported} groups to {path}")
+        return exported
+
+    def close(self):
+        """Flush buffered statuses and close the database."""
+        self.flush()
+        self._writer.close()
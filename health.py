@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Cached health status for the HTTP health endpoints
+
+A background thread re-checks the bot token every few minutes and keeps
+the result in memory. Health probes only read that cached result, so they
+never make a network round-trip to Telegram.
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# How long a token check result is considered fresh (seconds)
+DEFAULT_TTL = 300
+
+# Retry sooner while the bot is unhealthy
+DEFAULT_FAILURE_TTL = 30
+
+
+class HealthMonitor:
+    """
+    Refreshes the bot status in the background and serves it from memory.
+    """
+
+    def __init__(self, check_func, ttl=DEFAULT_TTL, failure_ttl=DEFAULT_FAILURE_TTL):
+        """
+        Args:
+            check_func (callable): Returns True when the bot token is valid
+            ttl (float): Seconds between checks while healthy
+            failure_ttl (float): Seconds between checks while unhealthy
+        """
+        self.check_func = check_func
+        self.ttl = ttl
+        self.failure_ttl = failure_ttl
+        self._lock = threading.Lock()
+        self._healthy = None
+        self._checked_at = None
+        self._checked_monotonic = None
+        self._ready = False
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the background refresh thread."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._refresh_loop, name='health-refresh',
+                                        daemon=True)
+        self._thread.start()
+
+    def record(self, healthy):
+        """
+        Store a check result, e.g. one made during startup.
+
+        Args:
+            healthy (bool): Whether the bot token is valid
+        """
+        with self._lock:
+            self._healthy = bool(healthy)
+            self._checked_at = datetime.now()
+            self._checked_monotonic = time.monotonic()
+
+    def refresh_now(self):
+        """Ask the background thread to re-check immediately."""
+        self._wakeup.set()
+
+    def set_ready(self, ready=True):
+        """
+        Mark whether the service has finished starting up.
+
+        Args:
+            ready (bool): True once the schedule is running
+        """
+        with self._lock:
+            self._ready = ready
+
+    def _seconds_until_due(self):
+        with self._lock:
+            if self._checked_monotonic is None:
+                return 0
+            ttl = self.ttl if self._healthy else self.failure_ttl
+            return self._checked_monotonic + ttl - time.monotonic()
+
+    def _refresh_loop(self):
+        while True:
+            delay = self._seconds_until_due()
+            if delay > 0 and not self._wakeup.wait(delay):
+                continue
+            self._wakeup.clear()
+
+            try:
+                self.record(self.check_func())
+            except Exception as e:
+                logger.error(f"Health check refresh failed: {str(e)}")
+                self.record(False)
+
+    def is_live(self):
+        """
+        Returns:
+            bool: Always True while the process can serve requests
+        """
+        return True
+
+    def is_ready(self):
+        """
+        Returns:
+            bool: True when startup finished and the last token check passed
+        """
+        with self._lock:
+            return self._ready and bool(self._healthy)
+
+    def status(self):
+        """
+        Returns:
+            dict: Cached bot status for the /health response
+        """
+        with self._lock:
+            if self._healthy is None:
+                bot_status = "unknown"
+            else:
+                bot_status = "healthy" if self._healthy else "unhealthy"
+            age = None
+            if self._checked_monotonic is not None:
+                age = round(time.monotonic() - self._checked_monotonic, 1)
+            return {
+                "bot_status": bot_status,
+                "ready": self._ready and bool(self._healthy),
+                "last_checked": self._checked_at.isoformat() if self._checked_at else None,
+                "check_age_seconds": age
+            }
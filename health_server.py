@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+HTTP health check and admin API server of telegram_bot
+
+Serves /health, /live, /ready and /metrics from memory and hands
+authenticated /admin/ requests to the bot. It lives in its own module so
+http.server is only imported once the bot starts serving, not for CLI
+commands that merely read or edit the schedule.
+"""
+
+import hmac
+import json
+import logging
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from metrics import CONTENT_TYPE, render as render_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class HealthCheckHandler(BaseHTTPRequestHandler):
+    """
+    HTTP handler for health checks.
+
+    Every endpoint answers from memory; the bot status is refreshed in the
+    background by the bot's health monitor.
+    """
+
+    def _send_json(self, status_code, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status_code)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        body = json.loads(self.rfile.read(length))
+        if not isinstance(body, dict):
+            raise ValueError("Request body must be a JSON object")
+        return body
+
+    def _handle_admin(self, method):
+        """Authenticate and dispatch an /admin/ request"""
+        admin_token = self.server.admin_token
+        if not admin_token or self.server.admin_handler is None:
+            self._send_json(503, {"error": "Admin API is not enabled"})
+            return
+        expected = f"Bearer {admin_token}".encode('utf-8')
+        if not hmac.compare_digest(self.headers.get('Authorization', '').encode('utf-8'), expected):
+            self._send_json(401, {"error": "Unauthorized"})
+            return
+        try:
+            body = self._read_json() if method == 'POST' else {}
+            status_code, payload = self.server.admin_handler(method, self.path, body)
+        except ValueError as e:
+            status_code, payload = 400, {"error": str(e)}
+        except Exception as e:
+            logger.error(f"Admin request {method} {self.path} failed: {str(e)}")
+            status_code, payload = 500, {"error": str(e)}
+        self._send_json(status_code, payload)
+
+    def _send_not_found(self):
+        self.send_response(404)
+        self.send_header('Content-type', 'text/plain')
+        self.send_header('Content-Length', '9')
+        self.end_headers()
+        self.wfile.write(b'Not Found')
+
+    def do_POST(self):
+        """Handle admin API POST requests"""
+        if self.path.startswith('/admin/'):
+            self._handle_admin('POST')
+        else:
+            self._send_not_found()
+
+    def do_DELETE(self):
+        """Handle admin API DELETE requests"""
+        if self.path.startswith('/admin/'):
+            self._handle_admin('DELETE')
+        else:
+            self._send_not_found()
+
+    def do_GET(self):
+        """Handle GET requests for health check"""
+        if self.path.startswith('/admin/'):
+            self._handle_admin('GET')
+        elif self.path == '/health' or self.path == '/':
+            self._send_json(200, self.server.status())
+        elif self.path == '/metrics':
+            body = render_metrics()
+            self.send_response(200)
+            self.send_header('Content-type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif self.path == '/live':
+            self._send_json(200, {"status": "alive"})
+        elif self.path == '/ready':
+            ready, details = self.server.readiness()
+            if ready:
+                self._send_json(200, {"status": "ready"})
+            else:
+                self._send_json(503, {"status": "not ready", **details})
+        else:
+            self._send_not_found()
+
+    def log_message(self, format, *args):
+        """Override to reduce HTTP server logging noise"""
+        pass
+
+
+class HealthCheckServer(ThreadingHTTPServer):
+    """Threaded health server with a listen backlog deep enough for probe bursts"""
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address, status, readiness, admin_handler=None, admin_token=None,
+                 handler_class=HealthCheckHandler, sock=None):
+        """
+        Args:
+            address (tuple): (host, port) to listen on
+            status (callable): Returns the /health payload
+            readiness (callable): Returns (ready, details) for /ready
+            admin_handler (callable): admin_handler(method, path, body) ->
+                (status code, payload) for authenticated /admin/ requests
+            admin_token (str): Bearer token of the admin API, None to disable it
+            sock (socket.socket): Already listening socket to serve instead of
+                binding address, e.g. one inherited from the supervisor
+        """
+        self.status = status
+        self.readiness = readiness
+        self.admin_handler = admin_handler
+        self.admin_token = admin_token
+        super().__init__(address, handler_class, bind_and_activate=sock is None)
+        if sock is not None:
+            self.socket.close()
+            self.socket = sock
+            self.server_address = sock.getsockname()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Single-instance lock on a PID file
+
+The PID file is held with an exclusive fcntl lock for the whole life of the
+process. Unlike checking whether the PID written in the file is still alive,
+this has no window in which two starting processes both see a free slot,
+and the kernel drops the lock the moment the holder dies, so a stale file
+never blocks a restart. The file is never deleted: removing a locked file
+would let the next process lock a different inode under the same name.
+
+Other processes can ask whether the holder is alive through a second lock
+on "<path>.alive", held for as long as the main one. Probing that file never
+touches the PID file lock, so a probe can not make the holder's own start
+fail, and like the main lock it is gone the moment the holder dies, whatever
+PID the kernel hands out next.
+"""
+
+import fcntl
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class InstanceLock:
+    """
+    Exclusive fcntl lock held on a PID file.
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): PID file, e.g. "telegram_bot.pid"
+        """
+        self.path = path
+        self.alive_path = path + '.alive'
+        self._fd = None
+        self._alive_fd = None
+
+    def acquire(self, timeout=0, poll=0.1):
+        """
+        Take the lock and write this process's PID.
+
+        Args:
+            timeout (float): Seconds to wait for the current holder to exit
+            poll (float): Seconds between attempts while waiting
+
+        Returns:
+            bool: False if another live process holds the lock
+        """
+        if self._fd is not None:
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        give_up_at = time.monotonic() + timeout
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if time.monotonic() >= give_up_at:
+                    os.close(fd)
+                    return False
+                time.sleep(poll)
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode('ascii'))
+        self._fd = fd
+        # Blocking: a holder_alive() probe keeps this lock only for an instant
+        self._alive_fd = os.open(self.alive_path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self._alive_fd, fcntl.LOCK_EX)
+        return True
+
+    def holder_pid(self):
+        """
+        Returns:
+            int: PID written by the current holder, or None if unknown
+        """
+        try:
+            with open(self.path, 'r') as f:
+                return int(f.read().strip())
+        except (OSError, ValueError):
+            return None
+
+    def holder_alive(self):
+        """
+        Tell other processes whether a live process holds the lock.
+
+        Probes the lock on alive_path, not the PID, so a crashed holder whose
+        PID was reused by an unrelated process does not count as alive.
+
+        Returns:
+            bool: True if a running process holds the lock
+        """
+        try:
+            fd = os.open(self.alive_path, os.O_RDONLY)
+        except FileNotFoundError:
+            return False
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return True
+        finally:
+            # Closing the descriptor also drops the shared lock if we got it
+            os.close(fd)
+        return False
+
+    def release(self):
+        """Drop the lock; the file stays for the next holder."""
+        if self._fd is None:
+            return
+        if self._alive_fd is not None:
+            os.close(self._alive_fd)
+            self._alive_fd = None
+        try:
+            os.ftruncate(self._fd, 0)
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        except OSError as e:
+            logger.debug(f"Could not release {self.path}: {e}")
+        finally:
+            os.close(self._fd)
+            self._fd = None
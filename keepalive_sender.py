@@ -5,22 +5,56 @@ Designed to work even when main processes fail
 """
 
 import time
-import requests
+import logging
 import os
 import json
 from datetime import datetime, timedelta
 import subprocess
 import threading
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 import signal
 import sys
 
+from bot_api import BotApiClient
+from broadcast import BroadcastEngine
+from group_registry import GroupRegistry
+from instance_lock import InstanceLock
+from leader_lease import LeaderLease
+from logging_setup import setup_logging
+from metrics import BROADCAST_SECONDS, CONTENT_TYPE, render as render_metrics
+from rate_limiter import RateLimiter
+from timer_scheduler import TimerScheduler, resolve_timezone
+
+LOG_FILE = 'keepalive.log'
+logger = logging.getLogger(__name__)
+
 # Configuration
 BOT_TOKEN = os.getenv('BOT_TOKEN', '8093207171:AAGoIRsBcpBXPfLRz4RvXv3wMwdmEib6jn4')
+# Seeds the shared group registry (groups.db) if it is empty
 GROUP_IDS = [-1002111810768, -1002098871252, -1001927958845, -1001508552538, -1001988059903]
 SCHEDULE_TIMES = ["09:00", "14:45", "17:00", "21:00"]
 LAST_SEND_FILE = "keepalive_last_send.json"
 PORT = 5001
+TIMEZONE = "GMT+3"
+GMT_PLUS3 = resolve_timezone(TIMEZONE)
+HEARTBEAT_INTERVAL = 1800
+BROADCAST_WORKERS = 16
+
+# Pooled keep-alive connection to the Bot API (short timeouts, this sender must not hang)
+api_client = BotApiClient(BOT_TOKEN, pool_size=BROADCAST_WORKERS, timeouts={"sendMessage": 10})
+
+# Global and per-chat token buckets (Telegram limits: ~30 msg/s, ~20 msg/min per group)
+rate_limiter = RateLimiter()
+
+# Only the holder of the shared lease broadcasts (see leader_lease.py). While
+# telegram_bot runs it always sends, with its own config, registry schedule
+# and message; keepalive_sender is only the backup for when it is down
+TELEGRAM_BOT_PID_FILE = "telegram_bot.pid"
+leader_lease = LeaderLease("keepalive_sender", "broadcast_leader.lease",
+                           defer_to=InstanceLock(TELEGRAM_BOT_PID_FILE).holder_alive)
+
+# Group registry shared with telegram_bot
+group_registry = None
 
 MESSAGE = """🔔 Наші інші корисні Telegram-групи:
 
@@ -40,6 +74,15 @@ MESSAGE = """🔔 Наші інші корисні Telegram-групи:
 
 class KeepAliveHandler(BaseHTTPRequestHandler):
     def do_GET(self):
+        if self.path == '/metrics':
+            body = render_metrics()
+            self.send_response(200)
+            self.send_header('Content-type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        
         self.send_response(200)
         self.send_header('Content-type', 'application/json')
         self.end_headers()
@@ -51,6 +94,7 @@ class KeepAliveHandler(BaseHTTPRequestHandler):
             "service": "keepalive-sender",
             "current_time_gmt3": current_time.strftime("%Y-%m-%d %H:%M:%S"),
             "schedule": SCHEDULE_TIMES,
+            "leader_lease": leader_lease.status(),
             "last_check": current_time.isoformat()
         }
         
@@ -60,25 +104,14 @@ class KeepAliveHandler(BaseHTTPRequestHandler):
         pass
 
 def log(message):
-    """Simple logging"""
-    timestamp = datetime.utcnow() + timedelta(hours=3)
-    print(f"{timestamp.strftime('%Y-%m-%d %H:%M:%S')} - {message}")
-    
-    # Also write to file
-    try:
-        with open("keepalive.log", "a") as f:
-            f.write(f"{timestamp.strftime('%Y-%m-%d %H:%M:%S')} - {message}\n")
-    except:
-        pass
+    """Log through the shared queued logger"""
+    logger.info(message)
 
 def send_message(chat_id, text):
     """Send message to Telegram"""
     try:
-        url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
-        data = {"chat_id": chat_id, "text": text}
-        
-        response = requests.post(url, data=data, timeout=10)
-        result = response.json()
+        rate_limiter.acquire(chat_id)
+        result = api_client.send_message(chat_id, text)
         
         if result.get('ok'):
             log(f"Message sent to {chat_id}")
@@ -90,27 +123,36 @@ def send_message(chat_id, text):
         log(f"Error sending to {chat_id}: {str(e)}")
         return False
 
-def send_to_all():
-    """Send to all groups"""
+def get_group_registry():
+    """Open the shared group registry on first use"""
+    global group_registry
+    if group_registry is None:
+        group_registry = GroupRegistry("groups.db")
+        group_registry.seed(GROUP_IDS)
+    return group_registry
+
+def send_to_all(schedule_time=None):
+    """Send to all groups due at schedule_time (all enabled groups if None)"""
     log("Starting keepalive broadcast")
-    success_count = 0
+    deliveries = ((chat_id, message or MESSAGE)
+                  for chat_id, message in get_group_registry().iter_due(
+                      schedule_time, timezone=TIMEZONE, default_timezone=TIMEZONE))
+    engine = BroadcastEngine(send_message, max_workers=BROADCAST_WORKERS)
+    started = time.monotonic()
+    success_count, total = engine.run(deliveries)
+    BROADCAST_SECONDS.labels(schedule_time or "manual").observe(time.monotonic() - started)
     
-    for chat_id in GROUP_IDS:
-        if send_message(chat_id, MESSAGE):
-            success_count += 1
-        time.sleep(1)
-    
-    log(f"Keepalive broadcast completed: {success_count}/{len(GROUP_IDS)}")
+    log(f"Keepalive broadcast completed: {success_count}/{total}")
     return success_count
 
 def get_current_time_gmt3():
     """Get current time in GMT+3"""
     return datetime.utcnow() + timedelta(hours=3)
 
-def should_send():
-    """Check if we should send now"""
+def should_send(schedule_time=None):
+    """Check if we should send now (or for the given scheduled slot)"""
     current_time = get_current_time_gmt3()
-    current_time_str = current_time.strftime("%H:%M")
+    current_time_str = schedule_time or current_time.strftime("%H:%M")
     
     if current_time_str not in SCHEDULE_TIMES:
         return False
@@ -132,12 +174,12 @@ def should_send():
     
     return True
 
-def record_send():
+def record_send(schedule_time=None):
     """Record that we sent"""
     current_time = get_current_time_gmt3()
     data = {
         'timestamp': current_time.isoformat(),
-        'schedule_time': current_time.strftime("%H:%M")
+        'schedule_time': schedule_time or current_time.strftime("%H:%M")
     }
     
     try:
@@ -149,12 +191,14 @@ def record_send():
 def start_http_server():
     """Start HTTP server in background"""
     try:
-        server = HTTPServer(('0.0.0.0', PORT), KeepAliveHandler)
+        server = ThreadingHTTPServer(('0.0.0.0', PORT), KeepAliveHandler)
+        server.daemon_threads = True
         server_thread = threading.Thread(target=server.serve_forever, daemon=True)
         server_thread.start()
         log(f"HTTP server started on port {PORT}")
         
         # Test the server
+        import requests
         time.sleep(1)
         test_response = requests.get(f"http://localhost:{PORT}", timeout=5)
         if test_response.status_code == 200:
@@ -169,39 +213,48 @@ def signal_handler(signum, frame):
     log("Received shutdown signal")
     sys.exit(0)
 
+def run_slot(schedule_time):
+    """Send the broadcast for one scheduled slot"""
+    if not leader_lease.try_acquire():
+        log(f"Slot {schedule_time}: telegram_bot or another sender holds the broadcast lease, "
+            f"standing by")
+        return
+    
+    if should_send(schedule_time):
+        log(f"Time {schedule_time} matches schedule")
+        success_count = send_to_all(schedule_time)
+        
+        if success_count > 0:
+            record_send(schedule_time)
+            log(f"Successfully sent {success_count} messages")
+
+def log_heartbeat():
+    """Log that the sender is still alive"""
+    log(f"Keepalive heartbeat - {get_current_time_gmt3().strftime('%H:%M')} GMT+3")
+
 def main():
     """Main function"""
+    # Configure logging (queued JSON lines in a rotating file, plus stdout)
+    setup_logging(LOG_FILE)
+    
     # Register signal handlers
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
     
     log("Keepalive sender started")
+    leader_lease.start()
     
     # Start HTTP server
     server = start_http_server()
     
-    # Main loop
-    while True:
-        try:
-            current_time = get_current_time_gmt3()
-            
-            # Log every 30 minutes
-            if current_time.minute % 30 == 0:
-                log(f"Keepalive heartbeat - {current_time.strftime('%H:%M')} GMT+3")
-            
-            if should_send():
-                log(f"Time {current_time.strftime('%H:%M')} matches schedule")
-                success_count = send_to_all()
-                
-                if success_count > 0:
-                    record_send()
-                    log(f"Successfully sent {success_count} messages")
-            
-            time.sleep(60)  # Check every minute
-            
-        except Exception as e:
-            log(f"Error in main loop: {e}")
-            time.sleep(60)
+    # Sleep until each scheduled time instead of checking every minute
+    scheduler = TimerScheduler()
+    for schedule_time in SCHEDULE_TIMES:
+        scheduler.add_daily(schedule_time, lambda t=schedule_time: run_slot(t), tz=GMT_PLUS3,
+                            name=f"slot {schedule_time}", background=True)
+    scheduler.add_interval(HEARTBEAT_INTERVAL, log_heartbeat, name="heartbeat")
+    
+    scheduler.run_forever()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
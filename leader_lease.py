@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Single-leader lease shared by telegram_bot, cron_sender and keepalive_sender
+
+All senders run side by side for redundancy, but only the process holding
+the lease may broadcast. The lease is an fcntl-locked file: the kernel drops
+the lock the moment the holder dies, and a standby polling every couple of
+seconds takes over. Each takeover bumps a fencing token stored in the file,
+so a leader can verify it was not replaced before it sends.
+
+A standby given defer_to never takes the lease while defer_to() is true and
+hands it back within a heartbeat once it becomes true; cron_sender and
+keepalive_sender use this to lead only while telegram_bot is not running.
+"""
+
+import fcntl
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEASE_FILE = "broadcast_leader.lease"
+HEARTBEAT_INTERVAL = 5   # seconds between heartbeats written by the leader
+STANDBY_POLL = 2         # seconds between takeover attempts by a standby
+
+
+class LeaderLease:
+    """
+    fcntl-locked lease file with a heartbeat and a fencing token.
+    """
+
+    def __init__(self, holder, path=DEFAULT_LEASE_FILE, heartbeat_interval=HEARTBEAT_INTERVAL,
+                 standby_poll=STANDBY_POLL, on_acquire=None, defer_to=None):
+        """
+        Args:
+            holder (str): Name of this process, e.g. "telegram_bot"
+            path (str): Lease file shared by all senders
+            heartbeat_interval (float): Seconds between heartbeats while leading
+            standby_poll (float): Seconds between takeover attempts while standby
+            on_acquire (callable): Called in a new thread after becoming leader
+            defer_to (callable): Returns True while a preferred sender is
+                running; this process then stays standby
+        """
+        self.holder = f"{holder}@{socket.gethostname()}:{os.getpid()}"
+        self.path = path
+        self.heartbeat_interval = heartbeat_interval
+        self.standby_poll = standby_poll
+        self.on_acquire = on_acquire
+        self.defer_to = defer_to
+        self._lock = threading.Lock()
+        self._fd = None
+        self.token = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _read_state(self, fd):
+        try:
+            os.lseek(fd, 0, os.SEEK_SET)
+            data = os.read(fd, 4096)
+            return json.loads(data.decode('utf-8')) if data.strip() else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _write_state(self, fd, state):
+        data = json.dumps(state).encode('utf-8')
+        os.lseek(fd, 0, os.SEEK_SET)
+        os.ftruncate(fd, 0)
+        os.write(fd, data)
+        os.fsync(fd)
+
+    def try_acquire(self):
+        """
+        Try to become leader without blocking.
+
+        Returns:
+            bool: True if this process holds the lease
+        """
+        if self._should_defer():
+            return False
+        with self._lock:
+            if self._fd is not None:
+                return True
+
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                return False
+
+            state = self._read_state(fd)
+            self.token = int(state.get("token", 0)) + 1
+            previous = state.get("holder")
+            self._write_state(fd, {
+                "holder": self.holder,
+                "token": self.token,
+                "acquired_at": datetime.now().isoformat(),
+                "heartbeat": time.time()
+            })
+            self._fd = fd
+
+        logger.info(f"Acquired broadcast leadership (fencing token {self.token}, previous holder {previous})")
+        if self.on_acquire is not None:
+            threading.Thread(target=self.on_acquire, name='leader-on-acquire', daemon=True).start()
+        return True
+
+    def _should_defer(self):
+        """Release the lease, if held, while defer_to() says to stand by."""
+        if self.defer_to is None or not self.defer_to():
+            return False
+        with self._lock:
+            if self._fd is not None:
+                logger.info("A preferred sender is running, handing the broadcast lease back")
+                self._release_locked()
+        return True
+
+    def is_leader(self):
+        """
+        Returns:
+            bool: True while this process holds the lease
+        """
+        with self._lock:
+            return self._fd is not None
+
+    def check_fencing(self):
+        """
+        Verify the lease file still carries our fencing token.
+
+        Returns:
+            bool: True if this process is the current, unreplaced leader
+        """
+        with self._lock:
+            if self._fd is None:
+                return False
+            return self._read_state(self._fd).get("token") == self.token
+
+    def heartbeat(self):
+        """Refresh the leader heartbeat in the lease file."""
+        with self._lock:
+            if self._fd is None:
+                return
+            state = self._read_state(self._fd)
+            if state.get("token") != self.token:
+                logger.error("Lease fencing token changed underneath us, giving up leadership")
+                self._release_locked()
+                return
+            state["heartbeat"] = time.time()
+            self._write_state(self._fd, state)
+
+    def _release_locked(self):
+        if self._fd is not None:
+            try:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            finally:
+                os.close(self._fd)
+                self._fd = None
+
+    def release(self):
+        """Give up leadership so a standby can take over."""
+        with self._lock:
+            self._release_locked()
+
+    def status(self):
+        """
+        Returns:
+            dict: Current lease state for health endpoints
+        """
+        try:
+            with open(self.path, 'r') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {}
+        heartbeat = state.get("heartbeat")
+        return {
+            "is_leader": self.is_leader(),
+            "leader": state.get("holder"),
+            "fencing_token": state.get("token"),
+            "heartbeat_age_seconds": round(time.time() - heartbeat, 1) if heartbeat else None
+        }
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if self.is_leader() and not self._should_defer():
+                    self.heartbeat()
+                    delay = self.heartbeat_interval
+                else:
+                    self.try_acquire()
+                    delay = self.heartbeat_interval if self.is_leader() else self.standby_poll
+            except Exception as e:
+                logger.error(f"Leader lease error: {str(e)}")
+                delay = self.standby_poll
+            self._stop.wait(delay)
+
+    def start(self):
+        """Start competing for the lease in a background thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='leader-lease', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the background thread and release the lease."""
+        self._stop.set()
+        self.release()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Shared non-blocking logging setup for telegram_bot, cron_sender and keepalive_sender
+
+Loggers only put records on an in-memory queue. A single listener thread
+formats them and does all file and console I/O, so a broadcast never
+waits on a disk write. The log file is written as JSON lines and rotated
+by size and by time; rotated files are gzip-compressed and only the newest
+ones are kept.
+
+Settings can be overridden per deployment with environment variables:
+LOG_LEVEL, LOG_MAX_BYTES, LOG_ROTATE_SECONDS and LOG_BACKUP_COUNT.
+
+Each entry point calls setup_logging() from its main(), not at import, so
+importing a module or running a quick CLI command never touches log files.
+"""
+
+import atexit
+import copy
+import glob
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import sys
+import time
+from datetime import datetime, timezone
+
+CONSOLE_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024  # rotate when the file reaches 10 MB
+DEFAULT_ROTATE_SECONDS = 86400        # ... or once a day (UTC midnight)
+DEFAULT_BACKUP_COUNT = 14             # compressed files kept per log
+
+_listener = None
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """
+    One JSON object per line: time, level, logger, message (and traceback).
+    """
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc)
+                            .isoformat(timespec='milliseconds'),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that keeps the traceback apart from the message, so the
+    JSON lines get a separate "exception" field.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class CompressingRotatingFileHandler(logging.handlers.BaseRotatingHandler):
+    """
+    File handler rotating on size or time, gzip-compressing old files.
+
+    Rotated files are named <file>.<YYYYmmdd-HHMMSS>.gz.
+    """
+
+    def __init__(self, filename, max_bytes=DEFAULT_MAX_BYTES,
+                 rotate_seconds=DEFAULT_ROTATE_SECONDS, backup_count=DEFAULT_BACKUP_COUNT,
+                 encoding='utf-8'):
+        """
+        Args:
+            filename (str): Active log file
+            max_bytes (int): Size limit, 0 to disable size rotation
+            rotate_seconds (int): Rotation period, 0 to disable time rotation
+            backup_count (int): Compressed files to keep
+        """
+        super().__init__(filename, 'a', encoding=encoding, delay=False)
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.backup_count = backup_count
+        self.rollover_at = self._next_rollover(time.time())
+
+    def _next_rollover(self, now):
+        if not self.rotate_seconds:
+            return None
+        return now - (now % self.rotate_seconds) + self.rotate_seconds
+
+    def shouldRollover(self, record):
+        if self.stream is None:
+            self.stream = self._open()
+        if self.rollover_at is not None and record.created >= self.rollover_at:
+            return True
+        if self.max_bytes and self.stream.tell() >= self.max_bytes:
+            return True
+        return False
+
+    def doRollover(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+
+        now = time.time()
+        if os.path.exists(self.baseFilename) and os.path.getsize(self.baseFilename) > 0:
+            stamp = datetime.fromtimestamp(now, timezone.utc).strftime('%Y%m%d-%H%M%S')
+            rotated = f"{self.baseFilename}.{stamp}"
+            suffix = 1
+            while os.path.exists(rotated + '.gz'):
+                rotated = f"{self.baseFilename}.{stamp}-{suffix}"
+                suffix += 1
+            os.replace(self.baseFilename, rotated)
+            with open(rotated, 'rb') as source, gzip.open(rotated + '.gz', 'wb') as target:
+                shutil.copyfileobj(source, target)
+            os.remove(rotated)
+            self._prune()
+
+        self.rollover_at = self._next_rollover(now)
+        self.stream = self._open()
+
+    def _prune(self):
+        backups = sorted(glob.glob(glob.escape(self.baseFilename) + '.*.gz'), key=os.path.getmtime)
+        for old in backups[:-self.backup_count] if self.backup_count else backups:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def setup_console_logging(level=logging.WARNING):
+    """
+    Log to stderr only, for short-lived CLI commands.
+
+    Does nothing if setup_logging() already configured logging.
+
+    Args:
+        level (int): Root level
+    """
+    if _listener is None:
+        logging.basicConfig(level=level, format=CONSOLE_FORMAT)
+
+
+def setup_logging(log_file, level=None):
+    """
+    Route all logging through a queue to a rotating JSON-lines file and stdout.
+
+    Safe to call more than once; only the first call configures logging.
+
+    Args:
+        log_file (str): Log file of the calling script
+        level (int): Root level, defaults to LOG_LEVEL or INFO
+
+    Returns:
+        logging.handlers.QueueListener: The listener doing the actual I/O
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    if level is None:
+        level = getattr(logging, os.environ.get('LOG_LEVEL', 'INFO').upper(), logging.INFO)
+
+    file_handler = CompressingRotatingFileHandler(
+        log_file,
+        max_bytes=_env_int('LOG_MAX_BYTES', DEFAULT_MAX_BYTES),
+        rotate_seconds=_env_int('LOG_ROTATE_SECONDS', DEFAULT_ROTATE_SECONDS),
+        backup_count=_env_int('LOG_BACKUP_COUNT', DEFAULT_BACKUP_COUNT))
+    file_handler.setFormatter(JsonLinesFormatter())
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(_QueueHandler(log_queue))
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler,
+                                               respect_handler_level=True)
+    _listener.start()
+    # Drain the queue before the interpreter exits
+    atexit.register(_listener.stop)
+    return _listener
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Media promos with a persistent Telegram file_id cache
+
+A banner is uploaded to Telegram only once. The file_id returned by the
+first sendPhoto/sendDocument is stored under the file's SHA-256, and every
+other chat (and every later slot) reuses it, so upload traffic per
+broadcast is constant instead of growing with the number of groups.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+
+from bot_api import SendResult
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_FILE = "media_file_ids.json"
+
+# Telegram's limit for photo and document captions
+MAX_CAPTION_LENGTH = 1024
+
+MEDIA_METHODS = {
+    "photo": "sendPhoto",
+    "document": "sendDocument"
+}
+
+
+def file_sha256(path):
+    """
+    Returns:
+        str: Hex SHA-256 of the file contents
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def extract_file_id(kind, message):
+    """
+    Get the reusable file_id from a sendPhoto/sendDocument result.
+
+    Returns:
+        str: file_id, or None if the message has no such media
+    """
+    if kind == "photo":
+        sizes = message.get("photo") or []
+        # Telegram lists the sizes smallest first; reuse the original
+        return sizes[-1].get("file_id") if sizes else None
+    return (message.get(kind) or {}).get("file_id")
+
+
+class MediaFileCache:
+    """
+    JSON file mapping content hash -> Telegram file_id.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._hashes = {}
+        try:
+            with open(path, 'r') as f:
+                self._entries = json.load(f)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error(f"Could not read media cache {path}: {str(e)}")
+
+    def content_hash(self, file_path):
+        """
+        Hash a file, re-reading it only when its size or mtime changed.
+
+        Returns:
+            str: Hex SHA-256 of the file contents
+        """
+        stat = os.stat(file_path)
+        key = (file_path, stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            digest = self._hashes.get(key)
+        if digest is None:
+            digest = file_sha256(file_path)
+            with self._lock:
+                self._hashes[key] = digest
+        return digest
+
+    def get(self, digest, kind):
+        """
+        Returns:
+            str: Cached file_id for this content and media kind, or None
+        """
+        with self._lock:
+            entry = self._entries.get(digest)
+        if entry and entry.get("kind") == kind:
+            return entry.get("file_id")
+        return None
+
+    def put(self, digest, kind, file_id):
+        """Store a file_id and persist the cache."""
+        with self._lock:
+            self._entries[digest] = {
+                "kind": kind,
+                "file_id": file_id,
+                "uploaded_at": datetime.now().isoformat()
+            }
+            self._save_locked()
+
+    def forget(self, digest):
+        """Drop a file_id Telegram no longer accepts."""
+        with self._lock:
+            if self._entries.pop(digest, None) is not None:
+                self._save_locked()
+
+    def _save_locked(self):
+        tmp_path = self.path + '.tmp'
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(self._entries, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"Could not save media cache {self.path}: {str(e)}")
+
+
+class MediaSender:
+    """
+    Sends photos/documents, uploading each distinct file at most once.
+    """
+
+    def __init__(self, api_client, cache):
+        """
+        Args:
+            api_client (BotApiClient): Client used for the API calls
+            cache (MediaFileCache): Persistent file_id cache
+        """
+        self.api_client = api_client
+        self.cache = cache
+        self._upload_locks = {}
+        self._locks_lock = threading.Lock()
+
+    def _upload_lock(self, digest):
+        with self._locks_lock:
+            return self._upload_locks.setdefault(digest, threading.Lock())
+
+    def send(self, chat_id, file_path, kind="photo", caption=None, parse_mode=None,
+             timeout=None):
+        """
+        Send a media file to one chat.
+
+        The first send of a file uploads it while other workers wait for the
+        resulting file_id; all later sends reference the cached file_id.
+
+        Network and JSON errors are raised to the caller, like BotApiClient.call.
+        timeout overrides the client's per-method timeout.
+
+        Returns:
+            SendResult: Outcome of the send
+        """
+        if kind not in MEDIA_METHODS:
+            raise ValueError(f"Unsupported media type: {kind}")
+        method = MEDIA_METHODS[kind]
+        data = {"chat_id": chat_id}
+        if caption:
+            data["caption"] = caption
+            if parse_mode:
+                data["parse_mode"] = parse_mode
+
+        digest = self.cache.content_hash(file_path)
+        file_id = self.cache.get(digest, kind)
+        if file_id is None:
+            with self._upload_lock(digest):
+                file_id = self.cache.get(digest, kind)
+                if file_id is None:
+                    return self._upload(method, kind, digest, file_path, data, timeout)
+
+        result = SendResult.from_response(
+            self.api_client.call(method, {**data, kind: file_id}, timeout=timeout))
+        if not result and result.error_code == 400 and 'file' in (result.description or '').lower():
+            # The cached file_id was rejected; upload the file again once
+            logger.warning(f"Cached file_id for {file_path} rejected, uploading again")
+            self.cache.forget(digest)
+            with self._upload_lock(digest):
+                return self._upload(method, kind, digest, file_path, data, timeout)
+        return result
+
+    def _upload(self, method, kind, digest, file_path, data, timeout=None):
+        with open(file_path, 'rb') as f:
+            response = self.api_client.call(method, data, timeout=timeout,
+                                            files={kind: (os.path.basename(file_path), f)})
+        result = SendResult.from_response(response)
+        if result:
+            file_id = extract_file_id(kind, response.get('result') or {})
+            if file_id:
+                self.cache.put(digest, kind, file_id)
+                logger.info(f"Uploaded {file_path} once, cached file_id for reuse")
+        return result
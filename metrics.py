@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Prometheus-style metrics shared by telegram_bot, cron_sender and keepalive_sender
+
+Counters and histograms are sharded per thread: every thread updates its own
+list of numbers, so the send loop never waits on a lock. The shards are
+summed only when /metrics is scraped. Shards of finished threads (e.g. the
+per-broadcast worker pool) are folded into a running total whenever a new
+thread gets its shard, so they never pile up between scrapes.
+
+The instruments every entry point records into are defined at the bottom of
+this module; render() produces the text exposition format.
+"""
+
+import bisect
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds; covers single API calls up to whole broadcasts
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120,
+                   300, 600, 1800, 3600)
+
+
+class _ShardedValues:
+    """
+    Fixed-size list of numbers with one private copy per writing thread.
+    """
+
+    def __init__(self, size):
+        self._size = size
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []
+        self._retired = [0] * size
+
+    def shard(self):
+        """
+        Returns:
+            list: The calling thread's values, only ever written by that thread
+        """
+        values = getattr(self._local, 'values', None)
+        if values is None:
+            values = self._local.values = [0] * self._size
+            with self._lock:
+                # Every new thread also retires the shards of finished ones,
+                # so the list stays bounded even if nothing ever scrapes
+                self._fold_finished_locked()
+                self._shards.append((threading.current_thread(), values))
+        return values
+
+    def _fold_finished_locked(self):
+        """Add the shards of finished threads to the retired total; caller holds the lock."""
+        live = []
+        for thread, values in self._shards:
+            if thread.is_alive():
+                live.append((thread, values))
+            else:
+                for i, value in enumerate(values):
+                    self._retired[i] += value
+        self._shards = live
+
+    def totals(self):
+        """
+        Returns:
+            list: Values summed over all threads
+        """
+        with self._lock:
+            self._fold_finished_locked()
+            totals = list(self._retired)
+            shards = [values for _, values in self._shards]
+        for values in shards:
+            for i, value in enumerate(values):
+                totals[i] += value
+        return totals
+
+
+class CounterChild:
+    """One labelled counter series."""
+
+    def __init__(self):
+        self._values = _ShardedValues(1)
+
+    def inc(self, amount=1):
+        self._values.shard()[0] += amount
+
+    def value(self):
+        return self._values.totals()[0]
+
+
+class HistogramChild:
+    """One labelled histogram series."""
+
+    def __init__(self, buckets):
+        self._buckets = buckets
+        # One slot per bucket, one for +Inf, then the sum of observations
+        self._values = _ShardedValues(len(buckets) + 2)
+
+    def observe(self, value):
+        values = self._values.shard()
+        values[bisect.bisect_left(self._buckets, value)] += 1
+        values[-1] += value
+
+    def snapshot(self):
+        """
+        Returns:
+            tuple: (cumulative bucket counts including +Inf, count, sum)
+        """
+        totals = self._values.totals()
+        cumulative = []
+        running = 0
+        for count in totals[:-1]:
+            running += count
+            cumulative.append(running)
+        return cumulative, running, totals[-1]
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """
+        Returns:
+            The series for these label values, created on first use
+        """
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _series(self):
+        with self._lock:
+            return sorted(self._children.items())
+
+    def _label_text(self, key, extra=None):
+        pairs = list(zip(self.labelnames, key))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ''
+        escaped = [(name, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+                   for name, value in pairs]
+        return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._render_samples())
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonic counter, optionally labelled."""
+
+    kind = 'counter'
+
+    def _new_child(self):
+        return CounterChild()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def _render_samples(self):
+        return [f"{self.name}{self._label_text(key)} {_format(child.value())}"
+                for key, child in self._series()]
+
+
+class Histogram(_Metric):
+    """Bucketed distribution of observed values, optionally labelled."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def _render_samples(self):
+        lines = []
+        for key, child in self._series():
+            cumulative, count, total = child.snapshot()
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), cumulative):
+                le = '+Inf' if bound == float('inf') else _format(bound)
+                lines.append(f"{self.name}_bucket{self._label_text(key, ('le', le))} {bucket_count}")
+            lines.append(f"{self.name}_count{self._label_text(key)} {count}")
+            lines.append(f"{self.name}_sum{self._label_text(key)} {_format(total)}")
+        return lines
+
+
+def _format(value):
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
+
+
+class MetricsRegistry:
+    """
+    Named collection of metrics rendered together.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _get_or_create(self, cls, name, documentation, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} already registered as {metric.kind}")
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        """
+        Returns:
+            Counter: The counter with this name, created on first use
+        """
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """
+        Returns:
+            Histogram: The histogram with this name, created on first use
+        """
+        return self._get_or_create(Histogram, name, documentation, labelnames,
+                                   buckets=buckets)
+
+    def render(self):
+        """
+        Returns:
+            bytes: All metrics in the Prometheus text exposition format
+        """
+        with self._lock:
+            metrics = [self._metrics[name] for name in sorted(self._metrics)]
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+REGISTRY = MetricsRegistry()
+
+
+def render():
+    """
+    Returns:
+        bytes: The shared registry in the Prometheus text exposition format
+    """
+    return REGISTRY.render()
+
+
+def start_metrics_server(port, host='0.0.0.0'):
+    """
+    Serve /metrics on its own port, for entry points without an HTTP server.
+
+    Returns:
+        ThreadingHTTPServer: The running server, or None if it could not start
+    """
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != '/metrics':
+                self.send_error(404)
+                return
+            body = render()
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    try:
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+        logger.info(f"Metrics server started on port {port}")
+        return server
+    except Exception as e:
+        logger.error(f"Failed to start metrics server: {e}")
+        return None
+
+
+# Instruments shared by all entry points
+API_REQUEST_SECONDS = REGISTRY.histogram(
+    "telegram_api_request_seconds", "Bot API request latency by method", ["method"])
+API_RESPONSES = REGISTRY.counter(
+    "telegram_api_responses_total", "Bot API calls by method and result code "
+    "(HTTP status, or network_error)", ["method", "code"])
+BROADCAST_SECONDS = REGISTRY.histogram(
+    "broadcast_duration_seconds", "Wall time of a whole broadcast by slot", ["slot"])
+BROADCAST_SENDS = REGISTRY.counter(
+    "broadcast_messages_total", "Final per-chat broadcast outcomes", ["result"])
+RETRIES = REGISTRY.counter(
+    "send_retries_total", "Sends scheduled for retry by failure kind", ["kind"])
+RETRY_DELAY_SECONDS = REGISTRY.histogram(
+    "send_retry_delay_seconds", "Delay before a scheduled retry")
+RATE_LIMIT_WAIT_SECONDS = REGISTRY.histogram(
+    "rate_limiter_wait_seconds", "Time a send waited for rate limiter tokens")
+SCHEDULER_LAG_SECONDS = REGISTRY.histogram(
+    "scheduler_lag_seconds", "Actual minus planned fire time of scheduled jobs by kind", ["job"])
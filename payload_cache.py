@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Pre-rendered, pre-encoded sendMessage payloads
+
+A message template is validated (Telegram HTML subset, entities), split into
+4096-character parts and form-encoded once. Each send then only prefixes
+the chat_id to the cached request body bytes instead of rebuilding and
+re-encoding the whole multi-kilobyte text for every chat.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+# Telegram's limit for the text of a single message
+MAX_MESSAGE_LENGTH = 4096
+
+# Distinct templates kept in memory (per-group messages can differ)
+DEFAULT_CACHE_SIZE = 64
+
+# Tags accepted by Telegram's HTML parse mode
+ALLOWED_TAGS = {"b", "strong", "i", "em", "u", "ins", "s", "strike", "del", "span",
+                "tg-spoiler", "a", "code", "pre", "blockquote", "tg-emoji"}
+VOID_ENTITIES = {"lt", "gt", "amp", "quot"}
+
+_TAG_RE = re.compile(r'<(/?)([a-zA-Z][a-zA-Z0-9-]*)((?:\s+[^<>]*)?)>')
+_ENTITY_RE = re.compile(r'&(#[0-9]+|#x[0-9a-fA-F]+|[a-zA-Z]+);')
+
+
+class PayloadError(ValueError):
+    """Raised when a message template can not be sent as-is."""
+
+
+def validate_html(text):
+    """
+    Check text against Telegram's HTML parse mode rules.
+
+    Args:
+        text (str): Message text with HTML markup
+
+    Raises:
+        PayloadError: On unsupported or unbalanced tags and bad entities
+    """
+    stack = []
+    pos = 0
+    for match in _TAG_RE.finditer(text):
+        _check_plain(text[pos:match.start()])
+        pos = match.end()
+        closing, tag, _ = match.groups()
+        tag = tag.lower()
+        if tag not in ALLOWED_TAGS:
+            raise PayloadError(f"Unsupported HTML tag <{tag}>")
+        if closing:
+            if not stack or stack[-1] != tag:
+                raise PayloadError(f"Unexpected closing tag </{tag}>")
+            stack.pop()
+        else:
+            stack.append(tag)
+    _check_plain(text[pos:])
+    if stack:
+        raise PayloadError(f"Unclosed HTML tag <{stack[-1]}>")
+
+
+def _check_plain(fragment):
+    if '<' in fragment or '>' in fragment:
+        raise PayloadError("Unescaped '<' or '>' in message text, use &lt; / &gt;")
+    for index in [m.start() for m in re.finditer('&', fragment)]:
+        match = _ENTITY_RE.match(fragment, index)
+        if not match:
+            raise PayloadError("Unescaped '&' in message text, use &amp;")
+        name = match.group(1)
+        if not name.startswith('#') and name not in VOID_ENTITIES:
+            raise PayloadError(f"Unsupported HTML entity &{name};")
+
+
+def split_message(text, limit=MAX_MESSAGE_LENGTH):
+    """
+    Split text into parts of at most limit characters, preferring line breaks.
+
+    Args:
+        text (str): Message text
+        limit (int): Maximum part length
+
+    Returns:
+        list: Message parts
+    """
+    parts = []
+    while len(text) > limit:
+        cut = text.rfind('\n', 0, limit)
+        if cut <= 0:
+            cut = limit
+        parts.append(text[:cut])
+        text = text[cut:].lstrip('\n')
+    if text or not parts:
+        parts.append(text)
+    return parts
+
+
+class RenderedPayload:
+    """
+    Encoded sendMessage bodies for one template, minus the chat_id.
+    """
+
+    __slots__ = ('parts', '_suffixes')
+
+    def __init__(self, text, parse_mode=None):
+        if parse_mode == "HTML":
+            validate_html(text)
+        self.parts = split_message(text)
+        if parse_mode == "HTML" and len(self.parts) > 1:
+            for part in self.parts:
+                validate_html(part)
+
+        fields = {"parse_mode": parse_mode} if parse_mode else {}
+        self._suffixes = [('&' + urlencode({"text": part, **fields})).encode('ascii')
+                          for part in self.parts]
+
+    def __len__(self):
+        return len(self._suffixes)
+
+    def body(self, chat_id, index=0):
+        """
+        Build the form-encoded request body for one chat.
+
+        Args:
+            chat_id (int): Target chat
+            index (int): Message part
+
+        Returns:
+            bytes: application/x-www-form-urlencoded body
+        """
+        return b'chat_id=' + str(chat_id).encode('ascii') + self._suffixes[index]
+
+
+class PayloadCache:
+    """
+    LRU cache of RenderedPayload objects keyed by (text, parse_mode).
+    """
+
+    def __init__(self, max_size=DEFAULT_CACHE_SIZE):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, text, parse_mode=None):
+        """
+        Get the rendered payload for a template, rendering it on first use.
+
+        Raises:
+            PayloadError: If the template is invalid
+
+        Returns:
+            RenderedPayload: Cached payload
+        """
+        key = (text, parse_mode)
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is not None:
+                self._entries.move_to_end(key)
+                return payload
+
+        payload = RenderedPayload(text, parse_mode)
+        with self._lock:
+            self._entries[key] = payload
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return payload
+
+    def clear(self):
+        """Drop every cached payload, e.g. after the message config changed."""
+        with self._lock:
+            self._entries.clear()
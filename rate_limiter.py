@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Token-bucket rate limiter for the Telegram Bot API
+
+Models Telegram's limits with one global bucket (about 30 messages per
+second for the whole bot) plus one bucket per chat (about 20 messages per
+minute in a group). Senders call acquire() before every API call.
+"""
+
+import threading
+import time
+
+from metrics import RATE_LIMIT_WAIT_SECONDS
+
+# Telegram's documented limits
+DEFAULT_GLOBAL_RATE = 30.0       # messages per second across all chats
+DEFAULT_GLOBAL_BURST = 30
+DEFAULT_PER_CHAT_RATE = 20 / 60  # messages per second in a single group
+DEFAULT_PER_CHAT_BURST = 3
+
+# Idle per-chat buckets are dropped after this many seconds
+IDLE_BUCKET_TTL = 600
+
+# Adaptive pacing: a 429 cuts the global rate, which then recovers linearly
+THROTTLE_FACTOR = 0.7
+MIN_GLOBAL_RATE = 1.0
+RATE_RECOVERY_PER_SECOND = 0.5  # messages/second regained per second without a 429
+
+
+class TokenBucket:
+    """
+    Classic token bucket refilled continuously at a fixed rate.
+    """
+
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        """
+        Args:
+            rate (float): Tokens added per second
+            capacity (float): Maximum number of stored tokens (burst size)
+            clock (callable): Monotonic time source
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self, now):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def reserve(self, now=None):
+        """
+        Take one token, going into debt if the bucket is empty.
+
+        Returns:
+            float: Seconds the caller must wait before using the token
+        """
+        if now is None:
+            now = self.clock()
+        self._refill(now)
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+    def refund(self):
+        """Give back a token taken by reserve() that was not used."""
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+    def level(self, now=None):
+        """
+        Returns:
+            float: Tokens currently available (negative while in debt)
+        """
+        if now is None:
+            now = self.clock()
+        self._refill(now)
+        return self.tokens
+
+
+class RateLimiter:
+    """
+    Global bucket plus lazily created per-chat buckets.
+
+    acquire() reserves a token from both buckets under one lock and then
+    sleeps outside the lock, so waiting senders never block each other.
+    """
+
+    def __init__(self, global_rate=DEFAULT_GLOBAL_RATE, global_burst=DEFAULT_GLOBAL_BURST,
+                 per_chat_rate=DEFAULT_PER_CHAT_RATE, per_chat_burst=DEFAULT_PER_CHAT_BURST,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.per_chat_rate = per_chat_rate
+        self.per_chat_burst = per_chat_burst
+        self.clock = clock
+        self.sleep = sleep
+        self._lock = threading.Lock()
+        self._global = TokenBucket(global_rate, global_burst, clock)
+        self.max_global_rate = float(global_rate)
+        self._chats = {}
+        self._last_sweep = clock()
+        self._last_recovery = clock()
+        self.total_wait = 0.0
+        self.throttle_events = 0
+
+    def acquire(self, chat_id=None, max_wait=None):
+        """
+        Block until a message to chat_id may be sent.
+
+        Args:
+            chat_id (int): Target chat, or None to only use the global bucket
+            max_wait (float): Longest acceptable wait (for callers with a
+                deadline); if the wait would be longer, the tokens are given
+                back, nothing is slept and the returned wait is larger than
+                max_wait, meaning the caller must not send
+
+        Returns:
+            float: Seconds the caller had to wait
+        """
+        with self._lock:
+            now = self.clock()
+            self._recover(now)
+            wait = self._global.reserve(now)
+            bucket = None
+            if chat_id is not None:
+                bucket = self._chats.get(chat_id)
+                if bucket is None:
+                    bucket = TokenBucket(self.per_chat_rate, self.per_chat_burst, self.clock)
+                    self._chats[chat_id] = bucket
+                wait = max(wait, bucket.reserve(now))
+            self._sweep(now)
+            if max_wait is not None and wait > max_wait:
+                # The caller gives up; leave no debt for sends that never happen
+                self._global.refund()
+                if bucket is not None:
+                    bucket.refund()
+                return wait
+            self.total_wait += wait
+
+        RATE_LIMIT_WAIT_SECONDS.observe(wait)
+        if wait > 0:
+            self.sleep(wait)
+        return wait
+
+    def _recover(self, now):
+        """Raise a throttled global rate back towards its configured maximum."""
+        bucket = self._global
+        if bucket.rate < self.max_global_rate:
+            bucket._refill(now)
+            bucket.rate = min(self.max_global_rate,
+                              bucket.rate + (now - self._last_recovery) * RATE_RECOVERY_PER_SECOND)
+        self._last_recovery = now
+
+    def throttle(self, chat_id=None, retry_after=None):
+        """
+        Feed a 429 response back into pacing.
+
+        The chat's bucket is put into debt for retry_after seconds and the
+        global rate is reduced multiplicatively; it recovers gradually.
+
+        Args:
+            chat_id (int): Chat that was throttled
+            retry_after (float): Seconds Telegram asked us to wait
+        """
+        with self._lock:
+            now = self.clock()
+            self.throttle_events += 1
+            self._global._refill(now)
+            self._global.rate = max(MIN_GLOBAL_RATE, self._global.rate * THROTTLE_FACTOR)
+            self._last_recovery = now
+            if chat_id is not None and retry_after:
+                bucket = self._chats.get(chat_id)
+                if bucket is None:
+                    bucket = TokenBucket(self.per_chat_rate, self.per_chat_burst, self.clock)
+                    self._chats[chat_id] = bucket
+                bucket._refill(now)
+                bucket.tokens = min(bucket.tokens, -retry_after * bucket.rate)
+
+    def _sweep(self, now):
+        """Forget per-chat buckets that have been idle and are full again."""
+        if now - self._last_sweep < IDLE_BUCKET_TTL:
+            return
+        self._last_sweep = now
+        for chat_id in [c for c, b in self._chats.items() if now - b.updated > IDLE_BUCKET_TTL]:
+            del self._chats[chat_id]
+
+    def snapshot(self):
+        """
+        Report current bucket levels for monitoring.
+
+        Returns:
+            dict: Global level plus per-chat summary
+        """
+        with self._lock:
+            now = self.clock()
+            chat_levels = [b.level(now) for b in self._chats.values()]
+            return {
+                "global_tokens": round(self._global.level(now), 2),
+                "global_capacity": self._global.capacity,
+                "global_rate": round(self._global.rate, 2),
+                "max_global_rate": self.max_global_rate,
+                "throttle_events": self.throttle_events,
+                "tracked_chats": len(chat_levels),
+                "throttled_chats": sum(1 for level in chat_levels if level < 1),
+                "min_chat_tokens": round(min(chat_levels), 2) if chat_levels else None,
+                "total_wait_seconds": round(self.total_wait, 3)
+            }
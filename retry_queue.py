@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Delayed retry queue and retry policy for Bot API sends
+
+Throttled (429) sends are retried after Telegram's parameters.retry_after,
+transient failures (5xx, network errors) after a jittered exponential
+backoff. Retries wait on a timer heap instead of sleeping in a worker, so
+other chats keep being served while a chat is backing off.
+"""
+
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+
+from metrics import RETRIES, RETRY_DELAY_SECONDS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ATTEMPTS = 5          # attempts per message, including the first one
+DEFAULT_MAX_RETRIES_PER_SLOT = 500
+DEFAULT_BASE_DELAY = 1.0          # seconds, first backoff step
+DEFAULT_MAX_DELAY = 60.0          # seconds, backoff ceiling
+DEFAULT_MAX_RETRY_AFTER = 300     # give up if Telegram asks us to wait longer
+
+RETRY_AFTER = "retry_after"
+TRANSIENT = "transient"
+PERMANENT = "permanent"
+
+
+def classify_failure(result):
+    """
+    Decide whether a failed send is worth retrying.
+
+    Args:
+        result: SendResult (or any object with error_code/retry_after)
+
+    Returns:
+        str: RETRY_AFTER, TRANSIENT or PERMANENT
+    """
+    error_code = getattr(result, 'error_code', None)
+    if error_code == 429:
+        return RETRY_AFTER
+    if error_code is None or error_code >= 500:
+        # No API reply at all (network error, timeout) or a server-side error
+        return TRANSIENT
+    return PERMANENT
+
+
+class RetryPolicy:
+    """
+    Retry decisions for one broadcast, including its total retry budget.
+    """
+
+    def __init__(self, max_attempts=DEFAULT_MAX_ATTEMPTS,
+                 max_retries_per_slot=DEFAULT_MAX_RETRIES_PER_SLOT,
+                 base_delay=DEFAULT_BASE_DELAY, max_delay=DEFAULT_MAX_DELAY,
+                 max_retry_after=DEFAULT_MAX_RETRY_AFTER):
+        self.max_attempts = max_attempts
+        self.max_retries_per_slot = max_retries_per_slot
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self._lock = threading.Lock()
+        self.retries = 0
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Build a policy from a RETRY_POLICY style dictionary.
+
+        Returns:
+            RetryPolicy: New policy with a fresh retry budget
+        """
+        return cls(
+            max_attempts=config.get("max_attempts", DEFAULT_MAX_ATTEMPTS),
+            max_retries_per_slot=config.get("max_retries_per_slot", DEFAULT_MAX_RETRIES_PER_SLOT),
+            base_delay=config.get("base_delay", DEFAULT_BASE_DELAY),
+            max_delay=config.get("max_delay", DEFAULT_MAX_DELAY),
+            max_retry_after=config.get("max_retry_after", DEFAULT_MAX_RETRY_AFTER)
+        )
+
+    def backoff(self, attempt):
+        """
+        Full-jitter exponential backoff.
+
+        Args:
+            attempt (int): Number of attempts made so far (1 after the first failure)
+
+        Returns:
+            float: Seconds to wait
+        """
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return random.uniform(ceiling / 2, ceiling)
+
+    def next_delay(self, result, attempt):
+        """
+        Decide whether and when to retry a send.
+
+        Args:
+            result: Outcome of the last attempt
+            attempt (int): Number of attempts made so far
+
+        Returns:
+            float: Seconds until the retry, or None to give up
+        """
+        if result or attempt >= self.max_attempts:
+            return None
+
+        kind = classify_failure(result)
+        if kind == PERMANENT:
+            return None
+        if kind == RETRY_AFTER:
+            retry_after = getattr(result, 'retry_after', None) or self.backoff(attempt)
+            if retry_after > self.max_retry_after:
+                return None
+            # A little jitter so throttled chats don't all come back at once
+            delay = retry_after + random.uniform(0, 1)
+        else:
+            delay = self.backoff(attempt)
+
+        with self._lock:
+            if self.retries >= self.max_retries_per_slot:
+                return None
+            self.retries += 1
+        RETRIES.labels(kind).inc()
+        RETRY_DELAY_SECONDS.observe(delay)
+        return delay
+
+
+class DelayQueue:
+    """
+    Runs callbacks after a delay on one timer thread.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._heap = []
+        self._seq = itertools.count()
+        self._thread = None
+
+    def call_later(self, delay, callback, *args):
+        """
+        Run callback(*args) on the timer thread after delay seconds.
+        """
+        with self._cond:
+            due = time.monotonic() + max(0.0, delay)
+            heapq.heappush(self._heap, (due, next(self._seq), callback, args))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='retry-queue', daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def __len__(self):
+        with self._cond:
+            return len(self._heap)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    delay = self._heap[0][0] - time.monotonic()
+                    if delay <= 0:
+                        break
+                    self._cond.wait(delay)
+                _, _, callback, args = heapq.heappop(self._heap)
+            try:
+                callback(*args)
+            except Exception as e:
+                logger.error(f"Error in delayed retry callback: {str(e)}")
@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+"""
+Virtual-clock schedule simulation
+
+Replays weeks or months of the broadcast schedule in a fraction of a
+second. telegram_bot and cron_sender read "now" from the clock of their
+TimerScheduler; here that clock is a VirtualClock that jumps straight to
+the next fire time, and every bot's API client is a RecordingTransport that
+answers at once and records each send with its virtual time. Everything
+else runs unchanged: setup_schedule(), the slot IDs, the duplicate checks
+(completed slots in the delivery journal, should_send_now() of
+cron_sender), the delivery journal and the group registry. The run
+happens in a temporary directory, so the real state files are never
+touched. Media (PROMO_MEDIA) is not simulated.
+
+The report is the exact fire timeline, with the UTC and local time of each
+slot and its outcome, plus the sends per chat. With --check the exit code
+is 1 if a chat got two messages within DUPLICATE_WINDOW or a slot was
+skipped by a duplicate check, so the schedule can be checked in CI.
+
+Usage:
+    python simulation.py --days 60
+    python simulation.py --start 2025-03-25 --days 14 --timezone Europe/Kyiv --times 00:30,09:00
+    python simulation.py --sender both --groups groups.jsonl --check
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from urllib.parse import parse_qs
+
+from timer_scheduler import TimerScheduler, resolve_timezone
+from token_pool import bot_id_of
+
+SENDERS = ["telegram_bot", "cron_sender", "both"]
+DEFAULT_DAYS = 28
+# Two sends to one chat closer than this count as a duplicate
+DUPLICATE_WINDOW = 120
+
+# Sends are instant in a simulation, so no limiter should ever wait
+UNTHROTTLED_LIMITS = {
+    "global_per_second": 1000000,
+    "global_burst": 1000000,
+    "per_chat_per_minute": 1000000,
+    "per_chat_burst": 1000000
+}
+
+
+class VirtualClock:
+    """
+    Clock for TimerScheduler that only moves when told to.
+    """
+
+    def __init__(self, start):
+        """
+        Args:
+            start (datetime): Aware start time
+        """
+        self.now = start.astimezone(timezone.utc)
+
+    def __call__(self):
+        return self.now
+
+    def advance_to(self, when):
+        """Move the clock forward to when; it never goes back."""
+        self.now = max(self.now, when.astimezone(timezone.utc))
+
+
+class RecordingTransport:
+    """
+    Stand-in for BotApiClient that answers every request at once and
+    records each send with the virtual time it happened at.
+    """
+
+    def __init__(self, token, clock, sends, sender):
+        """
+        Args:
+            token (str): Bot token; only its bot ID is recorded
+            clock (VirtualClock): Source of the send times
+            sends (list): Shared list the sends are appended to
+            sender (str): Name of the sending module, recorded with each send
+        """
+        self.token = token
+        self.bot_id = bot_id_of(token)
+        self.clock = clock
+        self.sends = sends
+        self.sender = sender
+        self.timeouts = {}
+        self._message_ids = itertools.count(1)
+
+    def timeout_for(self, method):
+        return None
+
+    def call(self, method, data=None, timeout=None, http_method='POST', files=None):
+        if method == "getMe":
+            return {"ok": True, "result": {"id": int(self.bot_id), "is_bot": True,
+                                           "username": "simulated_bot"}}
+        message_id = next(self._message_ids)
+        self.sends.append({
+            "time": self.clock().isoformat(),
+            "chat_id": int((data or {}).get("chat_id")),
+            "method": method,
+            "bot_id": self.bot_id,
+            "sender": self.sender
+        })
+        return {"ok": True, "result": {"message_id": message_id}}
+
+    def call_encoded(self, method, body, timeout=None):
+        fields = parse_qs(body.decode('utf-8'))
+        return self.call(method, {"chat_id": fields["chat_id"][0]}, timeout=timeout)
+
+    def get_me(self):
+        return self.call("getMe")
+
+    def send_message(self, chat_id, text, parse_mode=None):
+        return self.call("sendMessage", {"chat_id": chat_id, "text": text})
+
+    def close(self):
+        pass
+
+
+class RecordingScheduler(TimerScheduler):
+    """
+    TimerScheduler that reports every job it runs to the Simulation.
+    """
+
+    def __init__(self, simulation, sender, outcome):
+        """
+        Args:
+            simulation (Simulation): Receives the fires
+            sender (str): Name of the sending module
+            outcome (callable): outcome(job, run) runs the job and returns
+                "sent", "skipped", "deferred" or "standby"
+        """
+        super().__init__(clock=simulation.clock)
+        self.simulation = simulation
+        self.sender = sender
+        self.outcome = outcome
+
+    def run_job(self, job, planned):
+        sends_before = len(self.simulation.sends)
+        result = self.outcome(job, lambda: super(RecordingScheduler, self).run_job(job, planned))
+        self.simulation.record_fire(self.sender, job, planned,
+                                    len(self.simulation.sends) - sends_before, result)
+
+
+class Simulation:
+    """
+    Steps one or more schedulers through a period of virtual time.
+    """
+
+    def __init__(self, start):
+        """
+        Args:
+            start (datetime): Aware start of the simulated period
+        """
+        self.start = start
+        self.clock = VirtualClock(start)
+        self.schedulers = []
+        self.sends = []
+        self.fires = []
+
+    def add_scheduler(self, scheduler):
+        self.schedulers.append(scheduler)
+
+    def record_fire(self, sender, job, planned, sent, outcome):
+        fire = {
+            "time": planned.isoformat(),
+            "sender": sender,
+            "job": job.name,
+            "local": None,
+            "outcome": outcome,
+            "sent": sent
+        }
+        # Slot jobs are named "slot HH:MM <timezone>" by both senders
+        if job.name.startswith("slot "):
+            tz_name = job.name.split(" ", 2)[2]
+            fire["local"] = planned.astimezone(resolve_timezone(tz_name)).isoformat()
+        self.fires.append(fire)
+
+    def run(self, end):
+        """
+        Fire every job due before end, in time order.
+
+        At equal fire times the schedulers run in the order they were added.
+        """
+        while True:
+            dues = [due for due in (s.next_run() for s in self.schedulers) if due is not None]
+            if not dues or min(dues) >= end:
+                break
+            self.clock.advance_to(min(dues))
+            for scheduler in self.schedulers:
+                scheduler.run_pending()
+        self.clock.advance_to(end)
+
+    def chat_report(self):
+        """
+        Returns:
+            dict: chat_id -> sends, first and last send, shortest gap in seconds
+        """
+        times = defaultdict(list)
+        for send in self.sends:
+            times[send["chat_id"]].append(datetime.fromisoformat(send["time"]))
+        report = {}
+        for chat_id, sent_at in sorted(times.items()):
+            sent_at.sort()
+            gaps = [(b - a).total_seconds() for a, b in zip(sent_at, sent_at[1:])]
+            report[chat_id] = {
+                "sends": len(sent_at),
+                "first": sent_at[0].isoformat(),
+                "last": sent_at[-1].isoformat(),
+                "min_gap": min(gaps) if gaps else None
+            }
+        return report
+
+    def duplicates(self):
+        """
+        Returns:
+            list: (chat_id, earlier send time, later send time) closer than DUPLICATE_WINDOW
+        """
+        last = {}
+        found = []
+        for send in sorted(self.sends, key=lambda s: s["time"]):
+            sent_at = datetime.fromisoformat(send["time"])
+            previous = last.get(send["chat_id"])
+            if previous and (sent_at - previous).total_seconds() < DUPLICATE_WINDOW:
+                found.append((send["chat_id"], previous.isoformat(), sent_at.isoformat()))
+            last[send["chat_id"]] = sent_at
+        return found
+
+
+def prepare_telegram_bot(simulation, args):
+    """
+    Wire telegram_bot to the simulation's clock and a recording transport.
+
+    Returns:
+        RecordingScheduler: The bot's scheduler, with its slots set up
+    """
+    import telegram_bot
+    from leader_lease import LeaderLease
+
+    if args.config:
+        shutil.copyfile(args.config, telegram_bot.SCHEDULE_CONFIG_FILE)
+        telegram_bot.load_schedule_config()
+    if args.times:
+        telegram_bot.SCHEDULE_TIMES = sorted(args.times)
+    if args.timezone:
+        telegram_bot.TIMEZONE = args.timezone
+    telegram_bot.PROMO_MEDIA = None
+    telegram_bot.BROADCAST_DEADLINE = None
+    # One worker sends in registry order, so runs are reproducible
+    telegram_bot.BROADCAST_WORKERS = 1
+    telegram_bot.apply_rate_limits(UNTHROTTLED_LIMITS)
+    for shard in telegram_bot.token_pool:
+        shard.api_client = RecordingTransport(shard.token, simulation.clock, simulation.sends,
+                                              "telegram_bot")
+    telegram_bot.api_client = telegram_bot.token_pool.primary.api_client
+    telegram_bot.leader_lease = LeaderLease("telegram_bot", telegram_bot.LEASE_FILE)
+
+    def outcome(job, run):
+        with telegram_bot.broadcast_history_lock:
+            before = dict(telegram_bot.broadcast_history)
+        run()
+        with telegram_bot.broadcast_history_lock:
+            progress = next((p for slot, p in telegram_bot.broadcast_history.items()
+                             if before.get(slot) is not p), None)
+        if progress is None:
+            return "standby"
+        state = progress.snapshot()["state"]
+        return "sent" if state == "finished" else state
+
+    scheduler = RecordingScheduler(simulation, "telegram_bot", outcome)
+    telegram_bot.scheduler = scheduler
+    telegram_bot.setup_schedule()
+    return scheduler
+
+
+def prepare_cron_sender(simulation, args):
+    """
+    Wire cron_sender to the simulation's clock and a recording transport.
+
+    Returns:
+        RecordingScheduler: cron_sender's scheduler, with its slots set up
+    """
+    import cron_sender
+    from leader_lease import LeaderLease
+    from rate_limiter import RateLimiter
+
+    if args.times:
+        cron_sender.SCHEDULE_TIMES = sorted(args.times)
+    cron_sender.BROADCAST_WORKERS = 1
+    cron_sender.rate_limiter = RateLimiter(global_rate=UNTHROTTLED_LIMITS["global_per_second"],
+                                           global_burst=UNTHROTTLED_LIMITS["global_burst"],
+                                           per_chat_rate=UNTHROTTLED_LIMITS["per_chat_per_minute"],
+                                           per_chat_burst=UNTHROTTLED_LIMITS["per_chat_burst"])
+    cron_sender.api_client = RecordingTransport(cron_sender.BOT_TOKEN, simulation.clock,
+                                                simulation.sends, "cron_sender")
+    cron_sender.leader_lease = LeaderLease("cron_sender", "broadcast_leader.lease")
+
+    def outcome(job, run):
+        sends_before = len(simulation.sends)
+        run()
+        if not cron_sender.leader_lease.is_leader():
+            return "standby"
+        return "sent" if len(simulation.sends) > sends_before else "skipped"
+
+    scheduler = RecordingScheduler(simulation, "cron_sender", outcome)
+    cron_sender.scheduler = scheduler
+    cron_sender.setup_schedule()
+    return scheduler
+
+
+def load_groups(args):
+    """Fill the temporary group registry from --groups, or seed it from GROUP_IDS."""
+    from group_registry import GroupRegistry
+
+    registry = GroupRegistry("groups.db")
+    if args.groups:
+        registry.import_groups(args.groups)
+    else:
+        import telegram_bot
+        registry.seed(telegram_bot.GROUP_IDS)
+    registry.close()
+
+
+def print_report(simulation, elapsed, days):
+    chats = simulation.chat_report()
+    print(f"Simulated {days} days from {simulation.start.strftime('%Y-%m-%d %H:%M')} UTC "
+          f"in {elapsed:.3f}s: {len(simulation.fires)} fires, {len(simulation.sends)} sends "
+          f"to {len(chats)} chats")
+
+    print("\nFire timeline:")
+    for fire in simulation.fires:
+        utc = datetime.fromisoformat(fire["time"]).strftime('%Y-%m-%d %H:%M UTC')
+        local = ""
+        if fire["local"]:
+            local_time = datetime.fromisoformat(fire["local"])
+            local = f"{local_time.strftime('%Y-%m-%d %H:%M')} {fire['job'].split(' ', 2)[2]}"
+        print(f"  {utc}  {local:<32} {fire['sender']:<13} {fire['outcome']:<8} {fire['sent']}")
+
+    print("\nSends per chat:")
+    print(f"  {'chat':>16}  {'sends':>5}  {'first':<16}  {'last':<16}  min gap")
+    for chat_id, row in chats.items():
+        min_gap = "-" if row["min_gap"] is None else str(timedelta(seconds=int(row["min_gap"])))
+        print(f"  {chat_id:>16}  {row['sends']:>5}  "
+              f"{datetime.fromisoformat(row['first']).strftime('%Y-%m-%d %H:%M'):<16}  "
+              f"{datetime.fromisoformat(row['last']).strftime('%Y-%m-%d %H:%M'):<16}  {min_gap}")
+
+    duplicates = simulation.duplicates()
+    print(f"\nDuplicates (two sends to one chat within {DUPLICATE_WINDOW}s): "
+          f"{len(duplicates) or 'none'}")
+    for chat_id, earlier, later in duplicates:
+        print(f"  chat {chat_id}: {earlier} and {later}")
+
+
+def parse_start(value):
+    try:
+        start = datetime.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid start time: {value}")
+    return start if start.tzinfo else start.replace(tzinfo=timezone.utc)
+
+
+def parse_times(value):
+    times = [t.strip() for t in value.split(',') if t.strip()]
+    for time_str in times:
+        try:
+            datetime.strptime(time_str, '%H:%M')
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"invalid time: {time_str} (use HH:MM)")
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay the broadcast schedule on a virtual clock")
+    parser.add_argument('--start', type=parse_start,
+                        default=datetime.now(timezone.utc).replace(hour=0, minute=0, second=0,
+                                                                   microsecond=0),
+                        help="start of the period, ISO format (UTC unless an offset is given); "
+                             "default today 00:00 UTC")
+    parser.add_argument('--days', type=float, default=DEFAULT_DAYS)
+    parser.add_argument('--sender', choices=SENDERS, default="telegram_bot",
+                        help="module(s) to simulate; with both they share the broadcast lease")
+    parser.add_argument('--times', type=parse_times,
+                        help="comma-separated HH:MM slots replacing SCHEDULE_TIMES")
+    parser.add_argument('--timezone', help="TIMEZONE of telegram_bot (cron_sender is always GMT+3)")
+    parser.add_argument('--config', help="schedule_config.json to load into telegram_bot")
+    parser.add_argument('--groups', help="JSON lines file of groups, as for --import-groups")
+    parser.add_argument('--json', action='store_true', help="print the full result as JSON")
+    parser.add_argument('--check', action='store_true',
+                        help="exit with code 1 on duplicate sends or skipped slots")
+    parser.add_argument('--verbose', action='store_true', help="show the senders' log lines")
+    args = parser.parse_args()
+    if args.timezone:
+        try:
+            resolve_timezone(args.timezone)
+        except ValueError as e:
+            parser.error(str(e))
+    for path in (args.config, args.groups):
+        if path and not os.path.exists(path):
+            parser.error(f"{path} does not exist")
+    args.config = args.config and os.path.abspath(args.config)
+    args.groups = args.groups and os.path.abspath(args.groups)
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.ERROR,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    workdir = tempfile.mkdtemp(prefix='telegram-simulation-')
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        load_groups(args)
+        simulation = Simulation(args.start)
+        if args.sender in ("telegram_bot", "both"):
+            simulation.add_scheduler(prepare_telegram_bot(simulation, args))
+        if args.sender in ("cron_sender", "both"):
+            simulation.add_scheduler(prepare_cron_sender(simulation, args))
+
+        started = time.perf_counter()
+        simulation.run(args.start + timedelta(days=args.days))
+        elapsed = time.perf_counter() - started
+    finally:
+        # Let the journal writer finish before its directory goes away
+        telegram_bot = sys.modules.get('telegram_bot')
+        if telegram_bot is not None and telegram_bot.delivery_journal is not None:
+            telegram_bot.delivery_journal.flush()
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    duplicates = simulation.duplicates()
+    skipped = [fire for fire in simulation.fires if fire["outcome"] == "skipped"]
+    if args.json:
+        print(json.dumps({
+            "start": args.start.isoformat(),
+            "days": args.days,
+            "seconds": round(elapsed, 3),
+            "fires": simulation.fires,
+            "chats": simulation.chat_report(),
+            "duplicates": duplicates,
+            "sends": simulation.sends
+        }, indent=2))
+    else:
+        print_report(simulation, elapsed, args.days)
+        if skipped:
+            print(f"\nSlots skipped by a duplicate check: {len(skipped)}")
+
+    if args.check and (duplicates or skipped):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
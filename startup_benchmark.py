@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the entry points
+
+Starts a fresh interpreter per run for every entry point, with Python's
+-X importtime enabled, inside a temporary directory. It reports wall-clock
+start time, total import time, the slowest modules by their own import
+time and any files the run created. A CLI command that shows up with a log
+file or with requests among its slowest imports has lost its fast path.
+
+Usage:
+    python startup_benchmark.py
+    python startup_benchmark.py --runs 20 --top 8 --json
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Name -> interpreter arguments; "python -c pass" is the floor to compare with
+ENTRY_POINTS = {
+    "python": ["-c", "pass"],
+    "telegram_bot --list-schedule": [os.path.join(HERE, "telegram_bot.py"), "--list-schedule"],
+    "import telegram_bot": ["-c", "import telegram_bot"],
+    "import cron_sender": ["-c", "import cron_sender"],
+    "import keepalive_sender": ["-c", "import keepalive_sender"]
+}
+
+_IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)')
+
+
+def parse_importtime(stderr):
+    """
+    Parse -X importtime output.
+
+    Returns:
+        tuple: (total import microseconds, {module: self microseconds})
+    """
+    total = 0
+    self_times = {}
+    for line in stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, module = match.groups()
+        self_times[module] = int(self_us)
+        if len(indent) == 1:
+            # Top-level import; its cumulative time includes everything below it
+            total += int(cumulative_us)
+    return total, self_times
+
+
+def run_entry_point(name, arguments, runs):
+    """
+    Start one entry point runs times in fresh interpreters.
+
+    Returns:
+        dict: Timings, slowest modules and created files
+    """
+    walls = []
+    totals = []
+    slowest = {}
+    created = set()
+    env = {**os.environ, 'PYTHONPATH': HERE,
+           # Never reach a running bot; CLI commands fall back to local files
+           'ADMIN_API_URL': 'http://127.0.0.1:9', 'ADMIN_TOKEN': ''}
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory(prefix='telegram-startup-') as workdir:
+            start = time.perf_counter()
+            completed = subprocess.run([sys.executable, '-X', 'importtime', *arguments],
+                                       cwd=workdir, env=env, stdout=subprocess.DEVNULL,
+                                       stderr=subprocess.PIPE, text=True)
+            walls.append(time.perf_counter() - start)
+            if completed.returncode != 0:
+                raise RuntimeError(f"{name} exited with code {completed.returncode}")
+            total, self_times = parse_importtime(completed.stderr)
+            totals.append(total)
+            for module, self_us in self_times.items():
+                slowest[module] = min(self_us, slowest.get(module, self_us))
+            created.update(os.listdir(workdir))
+
+    return {
+        "entry_point": name,
+        "wall_ms": round(statistics.median(walls) * 1000, 1),
+        "best_wall_ms": round(min(walls) * 1000, 1),
+        "import_ms": round(statistics.median(totals) / 1000, 1),
+        "slowest": sorted(slowest.items(), key=lambda item: -item[1]),
+        "created_files": sorted(created)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold-start time of each entry point")
+    parser.add_argument('--runs', type=int, default=10, help="interpreter starts per entry point")
+    parser.add_argument('--top', type=int, default=5, help="slowest modules to show")
+    parser.add_argument('--json', action='store_true', help="print results as JSON lines")
+    args = parser.parse_args()
+
+    for name, arguments in ENTRY_POINTS.items():
+        report = run_entry_point(name, arguments, args.runs)
+        report["slowest"] = [{"module": module, "self_ms": round(self_us / 1000, 1)}
+                             for module, self_us in report["slowest"][:args.top]]
+        if args.json:
+            print(json.dumps(report), flush=True)
+            continue
+        print(f"{name}: {report['wall_ms']} ms median ({report['best_wall_ms']} ms best), "
+              f"imports {report['import_ms']} ms")
+        print("    slowest: " + ", ".join(f"{item['module']} {item['self_ms']} ms"
+                                          for item in report["slowest"]))
+        if report["created_files"]:
+            print("    created: " + ", ".join(report["created_files"]))
+
+
+if __name__ == "__main__":
+    main()
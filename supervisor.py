@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Supervisor that keeps telegram_bot running
+
+Started with "python telegram_bot.py --supervise". It runs the bot as a
+child process and blocks in waitpid() on it, so a crash is noticed the
+moment it happens and the bot is started again right away. Restarts that
+follow each other quickly back off exponentially up to a bound; a child
+that ran for a while counts as healthy and resets the backoff. There is no
+restart limit.
+
+The restart counters are handed to every new child in the
+TELEGRAM_BOT_SUPERVISOR environment variable (JSON), so the bot can show
+them on /health without any file or network I/O.
+
+With a listen address the supervisor owns the health server's listening
+socket and every child inherits it (HEALTH_SOCKET_FD), so connections keep
+queueing on it while a child restarts. SIGHUP hands over to a new child
+without downtime: the new child is started first, then the old one gets
+SIGUSR1 to drain its broadcasts and exit while it keeps answering on the
+socket; the new child waits for it and starts accepting on the socket
+only once it is ready.
+
+SIGTERM and SIGINT are forwarded to the children; the supervisor exits once
+they have stopped.
+"""
+
+import json
+import logging
+import os
+import queue
+import signal
+import socket
+import subprocess
+import threading
+import time
+from datetime import datetime
+
+from instance_lock import InstanceLock
+
+logger = logging.getLogger(__name__)
+
+STATUS_ENV = "TELEGRAM_BOT_SUPERVISOR"
+SOCKET_FD_ENV = "HEALTH_SOCKET_FD"
+DEFAULT_LOCK_FILE = "supervisor.pid"
+BACKOFF_BASE = 1        # seconds before restarting after the first quick exit
+BACKOFF_MAX = 60        # restart delay never grows beyond this
+STABLE_AFTER = 300      # seconds a child must run to reset the backoff
+
+
+def child_status(environ=None):
+    """
+    Read the status a supervisor handed to this process.
+
+    Returns:
+        dict: Supervisor status, or None if the process is not supervised
+    """
+    value = (environ if environ is not None else os.environ).get(STATUS_ENV)
+    if not value:
+        return None
+    try:
+        return json.loads(value)
+    except ValueError:
+        return None
+
+
+class Supervisor:
+    """
+    Runs a command as a child process and restarts it whenever it exits.
+    """
+
+    def __init__(self, command, lock_file=DEFAULT_LOCK_FILE, backoff_base=BACKOFF_BASE,
+                 backoff_max=BACKOFF_MAX, stable_after=STABLE_AFTER, listen_address=None):
+        """
+        Args:
+            command (list): Child command line
+            lock_file (str): PID file keeping a second supervisor from starting
+            backoff_base (float): Delay before the first quick restart
+            backoff_max (float): Upper bound of the restart delay
+            stable_after (float): Run time after which a child is considered healthy
+            listen_address (tuple): (host, port) of a listening socket shared
+                with the children, None to let each child bind its own
+        """
+        self.command = command
+        self.listen_address = listen_address
+        self.listener = None
+        self.lock = InstanceLock(lock_file)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.stable_after = stable_after
+        self.started_at = datetime.now()
+        self.restarts = 0
+        self.handoffs = 0
+        self.quick_exits = 0
+        self.last_exit_code = None
+        self.last_exit_at = None
+        # The current child, plus children still draining after a handoff
+        self.child = None
+        self.running = {}
+        self._stopping = False
+        # SimpleQueue.put() is safe to call from signal handlers
+        self._events = queue.SimpleQueue()
+
+    def status(self):
+        """
+        Returns:
+            dict: Restart counters handed to each child
+        """
+        return {
+            "supervisor_pid": os.getpid(),
+            "started_at": self.started_at.isoformat(),
+            "restarts": self.restarts,
+            "handoffs": self.handoffs,
+            "quick_exits": self.quick_exits,
+            "last_exit_code": self.last_exit_code,
+            "last_exit_at": self.last_exit_at.isoformat() if self.last_exit_at else None
+        }
+
+    def restart_delay(self):
+        """
+        Returns:
+            float: Seconds to wait before the next start
+        """
+        if not self.quick_exits:
+            return 0
+        return min(self.backoff_max, self.backoff_base * 2 ** (self.quick_exits - 1))
+
+    def _handle_signal(self, signum, frame):
+        self._events.put(("handoff",) if signum == signal.SIGHUP else ("stop", signum))
+
+    def start_child(self, previous=None):
+        """
+        Start a child and a thread that reports its exit.
+
+        Args:
+            previous (Popen): Child being handed over from; the new child
+                waits for it to drain
+        """
+        env = {**os.environ, STATUS_ENV: json.dumps({
+            **self.status(),
+            "handoff": previous is not None,
+            "previous_pid": previous.pid if previous is not None else None
+        })}
+        pass_fds = ()
+        if self.listener is not None:
+            env[SOCKET_FD_ENV] = str(self.listener.fileno())
+            pass_fds = (self.listener.fileno(),)
+        child = subprocess.Popen(self.command, env=env, pass_fds=pass_fds)
+        self.child = child
+        self.running[child.pid] = child
+        logger.info(f"Started child {child.pid} (restart {self.restarts})")
+        threading.Thread(target=self._wait_child, args=(child, time.monotonic()),
+                         name=f'wait-{child.pid}', daemon=True).start()
+
+    def _wait_child(self, child, started):
+        # Popen.wait() blocks in waitpid(), so an exit is seen immediately
+        exit_code = child.wait()
+        self._events.put(("exit", child, exit_code, time.monotonic() - started))
+
+    def _on_exit(self, child, exit_code, ran_for):
+        """
+        Returns:
+            float: Seconds until the next start, None if no restart is needed
+        """
+        del self.running[child.pid]
+        if child is not self.child:
+            logger.info(f"Previous child {child.pid} exited with code {exit_code} after handoff")
+            return None
+        self.child = None
+        self.last_exit_code = exit_code
+        self.last_exit_at = datetime.now()
+        if self._stopping:
+            logger.info(f"Child stopped with exit code {exit_code}")
+            return None
+
+        self.quick_exits = 0 if ran_for >= self.stable_after else self.quick_exits + 1
+        delay = self.restart_delay()
+        logger.error(f"Child exited with code {exit_code} after {ran_for:.1f}s, "
+                     f"restarting in {delay:.1f}s")
+        return delay
+
+    def _handoff(self):
+        """Start a new child on the shared socket, then let the current one drain."""
+        if self._stopping or self.child is None:
+            return
+        previous = self.child
+        self.restarts += 1
+        self.handoffs += 1
+        logger.info(f"Handing over from child {previous.pid} to a new child")
+        self.start_child(previous=previous)
+        previous.send_signal(signal.SIGUSR1)
+
+    def run(self):
+        """
+        Keep a child running until SIGTERM or SIGINT.
+
+        Returns:
+            int: Exit code for the supervisor process
+        """
+        if not self.lock.acquire():
+            logger.error(f"Another supervisor is already running (PID {self.lock.holder_pid()})")
+            return 1
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(signum, self._handle_signal)
+        try:
+            if self.listen_address is not None:
+                try:
+                    self.listener = socket.create_server(self.listen_address, backlog=128)
+                except OSError as e:
+                    logger.error(f"Could not listen on {self.listen_address[0]}:"
+                                 f"{self.listen_address[1]}: {e}")
+                    return 1
+                self.listener.set_inheritable(True)
+                logger.info(f"Listening on {self.listen_address[0]}:{self.listen_address[1]} "
+                            f"for the children")
+            logger.info(f"Supervising: {' '.join(self.command)}")
+            self.start_child()
+            restart_at = None
+            while self.running or restart_at is not None:
+                timeout = None if restart_at is None else max(0.0, restart_at - time.monotonic())
+                try:
+                    event = self._events.get(timeout=timeout)
+                except queue.Empty:
+                    restart_at = None
+                    self.restarts += 1
+                    self.start_child()
+                    continue
+
+                if event[0] == "exit":
+                    delay = self._on_exit(*event[1:])
+                    if delay is not None:
+                        restart_at = time.monotonic() + delay
+                elif event[0] == "handoff":
+                    self._handoff()
+                elif event[0] == "stop":
+                    self._stopping = True
+                    restart_at = None
+                    for child in self.running.values():
+                        logger.info(f"Forwarding signal {event[1]} to child {child.pid}")
+                        child.send_signal(event[1])
+            return 0
+        finally:
+            if self.listener is not None:
+                self.listener.close()
+            self.lock.release()
@@ -7,33 +7,50 @@ on a regular schedule (every 4 hours).
 """
 
 import time
-import requests
 import os
 import logging
+import signal
 import sys
 from datetime import datetime, timedelta
-import schedule
 import json
 import threading
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from collections import OrderedDict
+from weakref import WeakSet
+from urllib.parse import quote, unquote
 import socket
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('telegram_bot.log'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+from bot_api import BotApiClient, SendResult
+from broadcast import BroadcastEngine, BroadcastProgress, Deadline
+from delivery_journal import DeliveryJournal, STATUS_SENT, STATUS_FAILED
+from group_registry import GroupRegistry, dead_chat_class
+from health import HealthMonitor
+from instance_lock import InstanceLock
+from leader_lease import LeaderLease
+from logging_setup import setup_console_logging, setup_logging
+from media_cache import MAX_CAPTION_LENGTH, MEDIA_METHODS, MediaFileCache, MediaSender
+from metrics import BROADCAST_SECONDS
+from payload_cache import PayloadCache, PayloadError
+from rate_limiter import RateLimiter
+from retry_queue import RetryPolicy
+from timer_scheduler import TimerScheduler, daily_at, next_daily_fire, resolve_timezone
+from token_pool import TokenPool, TokenShard, bot_id_of
+
+# Set up in main(), so CLI commands and imports leave the log file alone
+LOG_FILE = 'telegram_bot.log'
 
 logger = logging.getLogger(__name__)
 
 # Bot configuration
 BOT_TOKEN = os.getenv('BOT_TOKEN', '8093207171:AAGoIRsBcpBXPfLRz4RvXv3wMwdmEib6jn4')
+# Optional comma-separated tokens of several bots that share the broadcasts.
+# Each group is sent to by one of them, so every bot must be a member of the
+# groups; the first token checks the bot status and answers commands.
+BOT_TOKENS = [token.strip() for token in os.getenv('BOT_TOKENS', '').split(',')
+              if token.strip()] or [BOT_TOKEN]
 
 # Target group IDs
+# Used to seed the group registry (groups.db) on first start; manage groups
+# afterwards with --import-groups / --export-groups
 GROUP_IDS = [
     -1002111810768,
     -1002098871252,
@@ -44,46 +61,89 @@ GROUP_IDS = [
 
 # Health check server configuration
 HEALTH_CHECK_PORT = 5000
+HEALTH_CACHE_TTL = 300  # Seconds between background bot token checks
+
+# Admin API on the health server, used by the CLI flags. Requests need
+# "Authorization: Bearer <token>"; the token comes from ADMIN_TOKEN or is
+# generated into ADMIN_TOKEN_FILE (readable only by the bot's user).
+ADMIN_TOKEN_FILE = ".admin_token"
+ADMIN_API_URL = os.getenv('ADMIN_API_URL', f"http://127.0.0.1:{HEALTH_CHECK_PORT}")
+admin_token = None
+
+# Telegram commands (/schedule, /broadcast, /stats), received by long polling.
+# Only the comma-separated user IDs in TELEGRAM_ADMIN_IDS may use them; when
+# it is empty the bot stays send-only and never calls getUpdates.
+TELEGRAM_ADMIN_IDS = [int(user_id) for user_id in os.getenv('TELEGRAM_ADMIN_IDS', '').split(',')
+                      if user_id.strip()]
+UPDATES_OFFSET_FILE = "updates_offset.txt"
+UPDATES_POLL_TIMEOUT = 50
+COMMAND_WORKERS = 2
+update_receiver = None
+
+def health_status():
+    """
+    Returns:
+        dict: Payload of /health, built from in-memory state only
+    """
+    return {
+        "status": "ok",
+        "service": "telegram-promotional-bot",
+        **health_monitor.status(),
+        "next_scheduled_run": get_next_scheduled_time(),
+        "timezone": TIMEZONE,
+        "rate_limiter": rate_limiter.snapshot(),
+        "bots": token_pool.snapshot(),
+        "leader_lease": leader_lease.status(),
+        "supervisor": supervisor_status,
+        "timestamp": datetime.now().isoformat()
+    }
+
 
-class HealthCheckHandler(BaseHTTPRequestHandler):
-    """Simple HTTP handler for health checks"""
+def health_readiness():
+    """
+    Returns:
+        tuple: (ready, details) for /ready
+    """
+    return health_monitor.is_ready(), health_monitor.status()
+
+
+def create_health_check_server(address):
+    """
+    Create the health check and admin API server (not yet serving).
     
-    def do_GET(self):
-        """Handle GET requests for health check"""
-        if self.path == '/health' or self.path == '/':
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            
-            # Check if bot is properly configured
-            bot_status = "healthy" if validate_bot_token() else "unhealthy"
-            next_run = get_next_scheduled_time()
-            
-            response = {
-                "status": "ok",
-                "service": "telegram-promotional-bot",
-                "bot_status": bot_status,
-                "next_scheduled_run": next_run,
-                "timezone": TIMEZONE,
-                "timestamp": datetime.now().isoformat()
-            }
-            
-            self.wfile.write(json.dumps(response).encode('utf-8'))
-        else:
-            self.send_response(404)
-            self.send_header('Content-type', 'text/plain')
-            self.end_headers()
-            self.wfile.write(b'Not Found')
+    http.server is imported here rather than at module level, so CLI
+    commands do not pay for it.
     
-    def log_message(self, format, *args):
-        """Override to reduce HTTP server logging noise"""
-        pass
+    Args:
+        address (tuple): (host, port) to listen on
+        
+    Returns:
+        HealthCheckServer: The bound server
+    """
+    from health_server import HealthCheckServer
+    
+    return HealthCheckServer(address, health_status, health_readiness,
+                             admin_handler=handle_admin_request, admin_token=admin_token)
 
 
 def start_health_check_server():
-    """Start the health check HTTP server in a separate thread"""
+    """
+    Start the health check HTTP server in a separate thread.
+    
+    Under a supervisor started with --supervise the server accepts on the
+    listening socket the supervisor owns (HEALTH_SOCKET_FD), which stays
+    open across restarts and handoffs.
+    """
     try:
-        server = HTTPServer(('0.0.0.0', HEALTH_CHECK_PORT), HealthCheckHandler)
+        inherited_fd = os.getenv('HEALTH_SOCKET_FD')
+        if inherited_fd:
+            from health_server import HealthCheckServer
+            
+            server = HealthCheckServer(None, health_status, health_readiness,
+                                       admin_handler=handle_admin_request, admin_token=admin_token,
+                                       sock=socket.socket(fileno=int(inherited_fd)))
+        else:
+            server = create_health_check_server(('0.0.0.0', HEALTH_CHECK_PORT))
         server_thread = threading.Thread(target=server.serve_forever, daemon=True)
         server_thread.start()
         logger.info(f"Health check server started on port {HEALTH_CHECK_PORT}")
@@ -121,6 +181,11 @@ MESSAGE = """🔔 Наші інші корисні Telegram-групи:
 
 """
 
+# Optional photo/document sent with MESSAGE, e.g. {"path": "promo.jpg", "type": "photo"}
+# ("type" is "photo" or "document"). It is uploaded once and reused by file_id.
+PROMO_MEDIA = None
+MEDIA_CACHE_FILE = "media_file_ids.json"
+
 # Schedule configuration - specific times to send messages
 # You can customize these times by changing the values below
 # Format: "HH:MM" in 24-hour format
@@ -131,145 +196,714 @@ SCHEDULE_TIMES = [
     "21:00"   # 9:00 PM
 ]
 
+# Rate limits for the Telegram Bot API
+# Telegram allows roughly 30 messages/second per bot and 20 messages/minute per group
+RATE_LIMITS = {
+    "global_per_second": 30,
+    "global_burst": 30,
+    "per_chat_per_minute": 20,
+    "per_chat_burst": 3
+}
+
 # Alternative schedule examples:
 # For business hours only: ["09:00", "12:00", "15:00", "18:00"]
 # For more frequent: ["08:00", "11:00", "14:00", "17:00", "20:00", "23:00"]
 # For morning and evening: ["08:00", "20:00"]
 
 # Advanced scheduling configuration
-TIMEZONE = "GMT+3"  # Set your timezone (UTC, Europe/Kiev, America/New_York, etc.)
+TIMEZONE = "GMT+3"  # Set your timezone (GMT+3, UTC, Europe/Kyiv, America/New_York, etc.)
+# Groups in the registry may override it with their own IANA timezone
 SCHEDULE_CONFIG_FILE = "schedule_config.json"
+CONFIG_CHECK_INTERVAL = 5  # Seconds between checks for edits to SCHEDULE_CONFIG_FILE
+config_signature = None    # (mtime, size, inode) of the config file last loaded or saved
+
+# Retries for throttled (429) and transient (5xx, network) send failures
+RETRY_POLICY = {
+    "max_attempts": 5,            # per message, including the first attempt
+    "max_retries_per_slot": 500,  # total retries of a slot, across all its passes
+    "base_delay": 1,              # seconds, doubled on each transient failure
+    "max_delay": 60,
+    "max_retry_after": 300        # give up on a chat if Telegram asks to wait longer
+}
+
+# Number of groups messaged in parallel during a broadcast
+BROADCAST_WORKERS = 16
+
+# Time budget of one broadcast pass in seconds (None for no limit). Every
+# request gets at most the remaining budget as its timeout; chats not done
+# in time get up to FOLLOWUP_PASSES more passes, FOLLOWUP_DELAY apart.
+# Keep it below the gap between two slots; raise it for large registries.
+BROADCAST_DEADLINE = 100
+FOLLOWUP_PASSES = 2
+FOLLOWUP_DELAY = 60
+DEADLINE_EXCEEDED = "Broadcast deadline exceeded"
+
+# Seconds in-flight broadcasts get to finish after SIGTERM (or SIGUSR1 in a
+# handoff); chats not sent by then are resumed from the delivery journal by
+# the next process. A new process taking over waits up to HANDOFF_TIMEOUT
+# for the old one to exit.
+DRAIN_TIMEOUT = 25
+HANDOFF_TIMEOUT = DRAIN_TIMEOUT + 35
+# Broadcast passes in progress, so a drain can cut their deadline short
+active_engines = WeakSet()
+shutting_down = threading.Event()
+
+# Bot API connection pool (per bot) and per-method timeouts (seconds)
+API_POOL_SIZE = BROADCAST_WORKERS
+API_TIMEOUTS = {
+    "getMe": 10,
+    "sendMessage": 30,
+    "sendPhoto": 60,
+    "sendDocument": 120
+}
+
+
+def create_rate_limiter(limits):
+    """
+    Build a rate limiter from a RATE_LIMITS style dictionary.
+    
+    Args:
+        limits (dict): Rate limit configuration
+        
+    Returns:
+        RateLimiter: Limiter shared by all sends
+    """
+    return RateLimiter(
+        global_rate=limits["global_per_second"],
+        global_burst=limits["global_burst"],
+        per_chat_rate=limits["per_chat_per_minute"] / 60,
+        per_chat_burst=limits["per_chat_burst"]
+    )
 
 
-def send_message(chat_id, text):
+def media_cache_file(index, token):
+    """
+    Returns:
+        str: file_id cache of a bot; file_ids are only valid for the bot that uploaded
+    """
+    if index == 0:
+        return MEDIA_CACHE_FILE
+    base, extension = os.path.splitext(MEDIA_CACHE_FILE)
+    return f"{base}.{bot_id_of(token)}{extension}"
+
+
+def create_token_shard(index, token):
+    """
+    Returns:
+        TokenShard: A bot of the pool with its own connections, rate limiter
+            and cached media uploads
+    """
+    client = BotApiClient(token, pool_size=API_POOL_SIZE, timeouts=API_TIMEOUTS)
+    return TokenShard(token, client, create_rate_limiter(RATE_LIMITS),
+                      MediaSender(client, MediaFileCache(media_cache_file(index, token))))
+
+
+def apply_rate_limits(limits):
+    """
+    Give every bot of the pool a fresh limiter built from limits.
+    """
+    global rate_limiter
+    for shard in token_pool:
+        shard.rate_limiter = create_rate_limiter(limits)
+    rate_limiter = token_pool.primary.rate_limiter
+
+
+# Bots sending the broadcasts; groups are spread over them by consistent hashing
+token_pool = TokenPool(create_token_shard(index, token) for index, token in enumerate(BOT_TOKENS))
+# The primary bot, used for token checks and command replies
+api_client = token_pool.primary.api_client
+rate_limiter = token_pool.primary.rate_limiter
+
+# Event-driven scheduler that fires broadcasts at SCHEDULE_TIMES. Its clock
+# is the bot's notion of "now"; simulation.py swaps in a virtual one
+scheduler = TimerScheduler()
+SLOT_JOB_PREFIX = "slot "
+HEARTBEAT_INTERVAL = 1800  # Seconds between heartbeat log lines
+
+# SQLite group registry with per-group message, schedule and status
+GROUP_REGISTRY_FILE = "groups.db"
+group_registry = None
+
+# Per-chat delivery journal used to resume a broadcast after a crash
+DELIVERY_JOURNAL_FILE = "delivery_journal.jsonl"
+RESUME_WINDOW = 3600  # Seconds after its start an interrupted slot is still resumed
+delivery_journal = None
+
+# Progress of recent broadcasts, served by the admin API
+BROADCAST_HISTORY_SIZE = 20
+broadcast_history = OrderedDict()
+broadcast_history_lock = threading.Lock()
+# Send state shared by every pass of a slot (first pass, follow-ups, resumes):
+# slot -> (RetryPolicy, sent_parts), so the retry budget is per slot, not per pass
+slot_send_states = OrderedDict()
+
+# Serialises schedule changes made by the admin API and by config reloads
+schedule_lock = threading.RLock()
+
+# Validated, pre-encoded message bodies; only chat_id is added per send
+payload_cache = PayloadCache()
+
+# Lease shared with cron_sender and keepalive_sender so only one process broadcasts
+LEASE_FILE = "broadcast_leader.lease"
+# Seconds between lease attempts while a slot waits for a standby to hand it back
+LEASE_RETRY_POLL = 0.5
+leader_lease = LeaderLease("telegram_bot", LEASE_FILE,
+                           on_acquire=lambda: resume_interrupted_broadcasts())
+
+# Single-instance lock, held while the bot runs
+PID_FILE = "telegram_bot.pid"
+instance_lock = InstanceLock(PID_FILE)
+
+# Restart counters from supervisor.py when started with --supervise, shown on /health
+SUPERVISOR_LOG_FILE = "supervisor.log"
+supervisor_status = None
+
+# Cached bot status served by the health endpoints
+health_monitor = HealthMonitor(lambda: validate_bot_token(verbose=False), ttl=HEALTH_CACHE_TTL)
+
+
+def clock_now(tz=None):
+    """
+    Returns:
+        datetime: Current time from the scheduler's clock, aware in tz if
+            given, otherwise naive local time like datetime.now()
+    """
+    now = scheduler.clock()
+    return now.astimezone(tz) if tz else now.astimezone().replace(tzinfo=None)
+
+
+def acquire_send_slot(limiter, chat_id, deadline=None):
+    """
+    Wait for the rate limiter of a bot, but never past the broadcast deadline.
+    
+    Called right before every request, so no request is sent once the
+    deadline has expired.
+    
+    Returns:
+        bool: False if the deadline has expired or would expire while waiting;
+            no rate limiter token is used then
+    """
+    if deadline is None:
+        limiter.acquire(chat_id)
+        return True
+    max_wait = deadline.remaining()
+    if max_wait <= 0:
+        return False
+    return limiter.acquire(chat_id, max_wait=max_wait) <= max_wait and not deadline.expired()
+
+
+def send_message(chat_id, text, deadline=None, sent_parts=None):
     """
     Send a message to a specific Telegram chat/group.
     
     Args:
         chat_id (int): The chat ID to send the message to
         text (str): The message text to send
+        deadline (Deadline): Budget of the broadcast; caps every request timeout
+        sent_parts (dict): chat_id -> number of parts (media first) already
+            sent, kept across retries of the same broadcast
         
+    Texts longer than Telegram's 4096-character limit are sent as several
+    messages; the result is that of the last part sent. When PROMO_MEDIA is
+    set the media goes first, with the text as its caption if it fits. With
+    sent_parts, a retry after a failed part starts at that part, so the
+    parts already sent are not repeated. If the group was upgraded to a
+    supergroup, the registry is moved to the new chat ID and the message is
+    sent there instead; the result then carries the new ID in chat_id. With
+    several BOT_TOKENS the chat is sent to by the bot token_pool assigns it to.
+    
     Returns:
-        bool: True if message was sent successfully, False otherwise
+        SendResult: Truthy if the message was sent successfully
     """
-    url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
-    data = {
-        "chat_id": chat_id,
-        "text": text,
-        "parse_mode": "HTML"
-    }
+    try:
+        payload = payload_cache.get(text, "HTML")
+    except PayloadError as e:
+        logger.error(f"Message for chat {chat_id} is not valid Telegram HTML: {e}")
+        return SendResult(False, error_code=400, description=str(e))
+    
+    import requests  # loaded lazily by bot_api; only a module lookup here
     
+    shard = token_pool.shard_for(chat_id)
+    client = shard.api_client
     try:
-        response = requests.post(url, data=data, timeout=30)
+        result = None
+        done = sent_parts.get(chat_id, 0) if sent_parts is not None else 0
+        steps = 0
+        parts = range(len(payload))
+        if PROMO_MEDIA:
+            caption = text if len(text) <= MAX_CAPTION_LENGTH else None
+            kind = PROMO_MEDIA.get("type", "photo")
+            steps = 1
+            if done < steps:
+                if not acquire_send_slot(shard.rate_limiter, chat_id, deadline):
+                    return SendResult.failure(DEADLINE_EXCEEDED)
+                timeout = deadline.timeout(client.timeout_for(MEDIA_METHODS[kind])) if deadline else None
+                result = shard.media_sender.send(chat_id, PROMO_MEDIA["path"], kind, caption, "HTML",
+                                                 timeout=timeout)
+                if caption is not None or not result:
+                    parts = ()
         
-        result = response.json()
+        for index in parts[max(done - steps, 0):]:
+            if result and sent_parts is not None:
+                sent_parts[chat_id] = steps + index
+            if not acquire_send_slot(shard.rate_limiter, chat_id, deadline):
+                return SendResult.failure(DEADLINE_EXCEEDED)
+            timeout = deadline.timeout(client.timeout_for("sendMessage")) if deadline else None
+            result = SendResult.from_response(
+                client.call_encoded("sendMessage", payload.body(chat_id, index), timeout=timeout))
+            if not result:
+                break
         
-        if result.get('ok'):
+        if result and sent_parts is not None:
+            sent_parts.pop(chat_id, None)
+        
+        if result:
             logger.info(f"Message sent successfully to chat {chat_id}")
-            return True
+        elif result.migrate_to_chat_id and result.migrate_to_chat_id != chat_id:
+            logger.warning(f"Chat {chat_id} was upgraded to supergroup {result.migrate_to_chat_id}")
+            get_group_registry().migrate_chat(chat_id, result.migrate_to_chat_id)
+            migrated = send_message(result.migrate_to_chat_id, text, deadline, sent_parts)
+            if migrated.chat_id is None:
+                migrated.chat_id = result.migrate_to_chat_id
+            return migrated
+        elif result.error_code == 429:
+            logger.warning(f"Rate limited when sending to chat {chat_id}, retry after {result.retry_after}s")
+            shard.rate_limiter.throttle(chat_id, result.retry_after)
         else:
-            error_description = result.get('description', 'Unknown error')
-            error_code = result.get('error_code', 'Unknown code')
-            logger.error(f"Failed to send message to chat {chat_id}: Code {error_code} - {error_description}")
-            return False
+            error_code = result.error_code or 'Unknown code'
+            logger.error(f"Failed to send message to chat {chat_id}: Code {error_code} - {result.description}")
+        return result
             
     except requests.exceptions.RequestException as e:
         logger.error(f"Network error when sending to chat {chat_id}: {str(e)}")
-        return False
+        return SendResult.failure(str(e))
     except ValueError as e:
         logger.error(f"JSON decode error for chat {chat_id}: {str(e)}")
-        return False
+        return SendResult.failure(str(e))
     except Exception as e:
         logger.error(f"Unexpected error when sending to chat {chat_id}: {str(e)}")
-        return False
+        return SendResult.failure(str(e))
 
 
-def send_to_all_groups():
+def get_delivery_journal():
     """
-    Send promotional message to all configured groups.
+    Open the delivery journal on first use.
     
+    Returns:
+        DeliveryJournal: The process-wide journal
+    """
+    global delivery_journal
+    if delivery_journal is None:
+        delivery_journal = DeliveryJournal(DELIVERY_JOURNAL_FILE)
+    return delivery_journal
+
+
+def get_group_registry():
+    """
+    Open the group registry on first use, seeding it from GROUP_IDS if empty.
+    
+    Returns:
+        GroupRegistry: The process-wide registry
+    """
+    global group_registry
+    if group_registry is None:
+        group_registry = GroupRegistry(GROUP_REGISTRY_FILE)
+        group_registry.seed(GROUP_IDS)
+    return group_registry
+
+
+def make_slot_id(schedule_time=None, tz_name=None):
+    """
+    Build the journal identifier of a broadcast slot.
+    
+    Args:
+        schedule_time (str): Scheduled time in HH:MM format, None for a manual send
+        tz_name (str): Timezone of the slot, None for TIMEZONE
+        
+    Returns:
+        str: Slot identifier such as "2025-07-09T09:00" or "2025-07-09T09:00@Europe/Kyiv"
+    """
+    if schedule_time is None:
+        return f"manual-{clock_now().isoformat(timespec='seconds')}"
+    tz_name = tz_name or TIMEZONE
+    local_date = clock_now(resolve_timezone(tz_name)).date().isoformat()
+    slot = f"{local_date}T{schedule_time}"
+    if tz_name != TIMEZONE:
+        slot += f"@{tz_name}"
+    return slot
+
+
+def parse_slot_id(slot):
+    """
+    Split a slot identifier into its scheduled time and timezone.
+    
+    Returns:
+        tuple: (HH:MM, timezone name), or (None, None) for a manual send
+    """
+    if slot.startswith("manual-") or "T" not in slot:
+        return None, None
+    time_part = slot.split("T", 1)[1]
+    schedule_time, _, tz_name = time_part.partition("@")
+    return schedule_time, tz_name or TIMEZONE
+
+
+def track_broadcast(slot, exclusive=False):
+    """
+    Start tracking the progress of a broadcast.
+    
+    Args:
+        slot (str): Slot identifier
+        exclusive (bool): Refuse if this process is already broadcasting the
+            slot or has a follow-up pass of it pending
+    
+    Returns:
+        BroadcastProgress: Progress object listed by the admin API, or None
+            if exclusive and the slot is active
+    """
+    progress = BroadcastProgress(slot)
+    with broadcast_history_lock:
+        current = broadcast_history.get(slot)
+        if exclusive and current is not None and current.state in ("running", "deferred"):
+            return None
+        broadcast_history[slot] = progress
+        while len(broadcast_history) > BROADCAST_HISTORY_SIZE:
+            broadcast_history.popitem(last=False)
+    return progress
+
+
+def slot_send_state(slot):
+    """
+    Get the send state shared by every pass of a slot, creating it on first use.
+    
+    Args:
+        slot (str): Slot identifier
+    
+    Returns:
+        tuple: (RetryPolicy, sent_parts) where sent_parts maps chat_id to the
+            number of parts of a multi-part message already sent
+    """
+    with broadcast_history_lock:
+        state = slot_send_states.get(slot)
+        if state is None:
+            state = slot_send_states[slot] = (RetryPolicy.from_config(RETRY_POLICY), {})
+            while len(slot_send_states) > BROADCAST_HISTORY_SIZE:
+                slot_send_states.popitem(last=False)
+        return state
+
+
+def send_to_all_groups(slot=None, progress=None):
+    """
+    Send promotional message to all groups due at the slot.
+    
+    Groups are streamed from the group registry, each with its own message
+    (or MESSAGE by default). Chats already delivered for the same slot (according to the delivery
+    journal) are skipped, so a broadcast interrupted by a crash resumes
+    where it stopped, and a slot the journal has completed is not sent
+    again. Chats the bot was removed from are marked dead and
+    skipped until their next re-probe. The pass ends within
+    BROADCAST_DEADLINE; chats it could not finish go to a follow-up pass.
+    
+    Args:
+        slot (str): Slot identifier from make_slot_id(), None for a manual send
+        progress (BroadcastProgress): Progress to update, tracked anew if None
+        
     Returns:
         tuple: (successful_sends, total_groups)
     """
-    current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    current_time = clock_now().strftime('%Y-%m-%d %H:%M:%S')
     logger.info(f"Starting scheduled message broadcast at {current_time} to all groups")
-    successful_sends = 0
     
-    # Check if we already sent messages in the last minute to prevent duplicates
-    last_send_file = 'last_send_time.txt'
-    try:
-        if os.path.exists(last_send_file):
-            with open(last_send_file, 'r') as f:
-                last_send_time = f.read().strip()
-                last_send_datetime = datetime.fromisoformat(last_send_time)
-                time_diff = (datetime.now() - last_send_datetime).total_seconds()
-                
-                if time_diff < 120:  # Less than 2 minutes ago
-                    logger.warning(f"Skipping duplicate send - last message sent {time_diff:.0f} seconds ago")
-                    return 0, len(GROUP_IDS)
-    except Exception as e:
-        logger.debug(f"Could not check last send time: {e}")
+    journal = get_delivery_journal()
+    registry = get_group_registry()
+    if slot is None:
+        slot = make_slot_id()
+    if progress is None:
+        progress = track_broadcast(slot)
+    already_delivered = journal.delivered(slot)
     
-    for chat_id in GROUP_IDS:
-        if send_message(chat_id, MESSAGE):
-            successful_sends += 1
-        # Small delay between messages to avoid rate limiting
-        time.sleep(1)
+    # Each slot is sent once; other slots, however close in time, are not duplicates
+    if journal.is_complete(slot):
+        logger.warning(f"Skipping duplicate send - slot {slot} was already broadcast")
+        progress.finish(0, 0, state="skipped")
+        return 0, registry.count()
     
-    # Record the send time to prevent duplicates
-    try:
-        with open(last_send_file, 'w') as f:
-            f.write(datetime.now().isoformat())
-    except Exception as e:
-        logger.debug(f"Could not save last send time: {e}")
+    if already_delivered:
+        logger.info(f"Resuming slot {slot}: {len(already_delivered)} groups already delivered")
+    journal.start_slot(slot)
+    
+    skipped_dead = registry.count_dead()
+    if skipped_dead:
+        logger.info(f"Skipping {skipped_dead} known-dead chats")
+    
+    schedule_time, tz_name = parse_slot_id(slot)
+    due_groups = registry.iter_due(schedule_time, timezone=tz_name, default_timezone=TIMEZONE,
+                                   include_default_schedule=schedule_time in SCHEDULE_TIMES)
+    pending = ((chat_id, message or MESSAGE)
+               for chat_id, message in due_groups
+               if chat_id not in already_delivered)
+    # One retry budget per slot, and parts of multi-part messages already sent
+    # so retries resume after them; both carry over to follow-ups and resumes
+    retry_policy, sent_parts = slot_send_state(slot)
+    engine = create_broadcast_engine(delivery_recorder(slot, progress), retry_policy, sent_parts)
+    started = time.monotonic()
+    successful_sends, total = engine.run(pending)
+    BROADCAST_SECONDS.labels(schedule_time or "manual").observe(time.monotonic() - started)
+    registry.flush()
+    successful_sends += len(already_delivered)
+    total += len(already_delivered)
+    deferred = len(engine.deferred)
+    if deferred:
+        # The slot stays open in the journal until the follow-up passes are done
+        total += deferred
+        progress.finish(successful_sends, total, state="deferred", deferred=deferred)
+        schedule_followup_pass(slot, engine.deferred, progress, 1)
+    else:
+        journal.complete_slot(slot)
+        progress.finish(successful_sends, total)
+    
+    logger.info(f"Broadcast completed: {successful_sends}/{total} messages sent successfully"
+                + (f", {deferred} deferred to a follow-up pass" if deferred else ""))
+    if progress.by_bot:
+        logger.info("Sent per bot: " + ", ".join(f"{bot_id} {sent} sent/{failed} failed"
+                                                 for bot_id, (sent, failed) in progress.by_bot.items()))
+    return successful_sends, total
+
+
+def create_broadcast_engine(on_result, retry_policy, sent_parts=None):
+    """
+    Args:
+        on_result (callable): Called with the final outcome of each chat
+        retry_policy (RetryPolicy): Retry budget shared by the passes of a slot
+        sent_parts (dict): Per-chat part progress shared by the passes of a slot
+    
+    Returns:
+        BroadcastEngine: Engine for one broadcast pass with, unless
+            BROADCAST_DEADLINE is None, a fresh deadline; it has
+            BROADCAST_WORKERS workers per bot of the token pool
+    """
+    deadline = Deadline(BROADCAST_DEADLINE) if BROADCAST_DEADLINE else None
+    
+    def send(chat_id, text, deadline=None):
+        return send_message(chat_id, text, deadline, sent_parts=sent_parts)
+    
+    engine = BroadcastEngine(send, max_workers=BROADCAST_WORKERS * len(token_pool),
+                             on_result=on_result,
+                             retry_policy=retry_policy, deadline=deadline)
+    active_engines.add(engine)
+    return engine
+
+
+def delivery_recorder(slot, progress):
+    """
+    Build the on_result callback of a broadcast pass.
+    
+    The callback journals each outcome, updates the group registry and the
+    broadcast progress, and keeps the dead-chat cache up to date.
+    
+    Returns:
+        callable: record_delivery(chat_id, result)
+    """
+    journal = get_delivery_journal()
+    registry = get_group_registry()
+    # Dead chats that are still sent to are due for a re-probe
+    known_dead = registry.dead_chat_ids()
+    
+    def record_delivery(chat_id, result):
+        # After a supergroup migration the outcome belongs to the new chat
+        chat_id = getattr(result, 'chat_id', None) or chat_id
+        status = STATUS_SENT if result else STATUS_FAILED
+        journal.record(slot, chat_id, status, getattr(result, 'message_id', None))
+        registry.record_status(chat_id, status)
+        bot_id = token_pool.shard_for(chat_id).bot_id
+        token_pool.record(bot_id, result)
+        progress.record(result, bot_id if len(token_pool) > 1 else None)
+        if result:
+            if chat_id in known_dead and registry.mark_alive(chat_id):
+                logger.info(f"Chat {chat_id} is reachable again")
+            return
+        error_class = dead_chat_class(result)
+        if error_class == "not_member" and len(token_pool) > 1:
+            # Only this bot is missing; the chat itself is fine, so it is not
+            # marked dead (the 403 is counted per bot in /health)
+            logger.warning(f"Bot {bot_id} is not a member of chat {chat_id}; add it to the group")
+        elif error_class:
+            next_probe = registry.mark_dead(chat_id, error_class, result.error_code,
+                                            result.description, bot_id=bot_id)
+            logger.warning(f"Chat {chat_id} marked dead ({error_class}), next probe at "
+                           f"{datetime.fromtimestamp(next_probe).strftime('%Y-%m-%d %H:%M')}")
+    
+    return record_delivery
+
+
+def schedule_followup_pass(slot, deliveries, progress, attempt):
+    """
+    Hand the chats a broadcast pass could not finish in time to a later pass.
+    
+    Args:
+        slot (str): Slot identifier
+        deliveries (list): Deferred (chat_id, text) pairs
+        progress (BroadcastProgress): Progress of the original broadcast
+        attempt (int): Number of the follow-up pass, starting at 1
+    """
+    logger.warning(f"Broadcast deadline reached for slot {slot}: {len(deliveries)} chats "
+                   f"deferred to follow-up pass {attempt} in {FOLLOWUP_DELAY}s")
+    scheduler.add_once(FOLLOWUP_DELAY,
+                       lambda: run_followup_pass(slot, deliveries, progress, attempt),
+                       name=f"followup {slot}", background=True)
+
+
+def run_followup_pass(slot, deliveries, progress, attempt):
+    """
+    Send the chats deferred by an earlier pass of the same slot.
+    
+    The pass has a deadline of its own but shares the slot's retry budget
+    and part progress. Chats it can not finish either go to the next
+    follow-up pass, or are recorded as failed after FOLLOWUP_PASSES.
+    
+    Args:
+        slot (str): Slot identifier
+        deliveries (list): Deferred (chat_id, text) pairs
+        progress (BroadcastProgress): Progress of the original broadcast
+        attempt (int): Number of this follow-up pass, starting at 1
+    """
+    journal = get_delivery_journal()
+    delivered = journal.delivered(slot)
+    pending = [(chat_id, text) for chat_id, text in deliveries if chat_id not in delivered]
+    logger.info(f"Follow-up pass {attempt} for slot {slot}: {len(pending)} chats")
+    
+    record_delivery = delivery_recorder(slot, progress)
+    retry_policy, sent_parts = slot_send_state(slot)
+    engine = create_broadcast_engine(record_delivery, retry_policy, sent_parts)
+    successful_sends, total = engine.run(pending)
+    get_group_registry().flush()
+    logger.info(f"Follow-up pass {attempt} for slot {slot}: "
+                f"{successful_sends}/{total} messages sent successfully")
     
-    logger.info(f"Broadcast completed: {successful_sends}/{len(GROUP_IDS)} messages sent successfully")
-    return successful_sends, len(GROUP_IDS)
+    snapshot = progress.snapshot()
+    if engine.deferred and attempt < FOLLOWUP_PASSES:
+        progress.finish(snapshot["sent"], snapshot["total"], state="deferred",
+                        deferred=len(engine.deferred))
+        schedule_followup_pass(slot, engine.deferred, progress, attempt + 1)
+        return
+    
+    if engine.deferred:
+        logger.error(f"Giving up on {len(engine.deferred)} chats of slot {slot} "
+                     f"after {FOLLOWUP_PASSES} follow-up passes")
+        for chat_id, _ in engine.deferred:
+            record_delivery(chat_id, SendResult.failure(DEADLINE_EXCEEDED))
+        snapshot = progress.snapshot()
+    journal.complete_slot(slot)
+    progress.finish(snapshot["sent"], snapshot["total"])
+
+
+def run_scheduled_broadcast(schedule_time, tz_name=None):
+    """
+    Broadcast for a scheduled slot if this process holds the leader lease.
+    
+    Args:
+        schedule_time (str): Scheduled time in HH:MM format
+        tz_name (str): Timezone of the slot, None for TIMEZONE
+    """
+    # try_acquire() also takes over right away if the previous leader just died.
+    # A standby that still leads hands the lease back within one heartbeat and
+    # defers its own run of the slot to this bot, so wait for it instead of
+    # letting nobody send the slot
+    give_up_at = time.monotonic() + leader_lease.heartbeat_interval + leader_lease.standby_poll
+    while not leader_lease.try_acquire():
+        if time.monotonic() >= give_up_at:
+            logger.warning(f"Skipping slot {schedule_time}: broadcast lease is held by "
+                           f"{leader_lease.status()['leader']}")
+            return
+        time.sleep(LEASE_RETRY_POLL)
+    if not leader_lease.check_fencing():
+        logger.error(f"Skipping slot {schedule_time}: broadcast lease was taken over")
+        leader_lease.release()
+        return
+    
+    send_to_all_groups(make_slot_id(schedule_time, tz_name))
+
+
+def slot_job_name(schedule_time, tz_name):
+    """
+    Returns:
+        str: Scheduler job name of a (time, timezone) slot
+    """
+    return f"{SLOT_JOB_PREFIX}{schedule_time} {tz_name}"
+
+
+def get_schedule_slots():
+    """
+    Collect every (time, timezone) pair that needs a timer.
+    
+    Default SCHEDULE_TIMES fire in TIMEZONE and in every timezone used by
+    registry groups without their own schedule; groups with their own
+    schedule add their own (time, timezone) pairs.
+    
+    Returns:
+        set: (HH:MM, timezone name) pairs
+    """
+    explicit, default_zones = get_group_registry().slot_keys()
+    zones = {TIMEZONE} | {zone or TIMEZONE for zone in default_zones}
+    slots = {(schedule_time, zone) for schedule_time in SCHEDULE_TIMES for zone in zones}
+    slots |= {(schedule_time, zone or TIMEZONE) for schedule_time, zone in explicit}
+    return slots
 
 
 def setup_schedule():
     """
     Set up the message scheduling for specific times.
+    
+    Each (time, timezone) slot gets its own timer whose next UTC fire time
+    is computed with zoneinfo, so DST changes are followed automatically.
+    Only timers that changed are added or removed, in one atomic step;
+    unchanged timers keep their planned fire time.
     """
     logger.info("Setting up message schedule...")
     
-    # Clear existing schedule to avoid duplicates
-    schedule.clear()
+    wanted = {}
+    for schedule_time, tz_name in get_schedule_slots():
+        try:
+            tz = resolve_timezone(tz_name)
+        except ValueError as e:
+            logger.error(f"Skipping slot {schedule_time}: {e}")
+            continue
+        wanted[slot_job_name(schedule_time, tz_name)] = (
+            lambda t=schedule_time, z=tz_name: run_scheduled_broadcast(t, z),
+            daily_at(schedule_time, tz))
     
-    for schedule_time in SCHEDULE_TIMES:
-        # Convert GMT+3 time to UTC for scheduling
-        utc_time = convert_to_utc_time(schedule_time)
-        schedule.every().day.at(utc_time).do(send_to_all_groups)
-        logger.info(f"Scheduled daily message broadcast at {schedule_time} (UTC: {utc_time})")
+    # Broadcasts run in their own threads so they never hold up other timers
+    added, removed = scheduler.sync(SLOT_JOB_PREFIX, wanted, background=True)
+    for name in removed:
+        logger.info(f"Removed scheduled broadcast {name[len(SLOT_JOB_PREFIX):]}")
+    for name in added:
+        schedule_time, tz_name = name[len(SLOT_JOB_PREFIX):].split(" ", 1)
+        utc_time = convert_to_utc_time(schedule_time, tz_name)
+        logger.info(f"Scheduled daily message broadcast at {schedule_time} {tz_name} (UTC: {utc_time})")
     
-    logger.info(f"Total scheduled times: {len(SCHEDULE_TIMES)}")
+    logger.info(f"Total scheduled times: {len(wanted)}")
 
 
-def convert_to_utc_time(gmt_plus3_time):
+def convert_to_utc_time(local_time, tz_name=None):
     """
-    Convert GMT+3 time to UTC time for scheduling.
+    Convert a local time to the UTC time of its next occurrence.
+    
+    Uses zoneinfo, so the result follows DST changes of tz_name.
     
     Args:
-        gmt_plus3_time (str): Time in HH:MM format (GMT+3)
+        local_time (str): Time in HH:MM format
+        tz_name (str): Timezone of local_time, None for TIMEZONE
         
     Returns:
         str: Time in HH:MM format (UTC)
     """
     try:
-        # Parse the time
-        hour, minute = map(int, gmt_plus3_time.split(':'))
-        
-        # Convert from GMT+3 to UTC (subtract 3 hours)
-        utc_hour = hour - 3
-        
-        # Handle day wraparound
-        if utc_hour < 0:
-            utc_hour += 24
-        
-        return f"{utc_hour:02d}:{minute:02d}"
-    except:
-        logger.error(f"Failed to convert time {gmt_plus3_time}")
-        return gmt_plus3_time
+        wall_time = datetime.strptime(local_time, '%H:%M').time()
+        tz = resolve_timezone(tz_name or TIMEZONE)
+        fire = next_daily_fire(wall_time, tz, scheduler.clock())
+        return fire.strftime('%H:%M')
+    except Exception:
+        logger.error(f"Failed to convert time {local_time}")
+        return local_time
 
 
 def get_next_scheduled_time():
@@ -280,19 +914,53 @@ def get_next_scheduled_time():
         str: Formatted next scheduled time
     """
     try:
-        next_run = schedule.next_run()
+        next_run = scheduler.next_run(prefix=SLOT_JOB_PREFIX)
         if next_run:
-            return next_run.strftime('%Y-%m-%d %H:%M:%S')
+            return next_run.astimezone().strftime('%Y-%m-%d %H:%M:%S')
         return "No upcoming schedule"
     except:
         return "Schedule not available"
 
 
-def run_pending_jobs():
+def resume_interrupted_broadcasts():
+    """
+    Finish broadcasts that were cut short by a crash or restart.
+    
+    Only slots that started within RESUME_WINDOW are resumed; older ones
+    are marked complete so they are not retried on every start. Slots this
+    process is broadcasting itself (a manual send, or the scheduled slot
+    that just took the lease) are left alone. Runs when this process
+    becomes the broadcast leader.
+    """
+    if not leader_lease.is_leader():
+        return
+    
+    journal = get_delivery_journal()
+    for state in journal.incomplete_slots():
+        try:
+            age = (datetime.now() - datetime.fromisoformat(state.started_at)).total_seconds()
+        except ValueError:
+            age = RESUME_WINDOW
+        
+        if age < RESUME_WINDOW:
+            # The slot may be one this process is sending right now
+            progress = track_broadcast(state.slot, exclusive=True)
+            if progress is None:
+                logger.info(f"Not resuming slot {state.slot}: it is being broadcast already")
+                continue
+            logger.warning(f"Resuming interrupted broadcast for slot {state.slot} "
+                           f"({len(state.delivered)} groups already delivered)")
+            send_to_all_groups(state.slot, progress)
+        else:
+            logger.info(f"Not resuming stale interrupted slot {state.slot}")
+            journal.complete_slot(state.slot)
+
+
+def log_heartbeat():
     """
-    Check and run any pending scheduled jobs.
+    Log a heartbeat line to show the bot is alive.
     """
-    schedule.run_pending()
+    logger.info(f"Bot heartbeat - Next scheduled: {get_next_scheduled_time()}")
 
 
 def save_schedule_config():
@@ -302,12 +970,21 @@ def save_schedule_config():
     config = {
         "schedule_times": SCHEDULE_TIMES,
         "timezone": TIMEZONE,
+        "rate_limits": RATE_LIMITS,
+        "promo_media": PROMO_MEDIA,
+        "broadcast_deadline": BROADCAST_DEADLINE,
         "last_updated": datetime.now().isoformat()
     }
     
+    global config_signature
+    
     try:
-        with open(SCHEDULE_CONFIG_FILE, 'w') as f:
+        # Write a temporary file and rename it, so a running bot never reads half a file
+        tmp_file = SCHEDULE_CONFIG_FILE + '.tmp'
+        with open(tmp_file, 'w') as f:
             json.dump(config, f, indent=2)
+        os.replace(tmp_file, SCHEDULE_CONFIG_FILE)
+        config_signature = get_config_signature()
         logger.info(f"Schedule configuration saved to {SCHEDULE_CONFIG_FILE}")
     except Exception as e:
         logger.error(f"Failed to save schedule config: {str(e)}")
@@ -320,16 +997,29 @@ def load_schedule_config():
     Returns:
         bool: True if config was loaded successfully, False otherwise
     """
-    global SCHEDULE_TIMES, TIMEZONE
+    global SCHEDULE_TIMES, TIMEZONE, RATE_LIMITS, PROMO_MEDIA, BROADCAST_DEADLINE
+    global config_signature
     
     try:
-        if os.path.exists(SCHEDULE_CONFIG_FILE):
+        signature = get_config_signature()
+        if signature is not None:
             with open(SCHEDULE_CONFIG_FILE, 'r') as f:
                 config = json.load(f)
             
             SCHEDULE_TIMES = config.get("schedule_times", SCHEDULE_TIMES)
             TIMEZONE = config.get("timezone", TIMEZONE)
+            PROMO_MEDIA = config.get("promo_media", PROMO_MEDIA)
+            BROADCAST_DEADLINE = config.get("broadcast_deadline", BROADCAST_DEADLINE)
+            payload_cache.clear()
+            
+            if "rate_limits" in config:
+                rate_limits = {**RATE_LIMITS, **config["rate_limits"]}
+                # Keep the limiter (and its throttling state) unless the limits changed
+                if rate_limits != RATE_LIMITS:
+                    RATE_LIMITS = rate_limits
+                    apply_rate_limits(RATE_LIMITS)
             
+            config_signature = signature
             logger.info(f"Schedule configuration loaded from {SCHEDULE_CONFIG_FILE}")
             return True
     except Exception as e:
@@ -338,6 +1028,44 @@ def load_schedule_config():
     return False
 
 
+def get_config_signature():
+    """
+    Returns:
+        tuple: (mtime, size, inode) of SCHEDULE_CONFIG_FILE, or None if it is missing
+    """
+    try:
+        stat = os.stat(SCHEDULE_CONFIG_FILE)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+def reload_schedule_config_if_changed():
+    """
+    Apply edits to SCHEDULE_CONFIG_FILE (e.g. from --add-time in another process).
+    
+    Costs a single stat() when nothing changed. On a change only the slots
+    that were added or removed are rescheduled.
+    
+    Returns:
+        bool: True if a changed configuration was applied
+    """
+    global config_signature
+    
+    signature = get_config_signature()
+    if signature is None or signature == config_signature:
+        return False
+    
+    logger.info(f"{SCHEDULE_CONFIG_FILE} changed, reloading schedule")
+    with schedule_lock:
+        loaded = load_schedule_config()
+        # Remember the signature even on failure, so a broken file is reported once
+        config_signature = signature
+        if loaded:
+            setup_schedule()
+    return loaded
+
+
 def add_schedule_time(time_str):
     """
     Add a new scheduled time.
@@ -356,8 +1084,8 @@ def add_schedule_time(time_str):
             SCHEDULE_TIMES.append(time_str)
             SCHEDULE_TIMES.sort()
             
-            # Add to schedule
-            schedule.every().day.at(time_str).do(send_to_all_groups)
+            # Add timers for the new time in every timezone that needs it
+            setup_schedule()
             
             logger.info(f"Added new scheduled time: {time_str}")
             save_schedule_config()
@@ -384,8 +1112,7 @@ def remove_schedule_time(time_str):
     if time_str in SCHEDULE_TIMES:
         SCHEDULE_TIMES.remove(time_str)
         
-        # Clear and recreate schedule
-        schedule.clear()
+        # Drop only this slot's timers
         setup_schedule()
         
         logger.info(f"Removed scheduled time: {time_str}")
@@ -396,43 +1123,361 @@ def remove_schedule_time(time_str):
         return False
 
 
-def list_scheduled_times():
+def list_scheduled_times(schedule_times=None, next_time=None):
     """
     Get a formatted list of all scheduled times.
     
+    Args:
+        schedule_times (list): Times to list, SCHEDULE_TIMES if None
+        next_time (str): Next broadcast, computed locally if None
+        
     Returns:
         str: Formatted schedule information
     """
-    if not SCHEDULE_TIMES:
+    if schedule_times is None:
+        schedule_times = SCHEDULE_TIMES
+    if not schedule_times:
         return "No scheduled times configured"
     
-    schedule_info = f"Scheduled message times ({len(SCHEDULE_TIMES)} total):\n"
-    for i, time_str in enumerate(SCHEDULE_TIMES, 1):
+    schedule_info = f"Scheduled message times ({len(schedule_times)} total):\n"
+    for i, time_str in enumerate(schedule_times, 1):
         schedule_info += f"  {i}. {time_str}\n"
     
-    next_time = get_next_scheduled_time()
+    if next_time is None:
+        next_time = get_next_scheduled_time()
     schedule_info += f"Next broadcast: {next_time}"
     
     return schedule_info
 
 
-def validate_bot_token():
+def schedule_status():
+    """
+    Returns:
+        dict: Live schedule of this process for the admin API
+    """
+    slots = [{"slot": job.name[len(SLOT_JOB_PREFIX):], "next_run": job.due.isoformat()}
+             for job in scheduler.jobs() if job.name.startswith(SLOT_JOB_PREFIX)]
+    return {
+        "schedule_times": SCHEDULE_TIMES,
+        "timezone": TIMEZONE,
+        "slots": slots,
+        "next_scheduled_run": get_next_scheduled_time()
+    }
+
+
+def start_manual_broadcast():
+    """
+    Start a broadcast to all enabled groups in a background thread.
+    
+    Returns:
+        BroadcastProgress: Progress of the new broadcast, or None if a
+            manual broadcast is already running
+    """
+    with broadcast_history_lock:
+        for progress in broadcast_history.values():
+            if progress.state == "running" and progress.broadcast_id.startswith("manual-"):
+                return None
+    
+    slot = make_slot_id()
+    progress = track_broadcast(slot)
+    threading.Thread(target=send_to_all_groups, args=(slot, progress),
+                     name='manual-broadcast', daemon=True).start()
+    logger.info(f"Manual broadcast {slot} started from the admin API")
+    return progress
+
+
+def handle_admin_request(method, path, body):
+    """
+    Serve one authenticated admin API request.
+    
+    Endpoints:
+        GET    /admin/schedule           live schedule
+        POST   /admin/schedule           add a time, body {"time": "HH:MM"}
+        DELETE /admin/schedule/HH:MM     remove a time
+        POST   /admin/broadcasts         start a broadcast to all groups
+        GET    /admin/broadcasts         progress of recent broadcasts
+        GET    /admin/broadcasts/<id>    progress of one broadcast
+    
+    Args:
+        method (str): HTTP method
+        path (str): Request path
+        body (dict): Decoded JSON body
+        
+    Returns:
+        tuple: (HTTP status code, JSON-serialisable payload)
+    """
+    path = path.split('?', 1)[0].rstrip('/')
+    
+    if path == '/admin/schedule':
+        if method == 'GET':
+            return 200, schedule_status()
+        if method == 'POST':
+            time_str = str(body.get("time", ""))
+            with schedule_lock:
+                if time_str in SCHEDULE_TIMES:
+                    return 409, {"error": f"Time {time_str} already exists in schedule"}
+                if not add_schedule_time(time_str):
+                    return 400, {"error": f"Invalid time format: {time_str}. Use HH:MM format"}
+            return 201, schedule_status()
+    
+    elif path.startswith('/admin/schedule/') and method == 'DELETE':
+        time_str = unquote(path[len('/admin/schedule/'):])
+        with schedule_lock:
+            if not remove_schedule_time(time_str):
+                return 404, {"error": f"Time {time_str} not found in schedule"}
+        return 200, schedule_status()
+    
+    elif path == '/admin/broadcasts':
+        if method == 'GET':
+            with broadcast_history_lock:
+                history = list(broadcast_history.values())
+            return 200, {"broadcasts": [progress.snapshot() for progress in reversed(history)]}
+        if method == 'POST':
+            # Also refused while a handoff successor waits for this process
+            if not health_monitor.is_ready() or shutting_down.is_set():
+                return 503, {"error": "The bot is starting up or shutting down"}
+            progress = start_manual_broadcast()
+            if progress is None:
+                return 409, {"error": "A manual broadcast is already running"}
+            return 202, progress.snapshot()
+    
+    elif path.startswith('/admin/broadcasts/') and method == 'GET':
+        broadcast_id = unquote(path[len('/admin/broadcasts/'):])
+        with broadcast_history_lock:
+            progress = broadcast_history.get(broadcast_id)
+        if progress is None:
+            return 404, {"error": f"Unknown broadcast {broadcast_id}"}
+        return 200, progress.snapshot()
+    
+    return 404, {"error": "Not Found"}
+
+
+def command_schedule(args, message):
+    """
+    /schedule                   list the schedule
+    /schedule add HH:MM         add a time
+    /schedule remove HH:MM      remove a time
+    """
+    if not args:
+        status_code, payload = handle_admin_request('GET', '/admin/schedule', {})
+    elif len(args) == 2 and args[0] == 'add':
+        status_code, payload = handle_admin_request('POST', '/admin/schedule', {"time": args[1]})
+    elif len(args) == 2 and args[0] == 'remove':
+        status_code, payload = handle_admin_request('DELETE', f"/admin/schedule/{quote(args[1], safe='')}", {})
+    else:
+        return "Usage: /schedule [add HH:MM | remove HH:MM]"
+
+    if status_code >= 400:
+        return payload["error"]
+    return list_scheduled_times(payload["schedule_times"], payload["next_scheduled_run"])
+
+
+def command_broadcast(args, message):
+    """/broadcast starts a broadcast to all enabled groups."""
+    status_code, payload = handle_admin_request('POST', '/admin/broadcasts', {})
+    if status_code >= 400:
+        return payload["error"]
+    return f"Broadcast {payload['id']} started, /stats shows its progress"
+
+
+def command_stats(args, message):
+    """/stats reports groups, the next run, recent broadcasts and each bot's sends."""
+    registry = get_group_registry()
+    lines = [
+        f"Groups: {registry.count()} enabled, {registry.count_dead()} dead",
+        f"Next broadcast: {get_next_scheduled_time()}"
+    ]
+    with broadcast_history_lock:
+        recent = list(broadcast_history.values())[-3:]
+    for progress in reversed(recent):
+        snapshot = progress.snapshot()
+        lines.append(f"{snapshot['id']}: {snapshot['state']}, {snapshot['sent']} sent, "
+                     f"{snapshot['failed']} failed, {snapshot['deferred']} deferred "
+                     f"of {snapshot['total'] if snapshot['total'] is not None else '?'} "
+                     f"in {snapshot['elapsed_seconds']}s")
+    for bot in token_pool.snapshot():
+        limiter = bot["rate_limiter"]
+        lines.append(f"Bot {bot['bot_id']}: {bot['sent']} sent, {bot['failed']} failed, "
+                     f"{limiter['global_rate']}/s, {limiter['throttle_events']} throttles, "
+                     f"{limiter['total_wait_seconds']}s waited")
+    return "\n".join(lines)
+
+
+def send_command_reply(chat_id, text):
+    """Reply to a command through the rate limiter shared with broadcasts."""
+    rate_limiter.acquire(chat_id)
+    result = SendResult.from_response(api_client.send_message(chat_id, text))
+    if not result:
+        logger.error(f"Failed to reply to chat {chat_id}: {result.description}")
+    return result
+
+
+def start_update_receiver():
+    """
+    Start receiving Telegram commands if TELEGRAM_ADMIN_IDS is set.
+
+    Polling has its own single-connection client, so a long poll never holds
+    one of the connections broadcasts use, and handlers run on their own
+    small pool, so neither can delay the scheduler thread.
+
+    Returns:
+        UpdateReceiver: The running receiver, or None if commands are disabled
+    """
+    global update_receiver
+    if not TELEGRAM_ADMIN_IDS:
+        logger.info("TELEGRAM_ADMIN_IDS is not set, Telegram commands are disabled")
+        return None
+
+    from update_receiver import CommandDispatcher, UpdateReceiver
+
+    dispatcher = CommandDispatcher(send_command_reply, TELEGRAM_ADMIN_IDS, max_workers=COMMAND_WORKERS)
+    dispatcher.register("schedule", command_schedule)
+    dispatcher.register("broadcast", command_broadcast)
+    dispatcher.register("stats", command_stats)
+
+    poll_client = BotApiClient(api_client.token, api_base=api_client.api_base, pool_size=1)
+    update_receiver = UpdateReceiver(poll_client, dispatcher.dispatch,
+                                     offset_file=UPDATES_OFFSET_FILE,
+                                     poll_timeout=UPDATES_POLL_TIMEOUT)
+    update_receiver.start()
+    return update_receiver
+
+
+def get_admin_token(create=False):
+    """
+    Get the admin API token from ADMIN_TOKEN or ADMIN_TOKEN_FILE.
+    
+    Args:
+        create (bool): Generate and save a token if there is none
+        
+    Returns:
+        str: The token, or None if there is none
+    """
+    token = os.getenv('ADMIN_TOKEN')
+    if token:
+        return token
+    try:
+        with open(ADMIN_TOKEN_FILE, 'r') as f:
+            token = f.read().strip()
+        if token:
+            return token
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.error(f"Could not read admin token: {str(e)}")
+        return None
+    
+    if not create:
+        return None
+    import secrets
+    token = secrets.token_urlsafe(32)
+    try:
+        fd = os.open(ADMIN_TOKEN_FILE, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            f.write(token)
+        logger.info(f"Generated admin API token in {ADMIN_TOKEN_FILE}")
+    except Exception as e:
+        logger.error(f"Could not save admin token: {str(e)}")
+    return token
+
+
+def admin_api_request(method, path, body=None, timeout=5):
+    """
+    Call the admin API of the running bot.
+    
+    Args:
+        method (str): HTTP method
+        path (str): Request path, e.g. "/admin/schedule"
+        body (dict): JSON body
+        timeout (float): Seconds to wait for the bot
+        
+    Returns:
+        tuple: (HTTP status code, decoded JSON payload), or None if no bot
+            is reachable (the caller then falls back to local files)
+    """
+    token = get_admin_token()
+    if not token:
+        return None
+    
+    import urllib.error
+    import urllib.request
+    
+    data = json.dumps(body).encode('utf-8') if body is not None else None
+    request = urllib.request.Request(ADMIN_API_URL + path, data=data, method=method, headers={
+        "Authorization": f"Bearer {token}",
+        "Content-Type": "application/json"
+    })
+    # Talk to the local bot directly, never through an HTTP proxy
+    opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
+    try:
+        with opener.open(request, timeout=timeout) as response:
+            status_code, raw = response.status, response.read()
+    except urllib.error.HTTPError as e:
+        status_code, raw = e.code, e.read()
+    except (urllib.error.URLError, OSError):
+        return None
+    
+    try:
+        payload = json.loads(raw) if raw else {}
+    except ValueError:
+        payload = {"error": raw.decode('utf-8', 'replace')}
+    return status_code, payload
+
+
+def run_test_send_via_api():
+    """
+    Start a broadcast in the running bot and wait for it to finish.
+    
+    Returns:
+        bool: False if no bot is reachable
+    """
+    reply = admin_api_request('POST', '/admin/broadcasts')
+    if reply is None:
+        return False
+    status_code, payload = reply
+    if status_code != 202:
+        print(f"Failed to start test broadcast: {payload.get('error', status_code)}")
+        return True
+    
+    print("Sending test message...")
+    path = f"/admin/broadcasts/{quote(payload['id'], safe='')}"
+    while payload.get("state") == "running":
+        time.sleep(0.5)
+        reply = admin_api_request('GET', path)
+        if reply is None or reply[0] != 200:
+            print("Lost contact with the bot, check its log for the result")
+            return True
+        payload = reply[1]
+    
+    if payload.get("state") == "skipped":
+        print("Test skipped: this broadcast was already sent")
+    elif payload.get("state") == "deferred":
+        print(f"Test sent {payload['sent']}/{payload['total']} messages before its deadline, "
+              f"{payload['deferred']} left to a follow-up pass")
+    else:
+        print(f"Test completed: {payload['sent']}/{payload['total']} messages sent successfully")
+    return True
+
+
+def validate_bot_token(verbose=True):
     """
     Validate the bot token by making a test API call.
     
+    Args:
+        verbose (bool): Log successful validations (off for background checks)
+        
     Returns:
         bool: True if token is valid, False otherwise
     """
-    url = f"https://api.telegram.org/bot{BOT_TOKEN}/getMe"
+    import requests  # loaded lazily by bot_api
     
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        result = response.json()
+        result = api_client.get_me()
         
         if result.get('ok'):
             bot_info = result.get('result', {})
-            logger.info(f"Bot token validated successfully. Bot: @{bot_info.get('username', 'unknown')}")
+            if verbose:
+                logger.info(f"Bot token validated successfully. Bot: @{bot_info.get('username', 'unknown')}")
             return True
         else:
             logger.error(f"Invalid bot token: {result.get('description', 'Unknown error')}")
@@ -446,6 +1491,36 @@ def validate_bot_token():
         return False
 
 
+def validate_token_pool():
+    """
+    Validate the token of every other bot of the pool and drop failing ones.
+    
+    A revoked or mistyped token would otherwise fail every send to its share
+    of the groups; those groups move to the remaining bots instead. Dead-chat
+    entries found by a bot that no longer sends to the chat are then dropped,
+    so the chat's new bot gets a fresh try.
+    """
+    failed = []
+    for shard in token_pool.shards[1:]:
+        try:
+            result = shard.api_client.get_me()
+        except Exception as e:
+            result = {"description": str(e)}
+        if result.get('ok'):
+            logger.info(f"Bot {shard.bot_id} validated: "
+                        f"@{result.get('result', {}).get('username', 'unknown')}")
+        else:
+            logger.error(f"Dropping bot {shard.bot_id} from the token pool: "
+                         f"{result.get('description', 'Unknown error')}")
+            failed.append(shard.bot_id)
+    token_pool.drop(failed)
+    
+    registry = get_group_registry()
+    pruned = registry.prune_dead_chats(lambda chat_id: token_pool.shard_for(chat_id).bot_id)
+    if pruned:
+        logger.info(f"Re-probing {pruned} dead chats now sent to by another bot")
+
+
 def handle_command_line_args():
     """
     Handle command line arguments for schedule management.
@@ -457,9 +1532,55 @@ def handle_command_line_args():
     parser.add_argument('--remove-time', type=str, help='Remove a scheduled time (HH:MM)')
     parser.add_argument('--list-schedule', action='store_true', help='List current schedule')
     parser.add_argument('--test-send', action='store_true', help='Send test message immediately')
+    parser.add_argument('--import-groups', type=str, metavar='FILE',
+                        help='Bulk import groups from a CSV or JSON-lines file')
+    parser.add_argument('--export-groups', type=str, metavar='FILE',
+                        help='Export all groups to a CSV or JSON-lines file')
+    parser.add_argument('--supervise', action='store_true',
+                        help='Run the bot as a child process and restart it whenever it exits; '
+                             'SIGHUP restarts it without downtime')
     
     args = parser.parse_args()
     
+    if args.supervise:
+        from supervisor import Supervisor
+        
+        setup_logging(SUPERVISOR_LOG_FILE)
+        sys.exit(Supervisor([sys.executable, os.path.abspath(__file__)],
+                            listen_address=('0.0.0.0', HEALTH_CHECK_PORT)).run())
+    
+    # Quick commands only report problems, on stderr, and never open the log file
+    setup_console_logging()
+    
+    # Schedule commands act on the running bot through its admin API; without
+    # a running bot they edit the configuration file directly
+    if args.add_time:
+        reply = admin_api_request('POST', '/admin/schedule', {"time": args.add_time})
+        if reply is not None:
+            status_code, payload = reply
+            if status_code == 201:
+                print(f"Successfully added {args.add_time} to schedule")
+            else:
+                print(f"Failed to add {args.add_time} to schedule: {payload.get('error', status_code)}")
+            sys.exit(0)
+    elif args.remove_time:
+        reply = admin_api_request('DELETE', f"/admin/schedule/{quote(args.remove_time, safe='')}")
+        if reply is not None:
+            status_code, payload = reply
+            if status_code == 200:
+                print(f"Successfully removed {args.remove_time} from schedule")
+            else:
+                print(f"Failed to remove {args.remove_time} from schedule: {payload.get('error', status_code)}")
+            sys.exit(0)
+    elif args.list_schedule:
+        reply = admin_api_request('GET', '/admin/schedule')
+        if reply is not None and reply[0] == 200:
+            print(list_scheduled_times(reply[1]["schedule_times"], reply[1]["next_scheduled_run"]))
+            sys.exit(0)
+    elif args.test_send:
+        if run_test_send_via_api():
+            sys.exit(0)
+    
     # Load existing configuration
     load_schedule_config()
     
@@ -477,11 +1598,29 @@ def handle_command_line_args():
             print(f"Failed to remove {args.remove_time} from schedule")
         sys.exit(0)
     
+    elif args.import_groups:
+        try:
+            count = get_group_registry().import_groups(args.import_groups)
+            print(f"Successfully imported {count} groups from {args.import_groups}")
+        except Exception as e:
+            print(f"Failed to import groups: {e}")
+        sys.exit(0)
+    
+    elif args.export_groups:
+        try:
+            count = get_group_registry().export_groups(args.export_groups)
+            print(f"Successfully exported {count} groups to {args.export_groups}")
+        except Exception as e:
+            print(f"Failed to export groups: {e}")
+        sys.exit(0)
+    
     elif args.list_schedule:
         print(list_scheduled_times())
         sys.exit(0)
     
     elif args.test_send:
+        # A local test broadcast really sends, so it is logged like the bot's own
+        setup_logging(LOG_FILE)
         if validate_bot_token():
             print("Sending test message...")
             successful, total = send_to_all_groups()
@@ -493,101 +1632,203 @@ def handle_command_line_args():
 
 def check_if_already_running():
     """
-    Check if another instance of the bot is already running.
+    Take the single-instance lock on PID_FILE.
+    
+    The lock is held until the process exits, so there is no gap between
+    checking and claiming, and the kernel frees it if the bot crashes.
     
     Returns:
         bool: True if another instance is running, False otherwise
     """
-    pid_file = 'telegram_bot.pid'
-    
-    if os.path.exists(pid_file):
-        try:
-            with open(pid_file, 'r') as f:
-                old_pid = int(f.read().strip())
-            
-            # Check if the process is still running
-            try:
-                os.kill(old_pid, 0)  # This doesn't kill, just checks if process exists
-                return True
-            except OSError:
-                # Process doesn't exist, remove stale PID file
-                os.remove(pid_file)
-                return False
-        except (ValueError, FileNotFoundError):
-            # Invalid PID file, remove it
-            try:
-                os.remove(pid_file)
-            except:
-                pass
-            return False
+    return not instance_lock.acquire()
+
+
+def release_instance_lock():
+    """
+    Let the next instance start.
+    """
+    instance_lock.release()
+
+
+class ShutdownRequested(BaseException):
+    """Raised in the main thread by SIGTERM/SIGUSR1, like KeyboardInterrupt for SIGINT."""
     
-    return False
+    def __init__(self, signum):
+        super().__init__(signum)
+        self.signum = signum
+
 
+def handle_shutdown_signal(signum, frame):
+    raise ShutdownRequested(signum)
 
-def create_pid_file():
+
+def running_broadcasts():
     """
-    Create a PID file to track the running process.
+    Returns:
+        list: IDs of broadcasts whose current pass is still sending
     """
-    pid_file = 'telegram_bot.pid'
-    try:
-        with open(pid_file, 'w') as f:
-            f.write(str(os.getpid()))
-    except Exception as e:
-        logger.warning(f"Could not create PID file: {e}")
+    with broadcast_history_lock:
+        return [progress.broadcast_id for progress in broadcast_history.values()
+                if progress.state == "running"]
 
 
-def remove_pid_file():
+def drain(scheduler_thread, timeout=DRAIN_TIMEOUT, stay_ready=False):
     """
-    Remove the PID file when the bot stops.
+    Stop taking new work and give in-flight broadcasts timeout seconds to finish.
+    
+    Passes still sending then have their deadline cut to the drain timeout,
+    so they defer the rest of their chats instead of being killed mid-send.
+    Every delivery is already in the delivery journal, and the slot stays
+    open there, so the next process holding the broadcast lease resumes it.
+    
+    Args:
+        scheduler_thread (threading.Thread): Thread running the scheduler
+        timeout (float): Seconds to wait for in-flight broadcasts
+        stay_ready (bool): Keep /ready at 200, for a handoff where the next
+            process already serves the same socket
     """
-    pid_file = 'telegram_bot.pid'
-    try:
-        if os.path.exists(pid_file):
-            os.remove(pid_file)
-    except Exception as e:
-        logger.debug(f"Could not remove PID file: {e}")
+    logger.info(f"Draining: waiting up to {timeout}s for in-flight broadcasts")
+    shutting_down.set()
+    if not stay_ready:
+        health_monitor.set_ready(False)
+    scheduler.stop()
+    if update_receiver is not None:
+        update_receiver.stop()
+    for engine in list(active_engines):
+        if engine.deadline is not None:
+            engine.deadline.shorten(timeout)
+    
+    deadline = Deadline(timeout)
+    if scheduler_thread.is_alive():
+        scheduler_thread.join(deadline.remaining())
+    while running_broadcasts() and not deadline.expired():
+        time.sleep(0.2)
+    unfinished = running_broadcasts()
+    if unfinished:
+        logger.warning(f"Stopping with broadcasts still running: {', '.join(unfinished)}; "
+                       f"the next start resumes them from the delivery journal")
+    
+    if group_registry is not None:
+        group_registry.flush()
+    if delivery_journal is not None:
+        delivery_journal.flush()
+    # Hand the broadcast lease to the next process right away
+    leader_lease.stop()
+    logger.info("Drain complete")
+
+
+def run_scheduler():
+    """
+    Run the scheduler until it is stopped, restarting it after errors.
+    """
+    # Counter to track consecutive errors
+    consecutive_errors = 0
+    max_consecutive_errors = 5
+    
+    while True:
+        try:
+            # Sleep until the next due job and run it; returns only when stopped
+            scheduler.run_forever()
+            break
+            
+        except Exception as e:
+            consecutive_errors += 1
+            logger.error(f"Error in scheduling loop (attempt {consecutive_errors}/{max_consecutive_errors}): {str(e)}")
+            
+            # If too many consecutive errors, exit
+            if consecutive_errors >= max_consecutive_errors:
+                logger.error("Too many consecutive errors. Exiting.")
+                break
+            
+            # Wait before retrying
+            time.sleep(30)
 
 
 def main():
     """
     Main function to run the bot with advanced scheduled messaging.
     """
+    global admin_token, supervisor_status
+    
     # Handle command line arguments first
     if len(sys.argv) > 1:
         handle_command_line_args()
     
-    # Check if another instance is already running
-    if check_if_already_running():
-        logger.error("Another instance of the bot is already running. Exiting.")
-        sys.exit(1)
+    # Configure logging (queued JSON lines in a rotating file, plus stdout)
+    setup_logging(LOG_FILE)
+    
+    from supervisor import child_status
+    
+    supervisor_status = child_status()
+    handoff = bool(supervisor_status and supervisor_status.get("handoff"))
+    if supervisor_status:
+        logger.info(f"Running under supervisor {supervisor_status['supervisor_pid']} "
+                    f"(restart {supervisor_status['restarts']})")
     
-    # Create PID file to track this instance
-    create_pid_file()
+    # Check if another instance is already running; in a handoff the previous
+    # instance is still draining, so it is waited for further down instead
+    if not handoff and check_if_already_running():
+        logger.error(f"Another instance of the bot is already running (PID "
+                     f"{instance_lock.holder_pid()}). Exiting.")
+        sys.exit(1)
     
     logger.info("=" * 50)
     logger.info("Telegram Promotional Bot Starting")
     logger.info("=" * 50)
     
-    # Start health check server for deployment monitoring
-    health_server = start_health_check_server()
-    if not health_server:
+    # Enable the admin API, then start the health check server for deployment monitoring.
+    # In a handoff the previous instance keeps answering probes on the shared
+    # socket while it drains, so this one only starts accepting once it is ready
+    admin_token = get_admin_token(create=True)
+    if not handoff and not start_health_check_server():
         logger.warning("Health check server failed to start, continuing without it...")
     
     # Load schedule configuration if available
     load_schedule_config()
     
+    # Render and validate the message once before any broadcast
+    try:
+        payload_cache.get(MESSAGE, "HTML")
+    except PayloadError as e:
+        logger.error(f"MESSAGE is not valid Telegram HTML and will be rejected: {e}")
+    if PROMO_MEDIA and not os.path.isfile(PROMO_MEDIA["path"]):
+        logger.error(f"Promo media file {PROMO_MEDIA['path']} not found")
+    
     # Validate bot token before starting
-    if not validate_bot_token():
+    token_valid = validate_bot_token()
+    health_monitor.record(token_valid)
+    if not token_valid:
         logger.error("Bot token validation failed. Please check your BOT_TOKEN environment variable.")
         sys.exit(1)
+    validate_token_pool()
+    
+    if handoff:
+        logger.info(f"Waiting for the previous instance (PID {supervisor_status.get('previous_pid')}) "
+                    f"to drain")
+        if not instance_lock.acquire(timeout=HANDOFF_TIMEOUT):
+            logger.error("The previous instance did not exit in time. Exiting.")
+            sys.exit(1)
+    
+    # Keep the cached bot status fresh for health probes
+    health_monitor.start()
     
     # Set up the message schedule
     setup_schedule()
+    health_monitor.set_ready()
+    if handoff and not start_health_check_server():
+        logger.warning("Health check server failed to start, continuing without it...")
     
+    # Compete for the broadcast lease; the leader finishes any broadcast a
+    # previous run left half done
+    leader_lease.start()
+
+    # Accept /schedule, /broadcast and /stats from TELEGRAM_ADMIN_IDS
+    start_update_receiver()
+
     # Save current configuration
     save_schedule_config()
     
-    logger.info(f"Bot will send messages to {len(GROUP_IDS)} groups at scheduled times:")
+    logger.info(f"Bot will send messages to {get_group_registry().count()} groups at scheduled times:")
     for schedule_time in SCHEDULE_TIMES:
         logger.info(f"  - Daily at {schedule_time}")
     
@@ -596,8 +1837,15 @@ def main():
     logger.info(f"Next scheduled broadcast: {next_time}")
     logger.info(f"Timezone: {TIMEZONE}")
     
+    # Jobs run on the scheduler thread; the main thread only waits for a stop signal
+    scheduler_thread = threading.Thread(target=run_scheduler, name='timer-scheduler', daemon=True)
+    
     # Main scheduling loop
     try:
+        # SIGTERM drains before exiting; SIGUSR1 does the same for a handoff
+        signal.signal(signal.SIGTERM, handle_shutdown_signal)
+        signal.signal(signal.SIGUSR1, handle_shutdown_signal)
+        
         logger.info("Bot is now running. Use Ctrl+C to stop.")
         logger.info("Schedule management commands:")
         logger.info("  python telegram_bot.py --list-schedule")
@@ -605,51 +1853,34 @@ def main():
         logger.info("  python telegram_bot.py --remove-time HH:MM")
         logger.info("  python telegram_bot.py --test-send")
         
-        # Counter to track consecutive errors
-        consecutive_errors = 0
-        max_consecutive_errors = 5
+        # Log heartbeat every 30 minutes to show bot is alive
+        scheduler.add_interval(HEARTBEAT_INTERVAL, log_heartbeat, name="heartbeat")
         
-        while True:
-            try:
-                # Check for pending scheduled jobs
-                run_pending_jobs()
-                
-                # Reset error counter on successful run
-                consecutive_errors = 0
-                
-                # Log heartbeat every 30 minutes to show bot is alive
-                current_minute = datetime.now().minute
-                if current_minute % 30 == 0:
-                    next_scheduled = get_next_scheduled_time()
-                    logger.info(f"Bot heartbeat - Next scheduled: {next_scheduled}")
-                
-                # Sleep for 1 minute before checking again
-                time.sleep(60)
-                
-            except Exception as e:
-                consecutive_errors += 1
-                logger.error(f"Error in scheduling loop (attempt {consecutive_errors}/{max_consecutive_errors}): {str(e)}")
-                
-                # If too many consecutive errors, exit
-                if consecutive_errors >= max_consecutive_errors:
-                    logger.error("Too many consecutive errors. Exiting.")
-                    break
-                
-                # Wait before retrying
-                time.sleep(30)
+        # Pick up schedule edits made by the CLI without a restart
+        scheduler.add_interval(CONFIG_CHECK_INTERVAL, reload_schedule_config_if_changed,
+                               name="config-watch")
+        
+        scheduler_thread.start()
+        scheduler_thread.join()
             
     except KeyboardInterrupt:
         logger.info("Bot stopped by user (Ctrl+C)")
+        drain(scheduler_thread)
         logger.info("Final schedule configuration saved")
         save_schedule_config()
-        remove_pid_file()
+        release_instance_lock()
+    except ShutdownRequested as e:
+        logger.info(f"Received {signal.Signals(e.signum).name}, shutting down")
+        drain(scheduler_thread, stay_ready=e.signum == signal.SIGUSR1)
+        save_schedule_config()
+        release_instance_lock()
     except Exception as e:
         logger.error(f"Unexpected error in main loop: {str(e)}")
         save_schedule_config()
-        remove_pid_file()
+        release_instance_lock()
         sys.exit(1)
     finally:
-        remove_pid_file()
+        release_instance_lock()
 
 
 if __name__ == "__main__":
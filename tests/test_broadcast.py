@@ -0,0 +1,130 @@
+"""Deadlines, retry budgets and per-chat ordering of broadcast.py and retry_queue.py."""
+
+import threading
+
+import pytest
+
+from bot_api import SendResult
+from broadcast import MIN_REQUEST_TIMEOUT, BroadcastEngine, Deadline
+from retry_queue import PERMANENT, RETRY_AFTER, TRANSIENT, RetryPolicy, classify_failure
+
+
+class VirtualClock:
+    def __init__(self):
+        self.now = 500.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_deadline_counts_down_on_its_clock():
+    clock = VirtualClock()
+    deadline = Deadline(10, clock=clock)
+    clock.now += 4
+    assert deadline.remaining() == pytest.approx(6)
+    assert not deadline.expired()
+    clock.now += 6
+    assert deadline.expired()
+    assert deadline.remaining() == 0.0
+
+
+def test_deadline_caps_timeouts_but_never_to_zero():
+    clock = VirtualClock()
+    deadline = Deadline(10, clock=clock)
+    assert deadline.timeout(30) == pytest.approx(10)
+    assert deadline.timeout(5) == pytest.approx(5)
+    clock.now += 20
+    assert deadline.timeout(30) == MIN_REQUEST_TIMEOUT
+
+
+def test_deadline_can_only_be_shortened():
+    clock = VirtualClock()
+    deadline = Deadline(10, clock=clock)
+    deadline.shorten(3)
+    assert deadline.remaining() == pytest.approx(3)
+    deadline.shorten(30)
+    assert deadline.remaining() == pytest.approx(3)
+
+
+@pytest.mark.parametrize("result, kind", [
+    (SendResult(False, error_code=429, retry_after=5), RETRY_AFTER),
+    (SendResult(False, error_code=502), TRANSIENT),
+    (SendResult(False, description="timeout"), TRANSIENT),
+    (SendResult(False, error_code=403), PERMANENT),
+    (SendResult(False, error_code=400), PERMANENT),
+])
+def test_classify_failure(result, kind):
+    assert classify_failure(result) == kind
+
+
+def test_retry_policy_stops_at_max_attempts_and_on_permanent_errors():
+    policy = RetryPolicy(max_attempts=3)
+    transient = SendResult(False, error_code=500)
+    assert policy.next_delay(transient, 1) is not None
+    assert policy.next_delay(transient, 2) is not None
+    assert policy.next_delay(transient, 3) is None
+    assert policy.next_delay(SendResult(False, error_code=403), 1) is None
+    assert policy.next_delay(SendResult(True), 1) is None
+
+
+def test_retry_policy_honours_retry_after_up_to_its_limit():
+    policy = RetryPolicy(max_retry_after=60)
+    delay = policy.next_delay(SendResult(False, error_code=429, retry_after=7), 1)
+    assert 7 <= delay <= 8
+    assert policy.next_delay(SendResult(False, error_code=429, retry_after=61), 1) is None
+
+
+def test_backoff_grows_exponentially_up_to_max_delay():
+    policy = RetryPolicy(base_delay=1, max_delay=8)
+    for attempt, ceiling in [(1, 1), (2, 2), (3, 4), (4, 8), (10, 8)]:
+        assert ceiling / 2 <= policy.backoff(attempt) <= ceiling
+
+
+def test_retry_budget_is_shared_by_every_use_of_the_policy():
+    policy = RetryPolicy(max_retries_per_slot=3)
+    transient = SendResult(False, error_code=500)
+    # Three retries over several passes and chats use up the slot's budget
+    assert all(policy.next_delay(transient, 1) is not None for _ in range(3))
+    assert policy.next_delay(transient, 1) is None
+    assert policy.retries == 3
+
+
+def test_engine_keeps_per_chat_order():
+    sent = []
+    lock = threading.Lock()
+
+    def send(chat_id, text):
+        with lock:
+            sent.append((chat_id, text))
+        return SendResult(True)
+
+    engine = BroadcastEngine(send, max_workers=4)
+    deliveries = [(chat_id, index) for index in range(5) for chat_id in range(3)]
+    assert engine.run(deliveries) == (15, 15)
+    for chat_id in range(3):
+        assert [text for chat, text in sent if chat == chat_id] == list(range(5))
+
+
+def test_engine_defers_everything_once_the_deadline_expired():
+    clock = VirtualClock()
+    deadline = Deadline(1, clock=clock)
+    clock.now += 2
+    engine = BroadcastEngine(lambda chat_id, text, deadline=None: SendResult(True),
+                             deadline=deadline)
+    assert engine.run([(1, "a"), (2, "b")]) == (0, 0)
+    assert engine.deferred == [(1, "a"), (2, "b")]
+
+
+def test_engine_defers_a_retry_that_would_end_past_the_deadline():
+    clock = VirtualClock()
+    deadline = Deadline(5, clock=clock)
+    results = []
+
+    def send(chat_id, text, deadline=None):
+        return SendResult(False, error_code=429, retry_after=30)
+
+    engine = BroadcastEngine(send, on_result=lambda chat_id, result: results.append(result),
+                             retry_policy=RetryPolicy(), deadline=deadline)
+    assert engine.run([(1, "a")]) == (0, 0)
+    assert engine.deferred == [(1, "a")]
+    assert results == []
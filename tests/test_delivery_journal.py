@@ -0,0 +1,104 @@
+"""Replay and compaction of delivery_journal.py."""
+
+import json
+
+import pytest
+
+from delivery_journal import STATUS_FAILED, STATUS_SENT, DeliveryJournal
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "journal.jsonl")
+
+
+def lines(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_unfinished_slot_is_replayed_after_a_restart(path):
+    journal = DeliveryJournal(path)
+    journal.start_slot("s1")
+    journal.record("s1", -1, STATUS_SENT, 10)
+    journal.record("s1", -2, STATUS_FAILED)
+    journal.record("s1", -3, STATUS_SENT, 11)
+
+    reopened = DeliveryJournal(path)
+    assert reopened.delivered("s1") == {-1, -3}
+    assert [state.slot for state in reopened.incomplete_slots()] == ["s1"]
+    assert not reopened.is_complete("s1")
+
+
+def test_record_is_on_disk_when_it_returns(path):
+    journal = DeliveryJournal(path)
+    journal.start_slot("s1")
+    journal.record("s1", -1, STATUS_SENT, 10)
+    assert {"slot": "s1", "chat_id": -1, "status": STATUS_SENT} in [
+        {key: line[key] for key in ("slot", "chat_id", "status")}
+        for line in lines(path) if "chat_id" in line]
+
+
+def test_completed_slot_is_reduced_to_its_id(path):
+    journal = DeliveryJournal(path)
+    journal.start_slot("s1")
+    journal.record("s1", -1, STATUS_SENT, 10)
+    journal.complete_slot("s1")
+    # Late records of a completed slot are ignored
+    journal.record("s1", -2, STATUS_SENT, 11)
+    assert journal.is_complete("s1")
+    assert journal.delivered("s1") == set()
+
+    reopened = DeliveryJournal(path)
+    assert reopened.is_complete("s1")
+    assert reopened.incomplete_slots() == []
+    assert [line["status"] for line in lines(path)] == ["complete"]
+
+
+def test_torn_last_line_is_skipped(path):
+    journal = DeliveryJournal(path)
+    journal.start_slot("s1")
+    journal.record("s1", -1, STATUS_SENT, 10)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"slot": "s1", "chat_id": -2, "sta')
+
+    reopened = DeliveryJournal(path)
+    assert reopened.delivered("s1") == {-1}
+
+
+def test_only_the_newest_unfinished_slots_are_kept_at_startup(path):
+    journal = DeliveryJournal(path)
+    for index in range(5):
+        journal.start_slot(f"s{index}")
+        journal.record(f"s{index}", -index, STATUS_SENT, index)
+    journal.flush()
+
+    reopened = DeliveryJournal(path, keep_slots=2)
+    assert sorted(state.slot for state in reopened.incomplete_slots()) == ["s3", "s4"]
+
+
+def test_completed_ids_are_bounded(path):
+    journal = DeliveryJournal(path, keep_completed=3)
+    for index in range(5):
+        journal.complete_slot(f"s{index}")
+    assert not journal.is_complete("s0")
+    assert not journal.is_complete("s1")
+    assert journal.is_complete("s4")
+
+
+def test_compaction_while_running_keeps_the_state(path):
+    journal = DeliveryJournal(path, compact_after=50)
+    journal.start_slot("done")
+    for chat_id in range(40):
+        journal.record("done", chat_id, STATUS_SENT, chat_id, wait=False)
+    journal.complete_slot("done")
+    journal.start_slot("open")
+    for chat_id in range(20):
+        journal.record("open", chat_id, STATUS_SENT, chat_id, wait=False)
+    journal.flush()
+
+    # 63 records appended, compacted after 50: what is left rebuilds the state
+    assert len(lines(path)) < 63
+    reopened = DeliveryJournal(path)
+    assert reopened.is_complete("done")
+    assert reopened.delivered("open") == set(range(20))
@@ -0,0 +1,103 @@
+"""Token-bucket debt, recovery and refunds of rate_limiter.py on a virtual clock."""
+
+import pytest
+
+from rate_limiter import (MIN_GLOBAL_RATE, RATE_RECOVERY_PER_SECOND, THROTTLE_FACTOR,
+                          RateLimiter, TokenBucket)
+
+
+class VirtualClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return VirtualClock()
+
+
+def test_bucket_serves_its_burst_then_goes_into_debt(clock):
+    bucket = TokenBucket(rate=2, capacity=3, clock=clock)
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.reserve() == pytest.approx(0.5)
+    assert bucket.reserve() == pytest.approx(1.0)
+    assert bucket.level() == pytest.approx(-2)
+
+
+def test_bucket_recovers_from_debt_but_never_beyond_capacity(clock):
+    bucket = TokenBucket(rate=2, capacity=3, clock=clock)
+    for _ in range(5):
+        bucket.reserve()
+    clock.now += 1
+    assert bucket.level() == pytest.approx(0)
+    clock.now += 60
+    assert bucket.level() == pytest.approx(3)
+
+
+def test_refund_gives_the_token_back_up_to_capacity(clock):
+    bucket = TokenBucket(rate=1, capacity=1, clock=clock)
+    bucket.reserve()
+    bucket.reserve()
+    bucket.refund()
+    assert bucket.level() == pytest.approx(0)
+    bucket.refund()
+    bucket.refund()
+    assert bucket.level() == pytest.approx(1)
+
+
+def test_acquire_waits_for_the_slower_of_global_and_per_chat_bucket(clock):
+    limiter = RateLimiter(global_rate=10, global_burst=1, per_chat_rate=1, per_chat_burst=1,
+                          clock=clock, sleep=clock.sleep)
+    assert limiter.acquire(1) == 0.0
+    assert limiter.acquire(2) == pytest.approx(0.1)
+    # Chat 1 is limited by its own bucket, a second after its first send
+    assert limiter.acquire(1) == pytest.approx(0.9)
+    assert clock.slept == [pytest.approx(0.1), pytest.approx(0.9)]
+
+
+def test_acquire_beyond_max_wait_refunds_and_does_not_sleep(clock):
+    limiter = RateLimiter(global_rate=10, global_burst=1, per_chat_rate=1, per_chat_burst=1,
+                          clock=clock, sleep=clock.sleep)
+    limiter.acquire(1)
+    assert limiter.acquire(1, max_wait=0.5) > 0.5
+    assert clock.slept == []
+    # Neither bucket kept the debt of the send that never happened
+    assert limiter.acquire(2) == pytest.approx(0.1)
+    clock.now += 1
+    assert limiter.acquire(1) == 0.0
+
+
+def test_throttle_cuts_the_global_rate_and_it_recovers_linearly(clock):
+    limiter = RateLimiter(global_rate=30, global_burst=30, clock=clock, sleep=clock.sleep)
+    limiter.throttle()
+    assert limiter.snapshot()["global_rate"] == pytest.approx(30 * THROTTLE_FACTOR)
+    clock.now += 2
+    limiter.acquire()
+    assert limiter.snapshot()["global_rate"] == pytest.approx(
+        30 * THROTTLE_FACTOR + 2 * RATE_RECOVERY_PER_SECOND)
+    clock.now += 3600
+    limiter.acquire()
+    assert limiter.snapshot()["global_rate"] == pytest.approx(30)
+
+
+def test_throttle_never_goes_below_the_minimum_rate(clock):
+    limiter = RateLimiter(global_rate=2, clock=clock, sleep=clock.sleep)
+    for _ in range(20):
+        limiter.throttle()
+    assert limiter.snapshot()["global_rate"] == pytest.approx(MIN_GLOBAL_RATE)
+
+
+def test_throttle_puts_the_chat_in_debt_for_retry_after(clock):
+    limiter = RateLimiter(global_rate=1000, global_burst=1000, per_chat_rate=1, per_chat_burst=3,
+                          clock=clock, sleep=clock.sleep)
+    limiter.throttle(5, retry_after=10)
+    assert limiter.acquire(5) == pytest.approx(11)
+    assert limiter.acquire(6) == 0.0
@@ -0,0 +1,105 @@
+"""next_daily_fire across DST changes, and the scheduler on a virtual clock."""
+
+from datetime import datetime, timedelta, timezone
+from datetime import time as dt_time
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from timer_scheduler import TimerScheduler, daily_at, next_daily_fire, resolve_timezone
+
+KYIV = ZoneInfo("Europe/Kyiv")
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+class VirtualClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_next_fire_is_strictly_after():
+    fire = next_daily_fire(dt_time(9, 0), KYIV, utc(2026, 7, 1, 6, 0))
+    assert fire == utc(2026, 7, 2, 6, 0)
+
+
+def test_next_fire_follows_the_summer_and_winter_offset():
+    assert next_daily_fire(dt_time(9, 0), KYIV, utc(2026, 7, 1)) == utc(2026, 7, 1, 6, 0)
+    assert next_daily_fire(dt_time(9, 0), KYIV, utc(2026, 12, 1)) == utc(2026, 12, 1, 7, 0)
+
+
+def test_time_skipped_by_spring_forward_fires_just_after_the_jump():
+    # 2026-03-29 03:00 EET jumps to 04:00 EEST, so 03:30 never happens
+    fire = next_daily_fire(dt_time(3, 30), KYIV, utc(2026, 3, 28, 12, 0))
+    assert fire == utc(2026, 3, 29, 1, 30)
+    assert fire.astimezone(KYIV).strftime("%H:%M") == "04:30"
+
+
+def test_time_repeated_by_fall_back_fires_only_once():
+    # 2026-10-25 04:00 EEST goes back to 03:00 EET, so 03:30 happens twice
+    first = next_daily_fire(dt_time(3, 30), KYIV, utc(2026, 10, 24, 12, 0))
+    assert first == utc(2026, 10, 25, 0, 30)
+    second = next_daily_fire(dt_time(3, 30), KYIV, first)
+    assert second == utc(2026, 10, 26, 1, 30)
+
+
+def test_resolve_timezone_accepts_fixed_offsets_and_iana_names():
+    assert resolve_timezone("GMT+3").utcoffset(None) == timedelta(hours=3)
+    assert resolve_timezone("UTC-05:30").utcoffset(None) == -timedelta(hours=5, minutes=30)
+    assert resolve_timezone("Europe/Kyiv") == KYIV
+    with pytest.raises(ValueError):
+        resolve_timezone("Mars/Olympus")
+
+
+def test_run_pending_runs_due_jobs_in_order():
+    clock = VirtualClock(utc(2026, 7, 1, 5, 0))
+    scheduler = TimerScheduler(clock=clock)
+    ran = []
+    scheduler.add_daily("09:00", lambda: ran.append("kyiv"), tz=KYIV, name="slot kyiv")
+    scheduler.add_daily("06:30", lambda: ran.append("utc"), name="slot utc")
+    assert scheduler.run_pending() == 0
+    clock.now = scheduler.next_run()
+    assert clock.now == utc(2026, 7, 1, 6, 0)
+    scheduler.run_pending()
+    clock.now = scheduler.next_run()
+    scheduler.run_pending()
+    assert ran == ["kyiv", "utc"]
+
+
+def test_overdue_job_fires_once_after_a_long_pause():
+    clock = VirtualClock(utc(2026, 7, 1, 0, 0))
+    scheduler = TimerScheduler(clock=clock)
+    ran = []
+    scheduler.add_daily("01:00", lambda: ran.append(clock.now), name="slot")
+    clock.now = utc(2026, 7, 5, 12, 0)
+    assert scheduler.run_pending() == 1
+    assert scheduler.next_run() == utc(2026, 7, 6, 1, 0)
+
+
+def test_background_jobs_run_inline_in_run_pending():
+    clock = VirtualClock(utc(2026, 7, 1, 0, 0))
+    scheduler = TimerScheduler(clock=clock)
+    ran = []
+    scheduler.add_once(1, lambda: ran.append("once"), name="followup x", background=True)
+    clock.now += timedelta(seconds=1)
+    assert scheduler.run_pending() == 1
+    assert ran == ["once"]
+    assert scheduler.next_run() is None
+
+
+def test_sync_keeps_unchanged_jobs_and_applies_the_diff():
+    clock = VirtualClock(utc(2026, 7, 1, 0, 0))
+    scheduler = TimerScheduler(clock=clock)
+    wanted = {"slot a": (lambda: None, daily_at("09:00")),
+              "slot b": (lambda: None, daily_at("10:00"))}
+    assert scheduler.sync("slot ", wanted) == (["slot a", "slot b"], [])
+    kept = {job.name: job for job in scheduler.jobs()}["slot a"]
+    added, removed = scheduler.sync("slot ", {"slot a": wanted["slot a"],
+                                              "slot c": (lambda: None, daily_at("11:00"))})
+    assert (added, removed) == (["slot c"], ["slot b"])
+    assert {job.name: job for job in scheduler.jobs()}["slot a"] is kept
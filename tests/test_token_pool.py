@@ -0,0 +1,86 @@
+"""Stability of the consistent-hash chat assignment in token_pool.py."""
+
+import pytest
+
+from bot_api import SendResult
+from token_pool import HashRing, TokenPool, TokenShard, bot_id_of
+
+CHATS = range(-1001000010000, -1001000000000)
+
+
+class StubLimiter:
+    def snapshot(self):
+        return {}
+
+
+def make_pool(*bot_ids):
+    return TokenPool([TokenShard(f"{bot_id}:token", None, StubLimiter()) for bot_id in bot_ids])
+
+
+def assignment(pool):
+    return {chat_id: pool.shard_for(chat_id).bot_id for chat_id in CHATS}
+
+
+def test_bot_id_is_the_part_before_the_colon():
+    assert bot_id_of("123456:ABC-def") == "123456"
+
+
+def test_chats_are_spread_evenly():
+    counts = {}
+    for bot_id in assignment(make_pool("1", "2", "3", "4")).values():
+        counts[bot_id] = counts.get(bot_id, 0) + 1
+    assert min(counts.values()) > len(CHATS) / 4 * 0.8
+
+
+def test_adding_a_bot_only_moves_chats_to_it():
+    before = assignment(make_pool("1", "2", "3"))
+    after = assignment(make_pool("1", "2", "3", "4"))
+    moved = [chat_id for chat_id in CHATS if before[chat_id] != after[chat_id]]
+    assert all(after[chat_id] == "4" for chat_id in moved)
+    assert len(moved) == pytest.approx(len(CHATS) / 4, rel=0.25)
+
+
+def test_removing_a_bot_only_moves_its_own_chats():
+    before = assignment(make_pool("1", "2", "3"))
+    after = assignment(make_pool("1", "3"))
+    for chat_id in CHATS:
+        if before[chat_id] != "2":
+            assert after[chat_id] == before[chat_id]
+
+
+def test_regenerated_token_keeps_its_chats():
+    before = assignment(make_pool("1", "2"))
+    pool = TokenPool([TokenShard("1:old", None, StubLimiter()),
+                      TokenShard("2:regenerated", None, StubLimiter())])
+    assert assignment(pool) == before
+
+
+def test_drop_matches_a_pool_built_without_the_bot():
+    pool = make_pool("1", "2", "3")
+    removed = pool.drop(["2", "unknown"])
+    assert [shard.bot_id for shard in removed] == ["2"]
+    assert len(pool) == 2
+    assert assignment(pool) == assignment(make_pool("1", "3"))
+
+
+def test_drop_keeps_the_primary_bot():
+    pool = make_pool("1", "2")
+    assert pool.drop(["1"]) == []
+    assert pool.primary.bot_id == "1"
+
+
+def test_duplicate_bots_are_rejected():
+    with pytest.raises(ValueError):
+        make_pool("1", "1")
+    with pytest.raises(ValueError):
+        HashRing([])
+
+
+def test_403s_are_counted_per_bot():
+    pool = make_pool("1", "2")
+    pool.record("1", SendResult(True, message_id=1))
+    pool.record("2", SendResult(False, error_code=403, description="Forbidden"))
+    pool.record("2", SendResult(False, error_code=500))
+    stats = {bot["bot_id"]: bot for bot in pool.snapshot()}
+    assert (stats["1"]["sent"], stats["1"]["forbidden"]) == (1, 0)
+    assert (stats["2"]["failed"], stats["2"]["forbidden"]) == (2, 1)
@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+"""
+Event-driven timer scheduler
+
+Keeps jobs in a heap ordered by their next fire time and sleeps exactly
+until the earliest one is due, instead of waking up every minute to poll.
+Adding or removing a job wakes the scheduler so it can re-plan its sleep.
+
+A job that is overdue (for example after the machine was suspended) still
+fires once as soon as the scheduler notices, so no slot is ever skipped.
+
+Long jobs (broadcasts) are added with background=True: run_forever() starts
+each run in a thread of its own and goes straight back to the heap, so one
+broadcast never delays another slot, the config watcher or a heartbeat.
+run_pending() runs every job inline, which keeps virtual-clock runs
+deterministic.
+
+The heap doubles as the precomputed next-fire index: it holds the next UTC
+instant of every job, finding due work is O(log n), and only a job that
+just fired has its next instant recomputed (in its own IANA timezone, so
+DST transitions are handled per job).
+"""
+
+import heapq
+import itertools
+import logging
+import re
+import threading
+from datetime import datetime, timedelta, timezone
+from datetime import time as dt_time
+from zoneinfo import ZoneInfo
+
+from metrics import SCHEDULER_LAG_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on a single sleep so wall-clock adjustments are picked up
+MAX_SLEEP = 3600
+
+
+class Job:
+    """
+    A scheduled callable with its own next-fire rule.
+    """
+
+    def __init__(self, name, func, next_fire, background=False):
+        """
+        Args:
+            name (str): Unique job name
+            func (callable): Called with no arguments when the job fires
+            next_fire (callable): next_fire(after_datetime) -> aware UTC datetime
+            background (bool): Run in its own thread instead of the scheduler thread
+        """
+        self.name = name
+        # First word of the name ("slot", "followup", ...), a bounded metric label
+        self.kind = name.split(' ', 1)[0]
+        self.func = func
+        self.next_fire = next_fire
+        self.background = background
+        self.due = None
+        self.cancelled = False
+
+    def __repr__(self):
+        return f"Job({self.name!r}, due={self.due})"
+
+
+_FIXED_OFFSET_RE = re.compile(r'^(?:GMT|UTC)\s*([+-])(\d{1,2})(?::?(\d{2}))?$', re.IGNORECASE)
+
+
+def resolve_timezone(name):
+    """
+    Turn a timezone setting into a tzinfo.
+
+    Accepts IANA names ("Europe/Kyiv") as well as fixed offsets written the
+    way people read them ("GMT+3", "UTC-05:30").
+
+    Args:
+        name (str): Timezone name or offset
+
+    Returns:
+        tzinfo: Resolved timezone
+
+    Raises:
+        ValueError: If the name is not a known timezone
+    """
+    if not name or name.upper() in ("UTC", "GMT", "Z"):
+        return timezone.utc
+    match = _FIXED_OFFSET_RE.match(name.strip())
+    if match:
+        sign, hours, minutes = match.groups()
+        offset = timedelta(hours=int(hours), minutes=int(minutes or 0))
+        return timezone(-offset if sign == '-' else offset, name)
+    try:
+        return ZoneInfo(name)
+    except Exception:
+        raise ValueError(f"Unknown timezone: {name}")
+
+
+def next_daily_fire(local_time, tz, after):
+    """
+    Next UTC instant at which the wall clock in tz shows local_time.
+
+    A time skipped by a DST jump fires at the equivalent instant just after
+    the jump; a time repeated when clocks go back fires only the first time.
+
+    Args:
+        local_time (datetime.time): Wall-clock time
+        tz (tzinfo): Timezone of the wall clock
+        after (datetime): Aware datetime; the result is strictly later
+
+    Returns:
+        datetime: Aware UTC datetime
+    """
+    day = after.astimezone(tz).date()
+    for offset in range(3):
+        candidate = datetime.combine(day + timedelta(days=offset), local_time, tzinfo=tz)
+        fire = candidate.astimezone(timezone.utc)
+        if fire > after:
+            return fire
+    raise ValueError(f"Could not compute next fire time for {local_time} in {tz}")
+
+
+def daily_at(time_str, tz=timezone.utc):
+    """
+    Build a next-fire rule for a fixed local time every day.
+
+    Args:
+        time_str (str): Time in HH:MM or HH:MM:SS format
+        tz (tzinfo): Timezone the time is expressed in
+
+    Returns:
+        callable: next_fire(after) -> aware UTC datetime
+    """
+    parts = [int(p) for p in time_str.split(':')]
+    local_time = dt_time(parts[0], parts[1], parts[2] if len(parts) > 2 else 0)
+
+    def next_fire(after):
+        return next_daily_fire(local_time, tz, after)
+
+    return next_fire
+
+
+def every(seconds):
+    """
+    Build a next-fire rule for a fixed interval.
+
+    Args:
+        seconds (float): Interval between runs
+
+    Returns:
+        callable: next_fire(after) -> aware UTC datetime
+    """
+    def next_fire(after):
+        return after + timedelta(seconds=seconds)
+
+    return next_fire
+
+
+def once_at(when):
+    """
+    Build a next-fire rule for a job that fires only once.
+
+    Args:
+        when (datetime): Aware UTC datetime of the single run
+
+    Returns:
+        callable: next_fire(after) -> when, or None once it has passed
+    """
+    def next_fire(after):
+        return when if when > after else None
+
+    return next_fire
+
+
+class TimerScheduler:
+    """
+    Heap-ordered scheduler that sleeps until the next due job.
+    """
+
+    def __init__(self, clock=None):
+        """
+        Args:
+            clock (callable): Returns the current aware UTC datetime
+        """
+        self.clock = clock or (lambda: datetime.now(timezone.utc))
+        self._cond = threading.Condition()
+        self._heap = []
+        self._jobs = {}
+        self._seq = itertools.count()
+        self._stopped = False
+
+    def add(self, name, func, next_fire, background=False):
+        """
+        Add a job, replacing any existing job with the same name.
+
+        Returns:
+            Job: The scheduled job
+        """
+        job = Job(name, func, next_fire, background)
+        with self._cond:
+            self._cancel(name)
+            job.due = next_fire(self.clock())
+            self._jobs[name] = job
+            heapq.heappush(self._heap, (job.due, next(self._seq), job))
+            self._cond.notify_all()
+        return job
+
+    def add_daily(self, time_str, func, tz=timezone.utc, name=None, background=False):
+        """
+        Add a job that fires every day at time_str in timezone tz.
+
+        Returns:
+            Job: The scheduled job
+        """
+        return self.add(name or f"daily {time_str}", func, daily_at(time_str, tz), background)
+
+    def add_interval(self, seconds, func, name=None):
+        """
+        Add a job that fires every given number of seconds.
+
+        Returns:
+            Job: The scheduled job
+        """
+        return self.add(name or f"every {seconds}s", func, every(seconds))
+
+    def add_once(self, seconds, func, name=None, background=False):
+        """
+        Add a job that fires once, the given number of seconds from now.
+
+        Returns:
+            Job: The scheduled job
+        """
+        when = self.clock() + timedelta(seconds=max(seconds, 0.001))
+        return self.add(name or f"once {when.isoformat()}", func, once_at(when), background)
+
+    def _cancel(self, name):
+        job = self._jobs.pop(name, None)
+        if job is not None:
+            # Lazy deletion: the heap entry is skipped when it surfaces
+            job.cancelled = True
+        return job is not None
+
+    def remove(self, name):
+        """
+        Remove a job by name.
+
+        Returns:
+            bool: True if the job existed
+        """
+        with self._cond:
+            removed = self._cancel(name)
+            self._cond.notify_all()
+        return removed
+
+    def sync(self, prefix, wanted, background=False):
+        """
+        Make the jobs whose name starts with prefix match wanted, atomically.
+
+        Jobs that are still wanted keep their planned fire time; only jobs
+        missing from wanted are removed and only new names are added. The
+        whole diff is applied under one lock, so the scheduler never runs
+        against a half-updated job set.
+
+        Args:
+            prefix (str): Name prefix of the jobs managed by this call
+            wanted (dict): name -> (func, next_fire) for every job that should exist
+            background (bool): Run the added jobs in their own threads
+
+        Returns:
+            tuple: (added names, removed names)
+        """
+        with self._cond:
+            now = self.clock()
+            removed = [name for name in self._jobs
+                       if name.startswith(prefix) and name not in wanted]
+            for name in removed:
+                self._cancel(name)
+            added = []
+            for name, (func, next_fire) in sorted(wanted.items()):
+                if name in self._jobs:
+                    continue
+                job = Job(name, func, next_fire, background)
+                job.due = next_fire(now)
+                self._jobs[name] = job
+                heapq.heappush(self._heap, (job.due, next(self._seq), job))
+                added.append(name)
+            if added or removed:
+                self._cond.notify_all()
+        return added, removed
+
+    def clear(self):
+        """Remove every job."""
+        with self._cond:
+            for name in list(self._jobs):
+                self._cancel(name)
+            self._heap = []
+            self._cond.notify_all()
+
+    def jobs(self):
+        """
+        Returns:
+            list: Active jobs ordered by next fire time
+        """
+        with self._cond:
+            return sorted(self._jobs.values(), key=lambda job: job.due)
+
+    def next_run(self, prefix=None):
+        """
+        Get the next fire time, optionally only for jobs whose name starts with prefix.
+
+        Returns:
+            datetime: Aware UTC datetime, or None when nothing is scheduled
+        """
+        with self._cond:
+            dues = [job.due for job in self._jobs.values()
+                    if prefix is None or job.name.startswith(prefix)]
+        return min(dues) if dues else None
+
+    def wake(self):
+        """Wake the scheduler so it re-plans its sleep."""
+        with self._cond:
+            self._cond.notify_all()
+
+    def stop(self):
+        """Make run_forever() return after the current inline job."""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def _take_due_job(self):
+        """
+        Take the earliest job off the heap if it is due; the caller holds the lock.
+
+        Returns:
+            tuple: (job, planned_due), or None if no job is due yet
+        """
+        while self._heap and self._heap[0][2].cancelled:
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return None
+
+        due, _, job = self._heap[0]
+        now = self.clock()
+        if due > now:
+            return None
+
+        heapq.heappop(self._heap)
+        # Plan the next occurrence from now, so an overdue job fires only once
+        job.due = job.next_fire(max(now, due))
+        if job.due is None:
+            # One-shot job: nothing left to plan
+            if self._jobs.get(job.name) is job:
+                del self._jobs[job.name]
+        else:
+            heapq.heappush(self._heap, (job.due, next(self._seq), job))
+        return job, due
+
+    def _pop_due_job(self):
+        """
+        Sleep until a job is due and take it off the heap.
+
+        Returns:
+            tuple: (job, planned_due) or (None, None) once stopped
+        """
+        with self._cond:
+            while not self._stopped:
+                taken = self._take_due_job()
+                if taken is not None:
+                    return taken
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                delay = (self._heap[0][0] - self.clock()).total_seconds()
+                self._cond.wait(min(max(delay, 0.001), MAX_SLEEP))
+        return None, None
+
+    def run_pending(self):
+        """
+        Run every job that is due now, without sleeping.
+
+        Background jobs run inline here too, so the call returns only once
+        every due job has finished.
+
+        With a virtual clock this steps through a schedule deterministically:
+        move the clock to next_run(), then call run_pending().
+
+        Returns:
+            int: Number of jobs run
+        """
+        ran = 0
+        while True:
+            with self._cond:
+                taken = self._take_due_job()
+            if taken is None:
+                return ran
+            self.run_job(*taken)
+            ran += 1
+
+    def run_forever(self):
+        """
+        Run jobs as they become due until stop() is called.
+
+        Background jobs get a daemon thread each and may still be running
+        when this returns.
+        """
+        self._stopped = False
+        while True:
+            job, planned = self._pop_due_job()
+            if job is None:
+                return
+            if job.background:
+                threading.Thread(target=self.run_job, args=(job, planned),
+                                 name=f'job-{job.kind}', daemon=True).start()
+            else:
+                self.run_job(job, planned)
+
+    def run_job(self, job, planned):
+        """
+        Run one job and log any error without stopping the scheduler.
+        """
+        lag = (self.clock() - planned).total_seconds()
+        SCHEDULER_LAG_SECONDS.labels(job.kind).observe(max(lag, 0.0))
+        if lag > 1:
+            logger.warning(f"Job {job.name} is running {lag:.1f} seconds late")
+        try:
+            job.func()
+        except Exception as e:
+            logger.error(f"Error in scheduled job {job.name}: {str(e)}")
+
+    def start(self):
+        """
+        Run the scheduler in a background daemon thread.
+
+        Returns:
+            threading.Thread: The scheduler thread
+        """
+        thread = threading.Thread(target=self.run_forever, name='timer-scheduler', daemon=True)
+        thread.start()
+        return thread
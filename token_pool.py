@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Bot token pool with consistent-hash chat assignment
+
+Telegram limits how fast one bot may send, however fast the sender is. With
+several bots (tokens) in the same groups, each chat is assigned to one bot
+by a consistent-hash ring and sent through that bot's own connection pool
+and rate limiter, so the aggregate rate grows with the number of tokens.
+
+The ring is keyed on the bot ID (the part of the token before ":"), so a
+regenerated token keeps its chats, and adding or removing a bot moves only
+the chats that bot gains or loses, about 1/K of them. A bot whose token
+fails validation is dropped from the ring the same way.
+"""
+
+import bisect
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Points per bot on the ring; more points spread the chats more evenly
+DEFAULT_REPLICAS = 160
+
+
+def bot_id_of(token):
+    """
+    Returns:
+        str: Bot ID of a token, e.g. "123456" for "123456:ABC..."; safe to log
+    """
+    return token.split(':', 1)[0]
+
+
+def _ring_hash(key):
+    return int.from_bytes(hashlib.md5(key.encode('utf-8')).digest()[:8], 'big')
+
+
+class HashRing:
+    """
+    Consistent-hash ring mapping keys (chat IDs) to node names.
+    """
+
+    def __init__(self, nodes, replicas=DEFAULT_REPLICAS):
+        """
+        Args:
+            nodes (iterable): Distinct node names
+            replicas (int): Points per node on the ring
+        """
+        points = sorted((_ring_hash(f"{node}#{index}"), node)
+                        for node in nodes for index in range(replicas))
+        if not points:
+            raise ValueError("A hash ring needs at least one node")
+        self._hashes = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def node_for(self, key):
+        """
+        Returns:
+            str: Node owning the key, the first point clockwise from its hash
+        """
+        index = bisect.bisect(self._hashes, _ring_hash(str(key)))
+        return self._nodes[index % len(self._nodes)]
+
+
+class TokenShard:
+    """
+    One bot of the pool with its own client, rate limiter and media sender.
+    """
+
+    def __init__(self, token, api_client, rate_limiter, media_sender=None):
+        """
+        Args:
+            token (str): Bot token
+            api_client (BotApiClient): Client using this token
+            rate_limiter (RateLimiter): Rate budget of this bot
+            media_sender (MediaSender): Media sender with this bot's file_ids
+        """
+        self.token = token
+        self.bot_id = bot_id_of(token)
+        self.api_client = api_client
+        self.rate_limiter = rate_limiter
+        self.media_sender = media_sender
+
+    def __repr__(self):
+        return f"TokenShard(bot_id={self.bot_id})"
+
+
+class TokenPool:
+    """
+    Assigns chats to bots and reports on all of them.
+    """
+
+    def __init__(self, shards, replicas=DEFAULT_REPLICAS):
+        """
+        Args:
+            shards (list): TokenShard per bot; the first one is the primary bot
+            replicas (int): Points per bot on the hash ring
+        """
+        self.shards = list(shards)
+        self.replicas = replicas
+        self._by_bot_id = {shard.bot_id: shard for shard in self.shards}
+        if len(self._by_bot_id) != len(self.shards):
+            raise ValueError("The same bot is listed more than once in the token pool")
+        self._ring = HashRing(self._by_bot_id, replicas=replicas)
+        self._lock = threading.Lock()
+        self._sent = {bot_id: 0 for bot_id in self._by_bot_id}
+        self._failed = {bot_id: 0 for bot_id in self._by_bot_id}
+        # 403 answers per bot: a bot missing from its chats shows up here
+        self._forbidden = {bot_id: 0 for bot_id in self._by_bot_id}
+
+    def __len__(self):
+        return len(self.shards)
+
+    def __iter__(self):
+        return iter(self.shards)
+
+    @property
+    def primary(self):
+        """The first bot, used for token checks and command replies."""
+        return self.shards[0]
+
+    def shard_for(self, chat_id):
+        """
+        Returns:
+            TokenShard: Bot that sends to the chat
+        """
+        if len(self.shards) == 1:
+            return self.shards[0]
+        return self._by_bot_id[self._ring.node_for(chat_id)]
+
+    def drop(self, bot_ids):
+        """
+        Take bots out of the pool, e.g. because their token was rejected.
+
+        Their chats move to the remaining bots; every other chat keeps its bot.
+
+        Args:
+            bot_ids (iterable): Bot IDs to remove; the primary bot is kept
+
+        Returns:
+            list: TokenShard of every bot removed
+        """
+        bot_ids = set(bot_ids) - {self.primary.bot_id}
+        removed = [shard for shard in self.shards if shard.bot_id in bot_ids]
+        if removed:
+            shards = [shard for shard in self.shards if shard.bot_id not in bot_ids]
+            by_bot_id = {shard.bot_id: shard for shard in shards}
+            self._ring = HashRing(by_bot_id, replicas=self.replicas)
+            self._by_bot_id = by_bot_id
+            self.shards = shards
+        return removed
+
+    def record(self, bot_id, result):
+        """Count the outcome of one send made by a bot."""
+        with self._lock:
+            counters = self._sent if result else self._failed
+            counters[bot_id] = counters.get(bot_id, 0) + 1
+            if getattr(result, 'error_code', None) == 403:
+                self._forbidden[bot_id] = self._forbidden.get(bot_id, 0) + 1
+
+    def snapshot(self):
+        """
+        Returns:
+            list: Per-bot sends and rate limiter state, for /health
+        """
+        with self._lock:
+            counts = {bot_id: (self._sent[bot_id], self._failed[bot_id], self._forbidden[bot_id])
+                      for bot_id in self._sent}
+        return [{
+            "bot_id": shard.bot_id,
+            "sent": counts[shard.bot_id][0],
+            "failed": counts[shard.bot_id][1],
+            "forbidden": counts[shard.bot_id][2],
+            "rate_limiter": shard.rate_limiter.snapshot()
+        } for shard in self.shards]
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Telegram update receiver and admin command dispatcher
+
+UpdateReceiver long-polls getUpdates on its own thread and its own HTTP
+connection, so it never competes with broadcasts for pooled connections or
+workers. Each poll waits server-side for up to poll_timeout seconds, so an
+idle bot makes about one request a minute and uses no CPU in between.
+
+The offset of the next update is persisted after every batch, before the
+commands in it run: after a restart the bot neither replays an old
+/broadcast nor asks Telegram for updates it has already seen.
+
+CommandDispatcher routes "/command args" messages from authorised users to
+handlers on a small bounded worker pool. When the pool is saturated, new
+commands are refused with a short reply instead of piling up.
+"""
+
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OFFSET_FILE = "updates_offset.txt"
+DEFAULT_POLL_TIMEOUT = 50       # seconds Telegram holds a getUpdates request open
+DEFAULT_MAX_WORKERS = 2         # commands handled at the same time
+DEFAULT_MAX_PENDING = 16        # commands running or waiting for a worker
+ERROR_BACKOFF_BASE = 1          # seconds after the first failed poll, doubled up to
+ERROR_BACKOFF_MAX = 60
+
+
+def parse_command(text):
+    """
+    Split a message like "/schedule@my_bot add 10:00" into its parts.
+
+    Returns:
+        tuple: (command without "/" and bot name, list of arguments), or
+            (None, []) if the text is not a command
+    """
+    if not text or not text.startswith('/'):
+        return None, []
+    parts = text.split()
+    command = parts[0][1:].split('@', 1)[0].lower()
+    return (command or None), parts[1:]
+
+
+class CommandDispatcher:
+    """
+    Bounded thread pool running command handlers for authorised users.
+    """
+
+    def __init__(self, reply_func, admin_ids, max_workers=DEFAULT_MAX_WORKERS,
+                 max_pending=DEFAULT_MAX_PENDING):
+        """
+        Args:
+            reply_func (callable): reply_func(chat_id, text) sends a reply
+            admin_ids (iterable): User IDs allowed to run commands
+            max_workers (int): Commands handled at the same time
+            max_pending (int): Commands running or queued before new ones are refused
+        """
+        self.reply_func = reply_func
+        self.admin_ids = {int(admin_id) for admin_id in admin_ids}
+        self.handlers = {}
+        self._executor = ThreadPoolExecutor(max_workers=max(1, int(max_workers)),
+                                            thread_name_prefix='command')
+        self._pending = threading.BoundedSemaphore(max(1, int(max_pending)))
+
+    def register(self, command, handler):
+        """
+        Route a command to handler(args, message) -> reply text or None.
+        """
+        self.handlers[command.lower()] = handler
+
+    def dispatch(self, update):
+        """
+        Queue the command in one update, without waiting for it to run.
+
+        Returns:
+            bool: True if a command was queued
+        """
+        message = update.get('message') or update.get('edited_message')
+        if not message:
+            return False
+        command, args = parse_command(message.get('text'))
+        if command is None:
+            return False
+
+        chat_id = (message.get('chat') or {}).get('id')
+        user_id = (message.get('from') or {}).get('id')
+        if user_id not in self.admin_ids:
+            logger.warning(f"Ignoring /{command} from unauthorised user {user_id} in chat {chat_id}")
+            return False
+
+        handler = self.handlers.get(command)
+        if handler is None:
+            self._reply(chat_id, f"Unknown command /{command}. "
+                                 f"Available: {', '.join('/' + name for name in sorted(self.handlers))}")
+            return False
+
+        if not self._pending.acquire(blocking=False):
+            self._reply(chat_id, "Busy with other commands, try again in a moment")
+            return False
+        logger.info(f"Command /{command} from user {user_id}")
+        self._executor.submit(self._run, handler, command, args, message, chat_id)
+        return True
+
+    def _run(self, handler, command, args, message, chat_id):
+        try:
+            reply = handler(args, message)
+        except Exception as e:
+            logger.error(f"Error handling /{command}: {str(e)}")
+            reply = f"/{command} failed: {e}"
+        finally:
+            self._pending.release()
+        if reply:
+            self._reply(chat_id, reply)
+
+    def _reply(self, chat_id, text):
+        try:
+            self.reply_func(chat_id, text)
+        except Exception as e:
+            logger.error(f"Could not reply to chat {chat_id}: {str(e)}")
+
+    def shutdown(self):
+        """Stop accepting commands and wait for running ones."""
+        self._executor.shutdown(wait=True)
+
+
+class UpdateReceiver:
+    """
+    getUpdates long-polling loop with a persisted offset.
+    """
+
+    def __init__(self, api_client, on_update, offset_file=DEFAULT_OFFSET_FILE,
+                 poll_timeout=DEFAULT_POLL_TIMEOUT, allowed_updates=("message",)):
+        """
+        Args:
+            api_client (BotApiClient): Client used only for polling
+            on_update (callable): Called with every decoded update
+            offset_file (str): File keeping the next update_id across restarts
+            poll_timeout (int): Seconds each getUpdates call may wait for updates
+            allowed_updates (iterable): Update types to receive
+        """
+        self.api_client = api_client
+        self.on_update = on_update
+        self.offset_file = offset_file
+        self.poll_timeout = poll_timeout
+        self.allowed_updates = json.dumps(list(allowed_updates))
+        self.offset = self._load_offset()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def _load_offset(self):
+        try:
+            with open(self.offset_file, 'r') as f:
+                return int(f.read().strip())
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"Could not read update offset from {self.offset_file}: {str(e)}")
+            return None
+
+    def _save_offset(self):
+        try:
+            tmp_file = self.offset_file + '.tmp'
+            with open(tmp_file, 'w') as f:
+                f.write(str(self.offset))
+            os.replace(tmp_file, self.offset_file)
+        except Exception as e:
+            logger.error(f"Could not save update offset: {str(e)}")
+
+    def poll_once(self):
+        """
+        Make one long-poll request and hand its updates to on_update.
+
+        Network errors and invalid JSON are raised to the caller.
+
+        Returns:
+            int: Number of updates received
+        """
+        data = {"timeout": self.poll_timeout, "allowed_updates": self.allowed_updates}
+        if self.offset is not None:
+            data["offset"] = self.offset
+        # The HTTP timeout must outlast the server-side wait
+        response = self.api_client.call("getUpdates", data, timeout=self.poll_timeout + 10)
+        if not response.get('ok'):
+            raise RuntimeError(f"getUpdates failed: Code {response.get('error_code')} - "
+                               f"{response.get('description')}")
+
+        updates = response.get('result') or []
+        if not updates:
+            return 0
+        self.offset = max(update['update_id'] for update in updates) + 1
+        # Acknowledge before handling, so a crash can not replay a command
+        self._save_offset()
+        for update in updates:
+            try:
+                self.on_update(update)
+            except Exception as e:
+                logger.error(f"Error handling update {update.get('update_id')}: {str(e)}")
+        return len(updates)
+
+    def run_forever(self):
+        """Poll until stop() is called, backing off while polling fails."""
+        failures = 0
+        while not self._stopped.is_set():
+            try:
+                self.poll_once()
+                failures = 0
+            except Exception as e:
+                failures += 1
+                delay = min(ERROR_BACKOFF_MAX, ERROR_BACKOFF_BASE * 2 ** (failures - 1))
+                logger.error(f"Polling for updates failed ({str(e)}), retrying in {delay}s")
+                self._stopped.wait(delay)
+
+    def start(self):
+        """
+        Poll in a background daemon thread.
+
+        Returns:
+            threading.Thread: The polling thread
+        """
+        self._thread = threading.Thread(target=self.run_forever, name='update-receiver',
+                                        daemon=True)
+        self._thread.start()
+        logger.info(f"Receiving bot commands (long poll {self.poll_timeout}s)")
+        return self._thread
+
+    def stop(self):
+        """Stop after the current poll returns."""
+        self._stopped.set()